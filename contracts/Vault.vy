@@ -1,4 +1,5 @@
-# @version 0.3.7
+# pragma version 0.3.10
+# pragma optimize codesize
 
 """
 @title Gefion Vault
@@ -51,6 +52,9 @@ interface IStrategy:
 interface IAccountant:
     def report(strategy: address, gain: uint256, loss: uint256) -> (uint256, uint256): nonpayable
 
+interface IAccountantV2:
+    def report(strategy: address, gain: uint256, loss: uint256, params: StrategyParams, totalAssets: uint256, totalSupply: uint256) -> (uint256, uint256): nonpayable
+
 interface IDepositLimitModule:
     def availableDepositLimit(receiver: address) -> uint256: view
     
@@ -59,6 +63,7 @@ interface IWithdrawLimitModule:
 
 interface IFactory:
     def protocolFeeConfig() -> (uint16, address): view
+    def feeConfigEpoch() -> uint256: view
 
 # EVENTS #
 # ERC4626 EVENTS
@@ -162,13 +167,49 @@ struct StrategyParams:
     # The max assets the strategy can hold. 
     maxDebt: uint256
 
+struct StrategyQuote:
+    # Strategy shares held by the vault.
+    shares: uint256
+    # What the vaults shares are currently worth in `asset`.
+    assets: uint256
+    # What the shares the vault is currently able to redeem are worth in `asset`.
+    withdrawable: uint256
+
+struct StrategyReport:
+    strategy: address
+    gain: uint256
+    loss: uint256
+    # The strategies debt after the report.
+    currentDebt: uint256
+    totalFees: uint256
+    totalRefunds: uint256
+
 # CONSTANTS #
 # The max length the withdrawal queue can be.
-MAX_QUEUE: constant(uint256) = 10
+MAX_QUEUE: constant(uint256) = 64
+# Marks both ends of the linked default queue.
+QUEUE_SENTINEL: constant(address) = 0x0000000000000000000000000000000000000001
 # 100% in Basis Points.
 MAX_BPS: constant(uint256) = 10_000
 # Extended for profit locking calculations.
 MAX_BPS_EXTENDED: constant(uint256) = 1_000_000_000_000
+# The amount of report checkpoints kept before the oldest is overwritten.
+MAX_CHECKPOINTS: constant(uint256) = 128
+# Masks for the packed protocol fee config.
+FEE_BPS_MASK: constant(uint256) = 2**16 - 1
+ADDRESS_MASK: constant(uint256) = 2**160 - 1
+# Masks for the packed accounting slots.
+AMOUNT_MASK: constant(uint256) = 2**128 - 1
+TIMESTAMP_MASK: constant(uint256) = 2**40 - 1
+UNLOCK_TIME_MASK: constant(uint256) = 2**32 - 1
+RATE_MASK: constant(uint256) = 2**144 - 1
+# Flag in `_accountant` for accountants that support `IAccountantV2`.
+ACCOUNTANT_V2_FLAG: constant(uint256) = 2**160
+# ERC165 interface id of `IAccountantV2`.
+ACCOUNTANT_V2_INTERFACE_ID: constant(bytes4) = method_id(
+    "report(address,uint256,uint256,(uint256,uint256,uint256,uint256),uint256,uint256)",
+    output_type=bytes4
+)
 # The version of this vault.
 API_VERSION: constant(String[28]) = "1.0.0"
 
@@ -207,13 +248,28 @@ asset: public(address)
 decimals: public(uint8)
 # Deployer contract used to retrieve the protocol fee config.
 factory: address
+# Cached protocol fee config packed into one slot as, from the top,
+# factory feeConfigEpoch + 1 (80 bits) | feeBps (16 bits) | feeRecipient (160 bits).
+_protocolFeeConfig: uint256
 
 # HashMap that records all the strategies that are allowed to receive assets from the vault.
-strategies: public(HashMap[address, StrategyParams])
-# The current default withdrawal queue.
-defaultQueue: public(DynArray[address, MAX_QUEUE])
+# Packed as activation (40 bits) | lastReport (40 bits) | currentDebt (128 bits).
+_strategies: HashMap[address, uint256]
+# The max assets each strategy can hold.
+_maxDebt: HashMap[address, uint256]
+# The current default withdrawal queue stored as a circular doubly linked list.
+# strategy -> next strategy in the queue. QUEUE_SENTINEL -> first strategy.
+_queueNext: HashMap[address, address]
+# strategy -> previous strategy in the queue. QUEUE_SENTINEL -> last strategy.
+_queuePrev: HashMap[address, address]
+# Amount of strategies in the default queue.
+_queueLength: uint256
 # Should the vault use the defaultQueue regardless whats passed in.
 useDefaultQueue: public(bool)
+# Liquidity of each strategy as of its last report or debt decrease.
+# Packed as lastSnapshot (40 bits) | lossRatio (40 bits) | withdrawable
+# (128 bits), see `VaultLens.maxWithdrawFromSnapshot`.
+strategyLiquidity: public(HashMap[address, uint256])
 
 ### ACCOUNTING ###
 # ERC20 - amount of shares per account
@@ -222,18 +278,19 @@ _balanceOf: HashMap[address, uint256]
 allowance: public(HashMap[address, HashMap[address, uint256]])
 # Total amount of shares that are currently minted including those locked.
 _totalSupply: uint256
-# Total amount of assets that has been deposited in strategies.
-_totalDebt: uint256
-# Current assets held in the vault contract. Replacing balanceOf(this) to avoid pricePerShare manipulation.
-_totalIdle: uint256
+# Total amount of assets that has been deposited in strategies and the current assets
+# held in the vault contract, replacing balanceOf(this) to avoid pricePerShare manipulation.
+# Packed as totalDebt (128 bits) | totalIdle (128 bits).
+_totals: uint256
 # Minimum amount of assets that should be kept in the vault contract to allow for fast, cheap redeems.
 minimumTotalIdle: public(uint256)
 # Maximum amount of tokens that the vault can accept. If totalAssets > depositLimit, deposits will revert.
 depositLimit: public(uint256)
 
 ### PERIPHERY ###
-# Contract that charges fees and can give refunds.
-accountant: public(address)
+# Contract that charges fees and can give refunds. The bit above the
+# address is set if it supports `IAccountantV2`.
+_accountant: uint256
 # Contract to control the deposit limit.
 depositLimitModule: public(address)
 # Contract to control the withdraw limit.
@@ -254,14 +311,20 @@ symbol: public(String[32])
 
 # State of the vault - if set to true, only withdrawals will be available. It can't be reverted.
 shutdown: bool
-# The amount of time profits will unlock over.
-_profitMaxUnlockTime: uint256
-# The timestamp of when the current unlocking period ends.
-_fullProfitUnlockDate: uint256
-# The per second rate at which profit will unlock.
-_profitUnlockingRate: uint256
-# Last timestamp of the most recent profitable report.
-_lastProfitUpdate: uint256
+# The profit unlocking state packed as, from the top:
+# - fullProfitUnlockDate (40 bits): When the current unlocking period ends.
+# - lastProfitUpdate (40 bits): Last timestamp of the most recent profitable report.
+# - profitMaxUnlockTime (32 bits): The amount of time profits will unlock over.
+# - profitUnlockingRate (144 bits): The per second rate at which profit will unlock.
+_profitUnlock: uint256
+# Ring buffer of the accounting right after each report, indexed by
+# report number % MAX_CHECKPOINTS. Each checkpoint is
+# [totalAssets (128 bits) | totalSupply (128 bits), profitUnlock] where
+# profitUnlock is packed as `_profitUnlock` with lastProfitUpdate set
+# to the time of the report.
+reportCheckpoints: public(HashMap[uint256, uint256[2]])
+# The amount of reports checkpointed so far.
+reportCheckpointCount: public(uint256)
 
 # `nonces` track `permit` approvals with signature.
 nonces: public(HashMap[address, uint256])
@@ -296,9 +359,9 @@ def initialize(
     @param profitMaxUnlockTime
         The amount of time that the profit will be locked for
     """
-    assert self.asset == empty(address), "initialized"
-    assert asset != empty(address), "ZERO ADDRESS"
-    assert roleManager != empty(address), "ZERO ADDRESS"
+    self._assert(self.asset == empty(address), "initialized")
+    self._assertNotZero(asset)
+    self._assertNotZero(roleManager)
 
     self.asset = asset
     # Get the decimals for the vault to use.
@@ -309,12 +372,16 @@ def initialize(
 
     # Must be less than one year for report cycles
     assert profitMaxUnlockTime <= 31_556_952 # dev: profit unlock time too long
-    self._profitMaxUnlockTime = profitMaxUnlockTime
+    self._setProfitUnlock(0, 0, profitMaxUnlockTime, 0)
 
     self.name = name
     self.symbol = symbol
     self.roleManager = roleManager
 
+    # Start with an empty default queue.
+    self._queueNext[QUEUE_SENTINEL] = QUEUE_SENTINEL
+    self._queuePrev[QUEUE_SENTINEL] = QUEUE_SENTINEL
+
 ## SHARE MANAGEMENT ##
 ## ERC20 ##
 @internal
@@ -327,18 +394,13 @@ def _spendAllowance(owner: address, spender: address, amount: uint256):
 
 @internal
 def _transfer(sender: address, receiver: address, amount: uint256):
+    assert receiver not in [self, empty(address)]
     senderBalance: uint256 = self._balanceOf[sender]
     assert senderBalance >= amount, "insufficient funds"
     self._balanceOf[sender] = unsafe_sub(senderBalance, amount)
     self._balanceOf[receiver] = unsafe_add(self._balanceOf[receiver], amount)
     log Transfer(sender, receiver, amount)
 
-@internal
-def _transferFrom(sender: address, receiver: address, amount: uint256) -> bool:
-    self._spendAllowance(sender, msg.sender, amount)
-    self._transfer(sender, receiver, amount)
-    return True
-
 @internal
 def _approve(owner: address, spender: address, amount: uint256) -> bool:
     self.allowance[owner][spender] = amount
@@ -355,8 +417,8 @@ def _permit(
     r: bytes32, 
     s: bytes32
 ) -> bool:
-    assert owner != empty(address), "invalid owner"
-    assert deadline >= block.timestamp, "permit expired"
+    self._assert(owner != empty(address), "invalid owner")
+    self._assert(deadline >= block.timestamp, "permit expired")
     nonce: uint256 = self.nonces[owner]
     digest: bytes32 = keccak256(
         concat(
@@ -383,6 +445,82 @@ def _permit(
     log Approval(owner, spender, amount)
     return True
 
+## PACKED STATE ##
+@view
+@internal
+def _totalIdle() -> uint256:
+    return self._totals & AMOUNT_MASK
+
+@view
+@internal
+def _totalDebt() -> uint256:
+    return self._totals >> 128
+
+@internal
+def _setTotals(totalIdle: uint256, totalDebt: uint256):
+    """
+    Stores both totals in their shared slot. Reverts if either does
+    not fit in 128 bits.
+    """
+    self._totals = (
+        convert(convert(totalDebt, uint128), uint256) << 128 |
+        convert(convert(totalIdle, uint128), uint256)
+    )
+
+@internal
+def _setProfitUnlock(
+    fullProfitUnlockDate: uint256,
+    lastProfitUpdate: uint256,
+    profitMaxUnlockTime: uint256,
+    profitUnlockingRate: uint256
+):
+    """
+    Stores the profit unlocking state in its shared slot. Timestamps
+    fit 40 bits and the unlock time is capped at a year, only the
+    rate is checked.
+    """
+    self._profitUnlock = (
+        fullProfitUnlockDate << 216 |
+        lastProfitUpdate << 176 |
+        profitMaxUnlockTime << 144 |
+        convert(convert(profitUnlockingRate, uint144), uint256)
+    )
+
+@view
+@internal
+def _currentDebt(strategy: address) -> uint256:
+    return self._strategies[strategy] & AMOUNT_MASK
+
+@view
+@internal
+def _strategyParams(strategy: address) -> StrategyParams:
+    packed: uint256 = self._strategies[strategy]
+    return StrategyParams({
+        activation: packed >> 168,
+        lastReport: (packed >> 128) & TIMESTAMP_MASK,
+        currentDebt: packed & AMOUNT_MASK,
+        maxDebt: self._maxDebt[strategy]
+    })
+
+@internal
+def _setStrategy(strategy: address, activation: uint256, lastReport: uint256, currentDebt: uint256):
+    """
+    Stores the strategies packed params. The timestamps fit 40 bits,
+    reverts if the debt does not fit its 128.
+    """
+    self._strategies[strategy] = (
+        activation << 168 |
+        lastReport << 128 |
+        convert(convert(currentDebt, uint128), uint256)
+    )
+
+@internal
+def _setCurrentDebt(strategy: address, currentDebt: uint256):
+    self._strategies[strategy] = (
+        self._strategies[strategy] & ~AMOUNT_MASK |
+        convert(convert(currentDebt, uint128), uint256)
+    )
+
 @internal
 def _burnShares(shares: uint256, owner: address):
     self._balanceOf[owner] -= shares
@@ -399,13 +537,15 @@ def _unlockedShares() -> uint256:
     minted to the vault which are unlocked gradually over time. Shares 
     that have been locked are gradually unlocked over profitMaxUnlockTime.
     """
-    _fullProfitUnlockDate: uint256 = self._fullProfitUnlockDate
+    profitUnlock: uint256 = self._profitUnlock
+    fullProfitUnlockDate: uint256 = profitUnlock >> 216
     unlockedShares: uint256 = 0
-    if _fullProfitUnlockDate > block.timestamp:
+    if fullProfitUnlockDate > block.timestamp:
         # If we have not fully unlocked, we need to calculate how much has been.
-        unlockedShares = self._profitUnlockingRate * (block.timestamp - self._lastProfitUpdate) / MAX_BPS_EXTENDED
+        lastProfitUpdate: uint256 = (profitUnlock >> 176) & TIMESTAMP_MASK
+        unlockedShares = (profitUnlock & RATE_MASK) * (block.timestamp - lastProfitUpdate) / MAX_BPS_EXTENDED
 
-    elif _fullProfitUnlockDate != 0:
+    elif fullProfitUnlockDate != 0:
         # All shares have been unlocked
         unlockedShares = self._balanceOf[self]
 
@@ -424,41 +564,67 @@ def _totalAssets() -> uint256:
     """
     Total amount of assets that are in the vault and in the strategies. 
     """
-    return self._totalIdle + self._totalDebt
+    totals: uint256 = self._totals
+    return (totals & AMOUNT_MASK) + (totals >> 128)
+
+@view
+@internal
+def _loadAccounting() -> (uint256, uint256, uint256):
+    """
+    Returns the total idle, the total debt and the total supply net of
+    unlocked shares. Entry points load them once, run every conversion
+    in the call on these values and write the totals back once.
+    """
+    totals: uint256 = self._totals
+    return totals & AMOUNT_MASK, totals >> 128, self._totalSupply - self._unlockedShares()
 
 @view
 @internal
 def _convertToAssets(shares: uint256, rounding: Rounding) -> uint256:
+    totalIdle: uint256 = 0
+    totalDebt: uint256 = 0
+    totalSupply: uint256 = 0
+    totalIdle, totalDebt, totalSupply = self._loadAccounting()
+    return self._sharesToAssets(shares, totalIdle + totalDebt, totalSupply, rounding)
+
+@view
+@internal
+def _convertToShares(assets: uint256, rounding: Rounding) -> uint256:
+    totalIdle: uint256 = 0
+    totalDebt: uint256 = 0
+    totalSupply: uint256 = 0
+    totalIdle, totalDebt, totalSupply = self._loadAccounting()
+    return self._assetsToShares(assets, totalIdle + totalDebt, totalSupply, rounding)
+
+@pure
+@internal
+def _sharesToAssets(shares: uint256, totalAssets: uint256, totalSupply: uint256, rounding: Rounding) -> uint256:
     """ 
     assets = shares * (totalAssets / totalSupply) --- (== pricePerShare * shares)
     """
     if shares == max_value(uint256) or shares == 0:
         return shares
 
-    totalSupply: uint256 = self._totalLockedSupply()
     # if totalSupply is 0, pricePerShare is 1
     if totalSupply == 0: 
         return shares
 
-    numerator: uint256 = shares * self._totalAssets()
+    numerator: uint256 = shares * totalAssets
     amount: uint256 = numerator / totalSupply
     if rounding == Rounding.ROUND_UP and numerator % totalSupply != 0:
         amount += 1
 
     return amount
 
-@view
+@pure
 @internal
-def _convertToShares(assets: uint256, rounding: Rounding) -> uint256:
+def _assetsToShares(assets: uint256, totalAssets: uint256, totalSupply: uint256, rounding: Rounding) -> uint256:
     """
     shares = amount * (totalSupply / totalAssets) --- (== amount / pricePerShare)
     """
     if assets == max_value(uint256) or assets == 0:
         return assets
 
-    totalSupply: uint256 = self._totalLockedSupply()
-    totalAssets: uint256 = self._totalAssets()
-
     if totalAssets == 0:
         # if totalAssets and totalSupply is 0, pricePerShare is 1
         if totalSupply == 0:
@@ -500,21 +666,24 @@ def _issueShares(shares: uint256, recipient: address):
     log Transfer(empty(address), recipient, shares)
 
 @internal
-def _issueSharesForAmount(amount: uint256, recipient: address) -> uint256:
+def _issueSharesForAmount(
+    amount: uint256,
+    recipient: address,
+    totalAssets: uint256,
+    totalSupply: uint256
+) -> uint256:
     """
     Issues shares that are worth 'amount' in the underlying token (asset).
-    WARNING: this takes into account that any new assets have been summed 
-    to totalAssets (otherwise pps will go down).
+    WARNING: `totalAssets` and `totalSupply` must be loaded before the
+    new assets are summed to the totals (otherwise pps will go down).
     """
-    totalSupply: uint256 = self._totalLockedSupply()
-    totalAssets: uint256 = self._totalAssets()
     newShares: uint256 = 0
     
     # If no supply PPS = 1.
     if totalSupply == 0:
         newShares = amount
-    elif totalAssets > amount:
-        newShares = amount * totalSupply / (totalAssets - amount)
+    elif totalAssets > 0:
+        newShares = amount * totalSupply / totalAssets
 
     # We don't make the function revert
     if newShares == 0:
@@ -527,7 +696,7 @@ def _issueSharesForAmount(amount: uint256, recipient: address) -> uint256:
 ## ERC4626 ##
 @view
 @internal
-def _maxDeposit(receiver: address) -> uint256: 
+def _maxDeposit(receiver: address, totalAssets: uint256) -> uint256:
     if receiver in [empty(address), self]:
         return 0
 
@@ -541,11 +710,10 @@ def _maxDeposit(receiver: address) -> uint256:
     if (_depositLimit == max_value(uint256)):
         return _depositLimit
 
-    _totalAssets: uint256 = self._totalAssets()
-    if (_totalAssets >= _depositLimit):
+    if (totalAssets >= _depositLimit):
         return 0
 
-    return unsafe_sub(_depositLimit, _totalAssets)
+    return unsafe_sub(_depositLimit, totalAssets)
 
 @view
 @internal
@@ -571,7 +739,11 @@ def _maxWithdraw(
     """
 
     # Get the max amount for the owner if fully liquid.
-    maxAssets: uint256 = self._convertToAssets(self._balanceOf[owner], Rounding.ROUND_DOWN)
+    totalIdle: uint256 = 0
+    totalDebt: uint256 = 0
+    totalSupply: uint256 = 0
+    totalIdle, totalDebt, totalSupply = self._loadAccounting()
+    maxAssets: uint256 = self._sharesToAssets(self._balanceOf[owner], totalIdle + totalDebt, totalSupply, Rounding.ROUND_DOWN)
 
     # If there is a withdraw limit module use that.
     withdrawLimitModule: address = self.withdrawLimitModule
@@ -584,39 +756,52 @@ def _maxWithdraw(
         )
     
     # See if we have enough idle to service the withdraw.
-    currentIdle: uint256 = self._totalIdle
-    if maxAssets > currentIdle:
+    if maxAssets > totalIdle:
         # Track how much we can pull.
-        have: uint256 = currentIdle
+        have: uint256 = totalIdle
         loss: uint256 = 0
 
-        # Cache the default queue.
-        _strategies: DynArray[address, MAX_QUEUE] = self.defaultQueue
-
         # If a custom queue was passed, and we don't force the default queue.
-        if len(strategies) != 0 and not self.useDefaultQueue:
-            # Use the custom queue.
-            _strategies = strategies
+        useCustomQueue: bool = len(strategies) != 0 and not self.useDefaultQueue
+        # Cursor into the default queue.
+        strategy: address = QUEUE_SENTINEL
+
+        for i in range(MAX_QUEUE):
+            # Move to the next strategy in whichever queue we are using.
+            if useCustomQueue:
+                if i == len(strategies):
+                    break
+                strategy = strategies[i]
+            else:
+                strategy = self._queueNext[strategy]
+                if strategy == QUEUE_SENTINEL:
+                    break
 
-        for strategy in _strategies:
             # Can't use an invalid strategy.
-            assert self.strategies[strategy].activation != 0, "inactive strategy"
+            self._assertActive(strategy)
+
+            # The current debt the strategy has.
+            currentDebt: uint256 = self._currentDebt(strategy)
 
             # Get the maximum amount the vault would withdraw from the strategy.
             toWithdraw: uint256 = min(
                 # What we still need for the full withdraw.
                 maxAssets - have, 
-                # The current debt the strategy has.
-                self.strategies[strategy].currentDebt
+                currentDebt
             )
 
+            # If 0 move on to the next strategy.
+            if toWithdraw == 0:
+                continue
+
+            # Quote the vaults position in the strategy once.
+            quote: StrategyQuote = self._quoteStrategy(strategy)
+
             # Get any unrealised loss for the strategy.
-            unrealisedLoss: uint256 = self._assessShareOfUnrealisedLosses(strategy, toWithdraw)
+            unrealisedLoss: uint256 = self._shareOfUnrealisedLosses(currentDebt, quote.assets, toWithdraw)
 
             # See if any limit is enforced by the strategy.
-            strategyLimit: uint256 = IStrategy(strategy).convertToAssets(
-                IStrategy(strategy).maxRedeem(self)
-            )
+            strategyLimit: uint256 = quote.withdrawable
 
             # Adjust accordingly if there is a max withdraw limit.
             realizableWithdraw: uint256 = toWithdraw - unrealisedLoss
@@ -655,6 +840,37 @@ def _maxWithdraw(
 
     return maxAssets
 
+@pure
+@internal
+def _assert(condition: bool, reason: String[32]):
+    """
+    Reverts with `reason` if `condition` does not hold. Used outside of
+    the deposit and withdraw paths so each check does not inline its
+    own revert.
+    """
+    assert condition, reason
+
+@pure
+@internal
+def _assertNotZero(account: address):
+    """
+    Reverts if `account` is the zero address.
+    """
+    assert account != empty(address), "ZERO ADDRESS"
+
+@internal
+def _receiveDeposit(recipient: address, assets: uint256, totalIdle: uint256, totalDebt: uint256):
+    """
+    Checks the deposit limit for `recipient` and pulls `assets` from
+    the caller into the vaults idle funds.
+    """
+    assert assets <= self._maxDeposit(recipient, totalIdle + totalDebt), "exceed deposit limit"
+
+    # Transfer the tokens to the vault first.
+    self._erc20SafeTransferFrom(self.asset, msg.sender, self, assets)
+    # Record the change in total assets.
+    self._setTotals(totalIdle + assets, totalDebt)
+
 @internal
 def _deposit(sender: address, recipient: address, assets: uint256) -> uint256:
     """
@@ -663,15 +879,14 @@ def _deposit(sender: address, recipient: address, assets: uint256) -> uint256:
     vault accounting.
     """
     assert self.shutdown == False # dev: shutdown
-    assert assets <= self._maxDeposit(recipient), "exceed deposit limit"
- 
-    # Transfer the tokens to the vault first.
-    self._erc20SafeTransferFrom(self.asset, msg.sender, self, assets)
-    # Record the change in total assets.
-    self._totalIdle += assets
+    totalIdle: uint256 = 0
+    totalDebt: uint256 = 0
+    totalSupply: uint256 = 0
+    totalIdle, totalDebt, totalSupply = self._loadAccounting()
+    self._receiveDeposit(recipient, assets, totalIdle, totalDebt)
     
     # Issue the corresponding shares for assets.
-    shares: uint256 = self._issueSharesForAmount(assets, recipient)
+    shares: uint256 = self._issueSharesForAmount(assets, recipient, totalIdle + totalDebt, totalSupply)
 
     assert shares > 0, "cannot mint zero"
 
@@ -686,16 +901,15 @@ def _mint(sender: address, recipient: address, shares: uint256) -> uint256:
     accounting.
     """
     assert self.shutdown == False # dev: shutdown
+    totalIdle: uint256 = 0
+    totalDebt: uint256 = 0
+    totalSupply: uint256 = 0
+    totalIdle, totalDebt, totalSupply = self._loadAccounting()
     # Get corresponding amount of assets.
-    assets: uint256 = self._convertToAssets(shares, Rounding.ROUND_UP)
+    assets: uint256 = self._sharesToAssets(shares, totalIdle + totalDebt, totalSupply, Rounding.ROUND_UP)
 
     assert assets > 0, "cannot deposit zero"
-    assert assets <= self._maxDeposit(recipient), "exceed deposit limit"
-
-    # Transfer the tokens to the vault first.
-    self._erc20SafeTransferFrom(self.asset, msg.sender, self, assets)
-    # Record the change in total assets.
-    self._totalIdle += assets
+    self._receiveDeposit(recipient, assets, totalIdle, totalDebt)
     
     # Issue the corresponding shares for assets.
     self._issueShares(shares, recipient)
@@ -703,9 +917,61 @@ def _mint(sender: address, recipient: address, shares: uint256) -> uint256:
     log Deposit(sender, recipient, assets, shares)
     return assets
 
+@pure
+@internal
+def _assertLossWithin(expected: uint256, received: uint256, maxLoss: uint256):
+    """
+    Reverts if receiving `received` instead of `expected` is a loss
+    above `maxLoss`. A `maxLoss` of MAX_BPS accepts any loss.
+    """
+    if received < expected and maxLoss < MAX_BPS:
+        assert unsafe_sub(expected, received) <= expected * maxLoss / MAX_BPS, "too much loss"
+
 @view
 @internal
-def _assessShareOfUnrealisedLosses(strategy: address, assetsNeeded: uint256) -> uint256:
+def _quoteStrategy(strategy: address) -> StrategyQuote:
+    """
+    Returns the vaults current position in a strategy.
+
+    Everything the withdraw logic needs to know from the strategy is
+    fetched here once so it can be reused without calling back into
+    the strategy for the same values.
+    """
+    shares: uint256 = IStrategy(strategy).balanceOf(self)
+    assets: uint256 = IStrategy(strategy).convertToAssets(shares)
+    # We can never redeem more than we hold.
+    redeemable: uint256 = min(IStrategy(strategy).maxRedeem(self), shares)
+
+    # Only need to convert again if the strategy is limiting us.
+    withdrawable: uint256 = assets
+    if redeemable < shares:
+        withdrawable = IStrategy(strategy).convertToAssets(redeemable)
+
+    return StrategyQuote({
+        shares: shares,
+        assets: assets,
+        withdrawable: withdrawable
+    })
+
+@internal
+def _recordLiquidity(strategy: address, currentDebt: uint256, assets: uint256, withdrawable: uint256):
+    """
+    Stores how liquid the vaults position in `strategy` is so withdraw
+    limits can be estimated later without calling the strategy.
+    """
+    lossRatio: uint256 = 0
+    if assets < currentDebt:
+        lossRatio = unsafe_sub(currentDebt, assets) * MAX_BPS_EXTENDED / currentDebt
+
+    self.strategyLiquidity[strategy] = block.timestamp << 168 | lossRatio << 128 | min(withdrawable, AMOUNT_MASK)
+
+@pure
+@internal
+def _shareOfUnrealisedLosses(
+    strategyCurrentDebt: uint256, 
+    strategyAssets: uint256, 
+    assetsNeeded: uint256
+) -> uint256:
     """
     Returns the share of losses that a user would take if withdrawing from this strategy
     This accounts for losses that have been realized at the strategy level but not yet
@@ -713,13 +979,9 @@ def _assessShareOfUnrealisedLosses(strategy: address, assetsNeeded: uint256) ->
 
     e.g. if the strategy has unrealised losses for 10% of its current debt and the user 
     wants to withdraw 1_000 tokens, the losses that they will take is 100 token
+
+    `strategyAssets` is the actual amount that the debt is currently worth.
     """
-    # Minimum of how much debt the debt should be worth.
-    strategyCurrentDebt: uint256 = self.strategies[strategy].currentDebt
-    # The actual amount that the debt is currently worth.
-    vaultShares: uint256 = IStrategy(strategy).balanceOf(self)
-    strategyAssets: uint256 = IStrategy(strategy).convertToAssets(vaultShares)
-    
     # If no losses, return 0
     if strategyAssets >= strategyCurrentDebt or strategyCurrentDebt == 0:
         return 0
@@ -735,19 +997,20 @@ def _assessShareOfUnrealisedLosses(strategy: address, assetsNeeded: uint256) ->
     return usersShareOfLoss
 
 @internal
-def _withdrawFromStrategy(strategy: address, assetsToWithdraw: uint256):
+def _withdrawFromStrategy(strategy: address, assetsToWithdraw: uint256, sharesHeld: uint256):
     """
     This takes the amount denominated in asset and performs a {redeem}
     with the corresponding amount of shares.
 
     We use {redeem} to natively take on losses without additional non-4626 standard parameters.
+    `sharesHeld` is the vaults current balance of strategy shares.
     """
     # Need to get shares since we use redeem to be able to take on losses.
     sharesToRedeem: uint256 = min(
         # Use previewWithdraw since it should round up.
         IStrategy(strategy).previewWithdraw(assetsToWithdraw), 
         # And check against our actual balance.
-        IStrategy(strategy).balanceOf(self)
+        sharesHeld
     )
     # Redeem the shares.
     IStrategy(strategy).redeem(sharesToRedeem, self, self)
@@ -760,7 +1023,9 @@ def _redeem(
     assets: uint256,
     shares: uint256, 
     maxLoss: uint256,
-    strategies: DynArray[address, MAX_QUEUE]
+    strategies: DynArray[address, MAX_QUEUE],
+    totalIdle: uint256,
+    totalDebt: uint256
 ) -> uint256:
     """
     This will attempt to free up the full amount of assets equivalent to
@@ -776,7 +1041,7 @@ def _redeem(
     to the user that is redeeming their vault shares unless it exceeds the given
     `maxLoss`.
     """
-    assert receiver != empty(address), "ZERO ADDRESS"
+    self._assertNotZero(receiver)
     assert shares > 0, "no shares to redeem"
     assert assets > 0, "no assets to withdraw"
     assert maxLoss <= MAX_BPS, "max loss"
@@ -794,24 +1059,19 @@ def _redeem(
     # The amount of the underlying token to withdraw.
     requestedAssets: uint256 = assets
 
-    # load to memory to save gas
-    currentTotalIdle: uint256 = self._totalIdle
+    # The totals as loaded by the caller.
+    currentTotalIdle: uint256 = totalIdle
+    currentTotalDebt: uint256 = totalDebt
     _asset: address = self.asset
 
     # If there are not enough assets in the Vault contract, we try to free
     # funds from strategies.
     if requestedAssets > currentTotalIdle:
 
-        # Cache the default queue.
-        _strategies: DynArray[address, MAX_QUEUE] = self.defaultQueue
-
         # If a custom queue was passed, and we don't force the default queue.
-        if len(strategies) != 0 and not self.useDefaultQueue:
-            # Use the custom queue.
-            _strategies = strategies
-
-        # load to memory to save gas
-        currentTotalDebt: uint256 = self._totalDebt
+        useCustomQueue: bool = len(strategies) != 0 and not self.useDefaultQueue
+        # Cursor into the default queue.
+        strategy: address = QUEUE_SENTINEL
 
         # Withdraw from strategies only what idle doesn't cover.
         # `assetsNeeded` is the total amount we need to fill the request.
@@ -822,21 +1082,37 @@ def _redeem(
         # To compare against real withdrawals from strategies
         previousBalance: uint256 = ERC20(_asset).balanceOf(self)
 
-        for strategy in _strategies:
+        for i in range(MAX_QUEUE):
+            # Move to the next strategy in whichever queue we are using.
+            # The default queue is only read as far as we need to go.
+            if useCustomQueue:
+                if i == len(strategies):
+                    break
+                strategy = strategies[i]
+            else:
+                strategy = self._queueNext[strategy]
+                if strategy == QUEUE_SENTINEL:
+                    break
+
             # Make sure we have a valid strategy.
-            assert self.strategies[strategy].activation != 0, "inactive strategy"
+            self._assertActive(strategy)
 
             # How much should the strategy have.
-            currentDebt: uint256 = self.strategies[strategy].currentDebt
+            currentDebt: uint256 = self._currentDebt(strategy)
 
             # What is the max amount to withdraw from this strategy.
             assetsToWithdraw = min(assetsNeeded, currentDebt)
 
+            # Nothing to pull, no need to call the strategy.
+            if assetsToWithdraw == 0:
+                continue
+
+            # Quote the vaults position once and reuse it for the whole iteration.
+            quote: StrategyQuote = self._quoteStrategy(strategy)
+
             # Cache maxWithdraw now for use if unrealized loss > 0
             # Use maxRedeem and convert it since we use redeem.
-            maxWithdraw: uint256 = IStrategy(strategy).convertToAssets(
-                IStrategy(strategy).maxRedeem(self)
-            )
+            maxWithdraw: uint256 = quote.withdrawable
 
             # CHECK FOR UNREALISED LOSSES
             # If unrealised losses > 0, then the user will take the proportional share 
@@ -844,7 +1120,7 @@ def _redeem(
             # NOTE: strategies need to manage the fact that realising part of the loss can 
             # mean the realisation of 100% of the loss!! (i.e. if for withdrawing 10% of the
             # strategy it needs to unwind the whole position, generated losses might be bigger)
-            unrealisedLossesShare: uint256 = self._assessShareOfUnrealisedLosses(strategy, assetsToWithdraw)
+            unrealisedLossesShare: uint256 = self._shareOfUnrealisedLosses(currentDebt, quote.assets, assetsToWithdraw)
             if unrealisedLossesShare > 0:
                 # If max withdraw is limiting the amount to pull, we need to adjust the portion of 
                 # the unrealized loss the user should take.
@@ -871,7 +1147,7 @@ def _redeem(
                     newDebt: uint256 = currentDebt - unrealisedLossesShare
         
                     # Update strategies storage
-                    self.strategies[strategy].currentDebt = newDebt
+                    self._setCurrentDebt(strategy, newDebt)
                     # Log the debt update
                     log DebtUpdated(strategy, currentDebt, newDebt)
 
@@ -883,7 +1159,7 @@ def _redeem(
                 continue
             
             # WITHDRAW FROM STRATEGY
-            self._withdrawFromStrategy(strategy, assetsToWithdraw)
+            self._withdrawFromStrategy(strategy, assetsToWithdraw, quote.shares)
             postBalance: uint256 = ERC20(_asset).balanceOf(self)
             
             # Always check against the real amounts.
@@ -913,7 +1189,7 @@ def _redeem(
             newDebt: uint256 = currentDebt - (assetsToWithdraw + unrealisedLossesShare)
         
             # Update strategies storage
-            self.strategies[strategy].currentDebt = newDebt
+            self._setCurrentDebt(strategy, newDebt)
             # Log the debt update
             log DebtUpdated(strategy, currentDebt, newDebt)
 
@@ -930,18 +1206,14 @@ def _redeem(
 
         # If we exhaust the queue and still have insufficient total idle, revert.
         assert currentTotalIdle >= requestedAssets, "insufficient assets in vault"
-        # Commit memory to storage.
-        self._totalDebt = currentTotalDebt
 
-    # Check if there is a loss and a non-default value was set.
-    if assets > requestedAssets and maxLoss < MAX_BPS:
-        # Assure the loss is within the allowed range.
-        assert assets - requestedAssets <= assets * maxLoss / MAX_BPS, "too much loss"
+    # Check if there is a loss and it is within the allowed range.
+    self._assertLossWithin(assets, requestedAssets, maxLoss)
 
     # First burn the corresponding shares from the redeemer.
     self._burnShares(shares, owner)
     # Commit memory to storage.
-    self._totalIdle = currentTotalIdle - requestedAssets
+    self._setTotals(currentTotalIdle - requestedAssets, currentTotalDebt)
     # Transfer the requested amount to the receiver.
     self._erc20SafeTransfer(_asset, receiver, requestedAssets)
 
@@ -951,60 +1223,77 @@ def _redeem(
 ## STRATEGY MANAGEMENT ##
 @internal
 def _addStrategy(newStrategy: address, addToQueue: bool):
-    assert newStrategy not in [self, empty(address)], "strategy cannot be zero address"
-    assert IStrategy(newStrategy).asset() == self.asset, "invalid asset"
-    assert self.strategies[newStrategy].activation == 0, "strategy already active"
+    self._assert(newStrategy not in [self, empty(address)], "strategy cannot be zero address")
+    self._assert(IStrategy(newStrategy).asset() == self.asset, "invalid asset")
+    self._assert(self._strategies[newStrategy] == 0, "strategy already active")
 
     # Add the new strategy to the mapping.
-    self.strategies[newStrategy] = StrategyParams({
-        activation: block.timestamp,
-        lastReport: block.timestamp,
-        currentDebt: 0,
-        maxDebt: 0
-    })
+    self._setStrategy(newStrategy, block.timestamp, block.timestamp, 0)
 
     # If we are adding to the queue and the default queue has space, add the strategy.
-    if addToQueue and len(self.defaultQueue) < MAX_QUEUE:
-        self.defaultQueue.append(newStrategy)        
-        
+    if addToQueue and self._queueLength < MAX_QUEUE:
+        self._appendToQueue(newStrategy)
+
     log StrategyChanged(newStrategy, StrategyChangeType.ADDED)
 
 @internal
 def _revokeStrategy(strategy: address, force: bool=False):
-    assert self.strategies[strategy].activation != 0, "strategy not active"
+    self._assert(self._strategies[strategy] != 0, "strategy not active")
 
     # If force revoking a strategy, it will cause a loss.
-    loss: uint256 = 0
+    # Vault realizes the full loss of outstanding debt.
+    loss: uint256 = self._currentDebt(strategy)
     
-    if self.strategies[strategy].currentDebt != 0:
-        assert force, "strategy has debt"
-        # Vault realizes the full loss of outstanding debt.
-        loss = self.strategies[strategy].currentDebt
+    if loss != 0:
+        self._assert(force, "strategy has debt")
         # Adjust total vault debt.
-        self._totalDebt -= loss
+        self._setTotals(self._totalIdle(), self._totalDebt() - loss)
 
         log StrategyReported(strategy, 0, loss, 0, 0, 0, 0)
 
     # Set strategy params all back to 0 (WARNING: it can be re-added).
-    self.strategies[strategy] = StrategyParams({
-      activation: 0,
-      lastReport: 0,
-      currentDebt: 0,
-      maxDebt: 0
-    })
+    self._strategies[strategy] = 0
+    self._maxDebt[strategy] = 0
 
     # Remove strategy if it is in the default queue.
-    newQueue: DynArray[address, MAX_QUEUE] = []
-    for _strategy in self.defaultQueue:
-        # Add all strategies to the new queue besides the one revoked.
-        if _strategy != strategy:
-            newQueue.append(_strategy)
-        
-    # Set the default queue to our updated queue.
-    self.defaultQueue = newQueue
+    if self._queueNext[strategy] != empty(address):
+        self._removeFromQueue(strategy)
 
     log StrategyChanged(strategy, StrategyChangeType.REVOKED)
 
+@view
+@internal
+def _assertActive(strategy: address):
+    """
+    Reverts if `strategy` has not been added to the vault.
+    """
+    assert self._strategies[strategy] != 0, "inactive strategy"
+
+@internal
+def _appendToQueue(strategy: address):
+    """
+    Links `strategy` to the end of the default queue.
+    """
+    last: address = self._queuePrev[QUEUE_SENTINEL]
+    self._queueNext[last] = strategy
+    self._queueNext[strategy] = QUEUE_SENTINEL
+    self._queuePrev[strategy] = last
+    self._queuePrev[QUEUE_SENTINEL] = strategy
+    self._queueLength += 1
+
+@internal
+def _removeFromQueue(strategy: address):
+    """
+    Unlinks `strategy` from the default queue.
+    """
+    previous: address = self._queuePrev[strategy]
+    next: address = self._queueNext[strategy]
+    self._queueNext[previous] = next
+    self._queuePrev[next] = previous
+    self._queueNext[strategy] = empty(address)
+    self._queuePrev[strategy] = empty(address)
+    self._queueLength -= 1
+
 # DEBT MANAGEMENT #
 @internal
 def _updateDebt(strategy: address, targetDebt: uint256, maxLoss: uint256) -> uint256:
@@ -1020,21 +1309,24 @@ def _updateDebt(strategy: address, targetDebt: uint256, maxLoss: uint256) -> uin
     # How much we want the strategy to have.
     newDebt: uint256 = targetDebt
     # How much the strategy currently has.
-    currentDebt: uint256 = self.strategies[strategy].currentDebt
+    currentDebt: uint256 = self._currentDebt(strategy)
 
     # If the vault is shutdown we can only pull funds.
     if self.shutdown:
         newDebt = 0
 
-    assert newDebt != currentDebt, "new debt equals current debt"
+    self._assert(newDebt != currentDebt, "new debt equals current debt")
 
     if currentDebt > newDebt:
         # Reduce debt.
         assetsToWithdraw: uint256 = unsafe_sub(currentDebt, newDebt)
 
+        # Quote the vaults position in the strategy once.
+        quote: StrategyQuote = self._quoteStrategy(strategy)
+
         # Ensure we always have minimumTotalIdle when updating debt.
         minimumTotalIdle: uint256 = self.minimumTotalIdle
-        totalIdle: uint256 = self._totalIdle
+        totalIdle: uint256 = self._totalIdle()
         
         # Respect minimum total idle in vault
         if totalIdle + assetsToWithdraw < minimumTotalIdle:
@@ -1045,55 +1337,59 @@ def _updateDebt(strategy: address, targetDebt: uint256, maxLoss: uint256) -> uin
 
         # Check how much we are able to withdraw.
         # Use maxRedeem and convert since we use redeem.
-        withdrawable: uint256 = IStrategy(strategy).convertToAssets(
-            IStrategy(strategy).maxRedeem(self)
-        )
-        assert withdrawable != 0, "nothing to withdraw"
+        withdrawable: uint256 = quote.withdrawable
+        self._assert(withdrawable != 0, "nothing to withdraw")
 
         # If insufficient withdrawable, withdraw what we can.
         if withdrawable < assetsToWithdraw:
             assetsToWithdraw = withdrawable
 
         # If there are unrealised losses we don't let the vault reduce its debt until there is a new report
-        unrealisedLossesShare: uint256 = self._assessShareOfUnrealisedLosses(strategy, assetsToWithdraw)
-        assert unrealisedLossesShare == 0, "strategy has unrealised losses"
+        unrealisedLossesShare: uint256 = self._shareOfUnrealisedLosses(currentDebt, quote.assets, assetsToWithdraw)
+        self._assert(unrealisedLossesShare == 0, "strategy has unrealised losses")
         
         # Cache for repeated use.
         _asset: address = self.asset
 
         # Always check the actual amount withdrawn.
         preBalance: uint256 = ERC20(_asset).balanceOf(self)
-        self._withdrawFromStrategy(strategy, assetsToWithdraw)
+        self._withdrawFromStrategy(strategy, assetsToWithdraw, quote.shares)
         postBalance: uint256 = ERC20(_asset).balanceOf(self)
         
         # making sure we are changing idle according to the real result no matter what. 
         # We pull funds with {redeem} so there can be losses or rounding differences.
         withdrawn: uint256 = min(postBalance - preBalance, currentDebt)
 
-        # If we didn't get the amount we asked for and there is a max loss.
-        if withdrawn < assetsToWithdraw and maxLoss < MAX_BPS:
-            # Make sure the loss is within the allowed range.
-            assert assetsToWithdraw - withdrawn <= assetsToWithdraw * maxLoss / MAX_BPS, "too much loss"
+        # If we didn't get the amount we asked for make sure the loss is within the allowed range.
+        self._assertLossWithin(assetsToWithdraw, withdrawn, maxLoss)
 
         # If we got too much make sure not to increase PPS.
-        elif withdrawn > assetsToWithdraw:
+        if withdrawn > assetsToWithdraw:
             assetsToWithdraw = withdrawn
 
-        # Update storage.
-        self._totalIdle += withdrawn # actual amount we got.
-        # Amount we tried to withdraw in case of losses
-        self._totalDebt -= assetsToWithdraw 
+        # Update storage. Idle by the actual amount we got and debt
+        # by the amount we tried to withdraw in case of losses.
+        self._setTotals(totalIdle + withdrawn, self._totalDebt() - assetsToWithdraw)
 
         newDebt = currentDebt - assetsToWithdraw
+
+        # Record what is left of the position, the redeemed shares are
+        # no longer part of it.
+        self._recordLiquidity(
+            strategy,
+            newDebt,
+            quote.assets - min(assetsToWithdraw, quote.assets),
+            withdrawable - min(assetsToWithdraw, withdrawable)
+        )
     else: 
         # We are increasing the strategies debt
 
         # Revert if targetDebt cannot be achieved due to configured maxDebt for given strategy
-        assert newDebt <= self.strategies[strategy].maxDebt, "target debt higher than max debt"
+        self._assert(newDebt <= self._maxDebt[strategy], "target debt higher than max debt")
 
         # Vault is increasing debt with the strategy by sending more funds.
         maxDeposit: uint256 = IStrategy(strategy).maxDeposit(self)
-        assert maxDeposit != 0, "nothing to deposit"
+        self._assert(maxDeposit != 0, "nothing to deposit")
 
         # Deposit the difference between desired and current.
         assetsToDeposit: uint256 = newDebt - currentDebt
@@ -1103,9 +1399,9 @@ def _updateDebt(strategy: address, targetDebt: uint256, maxLoss: uint256) -> uin
         
         # Ensure we always have minimumTotalIdle when updating debt.
         minimumTotalIdle: uint256 = self.minimumTotalIdle
-        totalIdle: uint256 = self._totalIdle
+        totalIdle: uint256 = self._totalIdle()
 
-        assert totalIdle > minimumTotalIdle, "no funds to deposit"
+        self._assert(totalIdle > minimumTotalIdle, "no funds to deposit")
         availableIdle: uint256 = unsafe_sub(totalIdle, minimumTotalIdle)
 
         # If insufficient funds to deposit, transfer only what is free.
@@ -1133,20 +1429,48 @@ def _updateDebt(strategy: address, targetDebt: uint256, maxLoss: uint256) -> uin
             assetsToDeposit = preBalance - postBalance
 
             # Update storage.
-            self._totalIdle -= assetsToDeposit
-            self._totalDebt += assetsToDeposit
+            self._setTotals(totalIdle - assetsToDeposit, self._totalDebt() + assetsToDeposit)
 
         newDebt = currentDebt + assetsToDeposit
 
     # Commit memory to storage.
-    self.strategies[strategy].currentDebt = newDebt
+    self._setCurrentDebt(strategy, newDebt)
 
     log DebtUpdated(strategy, currentDebt, newDebt)
     return newDebt
 
 ## ACCOUNTING MANAGEMENT ##
 @internal
-def _processReport(strategy: address) -> (uint256, uint256):
+def _syncProtocolFeeConfig() -> (uint16, address):
+    """
+    Returns the protocol fee config for this vault from the local cache.
+    The factory bumps its `feeConfigEpoch` on every fee config change,
+    so the full config is only fetched again when the epoch has moved.
+    """
+    factory: address = self.factory
+    # Offset by one so an empty cache never matches.
+    epoch: uint256 = IFactory(factory).feeConfigEpoch() + 1
+    cached: uint256 = self._protocolFeeConfig
+
+    if cached >> 176 == epoch:
+        return (
+            convert((cached >> 160) & FEE_BPS_MASK, uint16),
+            convert(convert(cached & ADDRESS_MASK, uint160), address)
+        )
+
+    protocolFeeBps: uint16 = 0
+    protocolFeeRecipient: address = empty(address)
+    protocolFeeBps, protocolFeeRecipient = IFactory(factory).protocolFeeConfig()
+
+    self._protocolFeeConfig = (
+        epoch << 176 |
+        convert(protocolFeeBps, uint256) << 160 |
+        convert(protocolFeeRecipient, uint256)
+    )
+    return (protocolFeeBps, protocolFeeRecipient)
+
+@internal
+def _processReports(strategies: DynArray[address, MAX_QUEUE]) -> (uint256, uint256):
     """
     Processing a report means comparing the debt that the strategy has taken 
     with the current amount of funds it is reporting. If the strategy owes 
@@ -1162,48 +1486,93 @@ def _processReport(strategy: address) -> (uint256, uint256):
 
     Any applicable fees are charged and distributed during the report as well
     to the specified recipients.
-    """
-    # Make sure we have a valid strategy.
-    assert self.strategies[strategy].activation != 0, "inactive strategy"
-
-    # Vault assesses profits using 4626 compliant interface. 
-    # NOTE: It is important that a strategies `convertToAssets` implementation
-    # cannot be manipulated or else the vault could report incorrect gains/losses.
-    strategyShares: uint256 = IStrategy(strategy).balanceOf(self)
-    # How much the vaults position is worth.
-    totalAssets: uint256 = IStrategy(strategy).convertToAssets(strategyShares)
-    # How much the vault had deposited to the strategy.
-    currentDebt: uint256 = self.strategies[strategy].currentDebt
-
-    gain: uint256 = 0
-    loss: uint256 = 0
 
-    ### Asses Gain or Loss ###
-
-    # Compare reported assets vs. the current debt.
-    if totalAssets > currentDebt:
-        # We have a gain.
-        gain = unsafe_sub(totalAssets, currentDebt)
-    else:
-        # We have a loss.
-        loss = unsafe_sub(currentDebt, totalAssets)
-    
+    Multiple strategies are reported with the vaults shares valued once, 
+    before any of them changes the vaults total assets. Their gains, losses, 
+    fees and refunds are then netted into a single share issuance or burn and 
+    a single update of the profit unlocking schedule.
+    """
     # Cache `asset` for repeated use.
     _asset: address = self.asset
-
-    ### Asses Fees and Refunds ###
-
-    # For Accountant fee assessment.
+    # If accountant is not set, fees and refunds remain unchanged.
+    accountantConfig: uint256 = self._accountant
+    accountant: address = convert(convert(accountantConfig & ADDRESS_MASK, uint160), address)
+    accountantV2: bool = (accountantConfig & ACCOUNTANT_V2_FLAG) != 0
+    # The vaults totals from before the report. Shares are valued on them
+    # and V2 accountants are sent them so they do not need to call back
+    # into the vault.
+    totalIdle: uint256 = 0
+    totalDebt: uint256 = 0
+    vaultSupply: uint256 = 0
+    totalIdle, totalDebt, vaultSupply = self._loadAccounting()
+    vaultAssets: uint256 = totalIdle + totalDebt
+
+    # Totals over all the strategies reported.
+    gain: uint256 = 0
+    loss: uint256 = 0
     totalFees: uint256 = 0
     totalRefunds: uint256 = 0
-    # If accountant is not set, fees and refunds remain unchanged.
-    accountant: address = self.accountant
-    if accountant != empty(address):
-        totalFees, totalRefunds = IAccountant(accountant).report(strategy, gain, loss)
+    # Kept to log each strategies report once the fees are known.
+    reports: DynArray[StrategyReport, MAX_QUEUE] = []
+
+    for strategy in strategies:
+        # Make sure we have a valid strategy.
+        self._assertActive(strategy)
+
+        # Vault assesses profits using 4626 compliant interface. 
+        # NOTE: It is important that a strategies `convertToAssets` implementation
+        # cannot be manipulated or else the vault could report incorrect gains/losses.
+        quote: StrategyQuote = self._quoteStrategy(strategy)
+        # How much the vault had deposited to the strategy.
+        currentDebt: uint256 = self._currentDebt(strategy)
+
+        ### Asses Gain or Loss ###
+
+        # Compare reported assets vs. the current debt.
+        strategyGain: uint256 = 0
+        strategyLoss: uint256 = 0
+        if quote.assets > currentDebt:
+            # We have a gain.
+            strategyGain = unsafe_sub(quote.assets, currentDebt)
+        else:
+            # We have a loss.
+            strategyLoss = unsafe_sub(currentDebt, quote.assets)
 
-        if totalRefunds > 0:
-            # Make sure we have enough approval and enough asset to pull.
-            totalRefunds = min(totalRefunds, min(ERC20(_asset).balanceOf(accountant), ERC20(_asset).allowance(accountant, self)))
+        ### Asses Fees and Refunds ###
+
+        strategyFees: uint256 = 0
+        strategyRefunds: uint256 = 0
+        if accountantV2:
+            strategyFees, strategyRefunds = IAccountantV2(accountant).report(
+                strategy, strategyGain, strategyLoss, self._strategyParams(strategy), vaultAssets, vaultSupply
+            )
+        elif accountant != empty(address):
+            strategyFees, strategyRefunds = IAccountant(accountant).report(strategy, strategyGain, strategyLoss)
+
+        if strategyRefunds > 0:
+            # Make sure we have enough approval and enough asset to pull
+            # on top of the refunds already owed for this batch.
+            available: uint256 = min(ERC20(_asset).balanceOf(accountant), ERC20(_asset).allowance(accountant, self))
+            strategyRefunds = min(strategyRefunds, available - min(available, totalRefunds))
+
+        # Record the strategies new position and report time in one write.
+        # The vaults totals are only updated once all the strategies are assessed.
+        self._setStrategy(strategy, self._strategies[strategy] >> 168, block.timestamp, quote.assets)
+        # And how liquid the now realised position is.
+        self._recordLiquidity(strategy, quote.assets, quote.assets, quote.withdrawable)
+
+        gain += strategyGain
+        loss += strategyLoss
+        totalFees += strategyFees
+        totalRefunds += strategyRefunds
+        reports.append(StrategyReport({
+            strategy: strategy,
+            gain: strategyGain,
+            loss: strategyLoss,
+            currentDebt: quote.assets,
+            totalFees: strategyFees,
+            totalRefunds: strategyRefunds
+        }))
 
     # Total fees to charge in shares.
     totalFeesShares: uint256 = 0
@@ -1217,7 +1586,7 @@ def _processReport(strategy: address) -> (uint256, uint256):
     # Only need to burn shares if there is a loss or fees.
     if loss + totalFees > 0:
         # The amount of shares we will want to burn to offset losses and fees.
-        sharesToBurn = self._convertToShares(loss + totalFees, Rounding.ROUND_UP)
+        sharesToBurn = self._assetsToShares(loss + totalFees, vaultAssets, vaultSupply, Rounding.ROUND_UP)
 
         # If we have fees then get the proportional amount of shares to issue.
         if totalFees > 0:
@@ -1225,7 +1594,7 @@ def _processReport(strategy: address) -> (uint256, uint256):
             totalFeesShares = sharesToBurn * totalFees / (loss + totalFees)
 
             # Get the protocol fee config for this vault.
-            protocolFeeBps, protocolFeeRecipient = IFactory(self.factory).protocolFeeConfig()
+            protocolFeeBps, protocolFeeRecipient = self._syncProtocolFeeConfig()
 
             # If there is a protocol fee.
             if protocolFeeBps > 0:
@@ -1235,17 +1604,19 @@ def _processReport(strategy: address) -> (uint256, uint256):
 
     # Shares to lock is any amount that would otherwise increase the vaults PPS.
     sharesToLock: uint256 = 0
-    profitMaxUnlockTime: uint256 = self._profitMaxUnlockTime
+    profitUnlock: uint256 = self._profitUnlock
+    profitMaxUnlockTime: uint256 = (profitUnlock >> 144) & UNLOCK_TIME_MASK
     # Get the amount we will lock to avoid a PPS increase.
     if gain + totalRefunds > 0 and profitMaxUnlockTime != 0:
-        sharesToLock = self._convertToShares(gain + totalRefunds, Rounding.ROUND_DOWN)
+        sharesToLock = self._assetsToShares(gain + totalRefunds, vaultAssets, vaultSupply, Rounding.ROUND_DOWN)
 
     # The total current supply including locked shares.
     totalSupply: uint256 = self._totalSupply
     # The total shares the vault currently owns. Both locked and unlocked.
     totalLockedShares: uint256 = self._balanceOf[self]
     # Get the desired end amount of shares after all accounting.
-    endingSupply: uint256 = totalSupply + sharesToLock - sharesToBurn - self._unlockedShares()
+    # `vaultSupply` already excludes the unlocked shares.
+    endingSupply: uint256 = vaultSupply + sharesToLock - sharesToBurn
     
     # If we will end with more shares than we have now.
     if endingSupply > totalSupply:
@@ -1269,21 +1640,11 @@ def _processReport(strategy: address) -> (uint256, uint256):
     if totalRefunds > 0:
         # Transfer the refunded amount of asset to the vault.
         self._erc20SafeTransferFrom(_asset, accountant, self, totalRefunds)
-        # Update storage to increase total assets.
-        self._totalIdle += totalRefunds
-
-    # Record any reported gains.
-    if gain > 0:
-        # NOTE: this will increase totalAssets
-        currentDebt = unsafe_add(currentDebt, gain)
-        self.strategies[strategy].currentDebt = currentDebt
-        self._totalDebt += gain
-
-    # Or record any reported loss
-    elif loss > 0:
-        currentDebt = unsafe_sub(currentDebt, loss)
-        self.strategies[strategy].currentDebt = currentDebt
-        self._totalDebt -= loss
+
+    # Record the refunds and the net of any reported gains and losses.
+    # NOTE: this will change totalAssets
+    if totalRefunds > 0 or gain != loss:
+        self._setTotals(totalIdle + totalRefunds, totalDebt + gain - loss)
 
     # Issue shares for fees that were calculated above if applicable.
     if totalFeesShares > 0:
@@ -1298,42 +1659,59 @@ def _processReport(strategy: address) -> (uint256, uint256):
     totalLockedShares = self._balanceOf[self]
     if totalLockedShares > 0:
         previouslyLockedTime: uint256 = 0
-        _fullProfitUnlockDate: uint256 = self._fullProfitUnlockDate
+        fullProfitUnlockDate: uint256 = profitUnlock >> 216
         # Check if we need to account for shares still unlocking.
-        if _fullProfitUnlockDate > block.timestamp: 
+        if fullProfitUnlockDate > block.timestamp: 
             # There will only be previously locked shares if time remains.
             # We calculate this here since it will not occur every time we lock shares.
-            previouslyLockedTime = (totalLockedShares - sharesToLock) * (_fullProfitUnlockDate - block.timestamp)
+            previouslyLockedTime = (totalLockedShares - sharesToLock) * (fullProfitUnlockDate - block.timestamp)
 
         # newProfitLockingPeriod is a weighted average between the remaining time of the previously locked shares and the profitMaxUnlockTime
         newProfitLockingPeriod: uint256 = (previouslyLockedTime + sharesToLock * profitMaxUnlockTime) / totalLockedShares
-        # Calculate how many shares unlock per second.
-        self._profitUnlockingRate = totalLockedShares * MAX_BPS_EXTENDED / newProfitLockingPeriod
-        # Calculate how long until the full amount of shares is unlocked.
-        self._fullProfitUnlockDate = block.timestamp + newProfitLockingPeriod
-        # Update the last profitable report timestamp.
-        self._lastProfitUpdate = block.timestamp
+        self._setProfitUnlock(
+            # Calculate how long until the full amount of shares is unlocked.
+            block.timestamp + newProfitLockingPeriod,
+            # Update the last profitable report timestamp.
+            block.timestamp,
+            profitMaxUnlockTime,
+            # Calculate how many shares unlock per second.
+            totalLockedShares * MAX_BPS_EXTENDED / newProfitLockingPeriod
+        )
     else:
         # NOTE: only setting this to the 0 will turn in the desired effect, 
         # no need to update profitUnlockingRate
-        self._fullProfitUnlockDate = 0
+        self._profitUnlock = profitUnlock & ~(TIMESTAMP_MASK << 216)
+
+    # Checkpoint the new accounting so the price per share can be
+    # computed for any later time, see `VaultLens.pricePerShareAt`.
+    checkpointCount: uint256 = self.reportCheckpointCount
+    self.reportCheckpoints[checkpointCount % MAX_CHECKPOINTS] = [
+        convert(convert(self._totalAssets(), uint128), uint256) << 128 |
+        convert(convert(self._totalSupply, uint128), uint256),
+        self._profitUnlock & ~(TIMESTAMP_MASK << 176) | block.timestamp << 176
+    ]
+    self.reportCheckpointCount = checkpointCount + 1
     
-    # Record the report of profit timestamp.
-    self.strategies[strategy].lastReport = block.timestamp
-
     # We have to recalculate the fees paid for cases with an overall loss or no profit locking
+    paidFees: uint256 = totalFees
     if loss + totalFees > gain + totalRefunds or profitMaxUnlockTime == 0:
-        totalFees = self._convertToAssets(totalFeesShares, Rounding.ROUND_DOWN)
-
-    log StrategyReported(
-        strategy,
-        gain,
-        loss,
-        currentDebt,
-        totalFees * convert(protocolFeeBps, uint256) / MAX_BPS, # Protocol Fees
-        totalFees,
-        totalRefunds
-    )
+        paidFees = self._convertToAssets(totalFeesShares, Rounding.ROUND_DOWN)
+
+    for report in reports:
+        # Each strategy is attributed its share of the fees paid.
+        strategyFees: uint256 = 0
+        if totalFees != 0:
+            strategyFees = report.totalFees * paidFees / totalFees
+
+        log StrategyReported(
+            report.strategy,
+            report.gain,
+            report.loss,
+            report.currentDebt,
+            strategyFees * convert(protocolFeeBps, uint256) / MAX_BPS, # Protocol Fees
+            strategyFees,
+            report.totalRefunds
+        )
 
     return (gain, loss)
 
@@ -1345,7 +1723,22 @@ def setAccountant(newAccountant: address):
     @param newAccountant The new accountant address.
     """
     self._enforceRole(msg.sender, Roles.ACCOUNTANT_MANAGER)
-    self.accountant = newAccountant
+    accountantConfig: uint256 = convert(newAccountant, uint256)
+
+    # Check once if the accountant wants the strategy context with each report.
+    success: bool = False
+    response: Bytes[32] = b""
+    success, response = raw_call(
+        newAccountant,
+        _abi_encode(ACCOUNTANT_V2_INTERFACE_ID, method_id=method_id("supportsInterface(bytes4)")),
+        max_outsize=32,
+        is_static_call=True,
+        revert_on_failure=False
+    )
+    if success and len(response) == 32 and convert(response, bool):
+        accountantConfig |= ACCOUNTANT_V2_FLAG
+
+    self._accountant = accountantConfig
 
     log UpdateAccountant(newAccountant)
 
@@ -1353,19 +1746,26 @@ def setAccountant(newAccountant: address):
 def setDefaultQueue(newDefaultQueue: DynArray[address, MAX_QUEUE]):
     """
     @notice Set the new default queue array.
-    @dev Will check each strategy to make sure it is active. But will not
-        check that the same strategy is not added twice. maxRedeem and maxWithdraw
-        return values may be inaccurate if a strategy is added twice.
+    @dev Will check each strategy to make sure it is active and
+        that the same strategy is not added twice.
     @param newDefaultQueue The new default queue array.
     """
     self._enforceRole(msg.sender, Roles.QUEUE_MANAGER)
 
-    # Make sure every strategy in the new queue is active.
-    for strategy in newDefaultQueue:
-        assert self.strategies[strategy].activation != 0, "!inactive"
-
-    # Save the new queue.
-    self.defaultQueue = newDefaultQueue
+    # Unlink the current queue.
+    strategy: address = self._queueNext[QUEUE_SENTINEL]
+    for i in range(MAX_QUEUE):
+        if strategy == QUEUE_SENTINEL:
+            break
+        self._removeFromQueue(strategy)
+        strategy = self._queueNext[QUEUE_SENTINEL]
+
+    for _strategy in newDefaultQueue:
+        # Make sure every strategy in the new queue is active.
+        self._assert(self._strategies[_strategy] != 0, "!inactive")
+        # And only added once.
+        self._assert(self._queueNext[_strategy] == empty(address), "duplicate strategy")
+        self._appendToQueue(_strategy)
 
     log UpdateDefaultQueue(newDefaultQueue)
 
@@ -1403,7 +1803,7 @@ def setDepositLimit(depositLimit: uint256, override: bool = False):
             log UpdateDepositLimitModule(empty(address))
     else:  
         # Make sure the depositLimitModule has been set to address(0).
-        assert self.depositLimitModule == empty(address), "using module"
+        self._assert(self.depositLimitModule == empty(address), "using module")
 
     self.depositLimit = depositLimit
 
@@ -1431,7 +1831,7 @@ def setDepositLimitModule(depositLimitModule: address, override: bool = False):
             log UpdateDepositLimit(max_value(uint256))
     else:
         # Make sure the depositLimit has been set to uint max.
-        assert self.depositLimit == max_value(uint256), "using deposit limit"
+        self._assert(self.depositLimit == max_value(uint256), "using deposit limit")
 
     self.depositLimitModule = depositLimitModule
 
@@ -1477,7 +1877,10 @@ def setProfitMaxUnlockTime(newProfitMaxUnlockTime: uint256):
     """
     self._enforceRole(msg.sender, Roles.PROFIT_UNLOCK_MANAGER)
     # Must be less than one year for report cycles
-    assert newProfitMaxUnlockTime <= 31_556_952, "profit unlock time too long"
+    self._assert(newProfitMaxUnlockTime <= 31_556_952, "profit unlock time too long")
+
+    # Everything but the unlock time is kept by default.
+    profitUnlock: uint256 = self._profitUnlock & ~(UNLOCK_TIME_MASK << 144)
 
     # If setting to 0 we need to reset any locked values.
     if (newProfitMaxUnlockTime == 0):
@@ -1488,10 +1891,9 @@ def setProfitMaxUnlockTime(newProfitMaxUnlockTime: uint256):
             self._burnShares(shareBalance, self)
 
         # Reset unlocking variables to 0.
-        self._profitUnlockingRate = 0
-        self._fullProfitUnlockDate = 0
+        profitUnlock &= TIMESTAMP_MASK << 176
 
-    self._profitMaxUnlockTime = newProfitMaxUnlockTime
+    self._profitUnlock = profitUnlock | newProfitMaxUnlockTime << 144
 
     log UpdateProfitMaxUnlockTime(newProfitMaxUnlockTime)
 
@@ -1501,6 +1903,13 @@ def _enforceRole(account: address, role: Roles):
     # Make sure the sender holds the role.
     assert role in self.roles[account], "not allowed"
 
+@internal
+def _setRole(account: address, role: Roles):
+    assert msg.sender == self.roleManager
+    self.roles[account] = role
+
+    log RoleSet(account, role)
+
 @external
 def setRole(account: address, role: Roles):
     """
@@ -1510,10 +1919,7 @@ def setRole(account: address, role: Roles):
     @param account The account to set the role for.
     @param role The roles the account should hold.
     """
-    assert msg.sender == self.roleManager
-    self.roles[account] = role
-
-    log RoleSet(account, role)
+    self._setRole(account, role)
 
 @external
 def addRole(account: address, role: Roles):
@@ -1524,10 +1930,7 @@ def addRole(account: address, role: Roles):
     @param account The account to add a role to.
     @param role The new role to add to account.
     """
-    assert msg.sender == self.roleManager
-    self.roles[account] = self.roles[account] | role
-
-    log RoleSet(account, self.roles[account])
+    self._setRole(account, self.roles[account] | role)
 
 @external
 def removeRole(account: address, role: Roles):
@@ -1538,10 +1941,7 @@ def removeRole(account: address, role: Roles):
     @param account The account to remove a Role from.
     @param role The Role to remove.
     """
-    assert msg.sender == self.roleManager
-    self.roles[account] = self.roles[account] & ~role
-
-    log RoleSet(account, self.roles[account])
+    self._setRole(account, self.roles[account] & ~role)
     
 @external
 def transferRoleManager(roleManager: address):
@@ -1603,7 +2003,34 @@ def getDefaultQueue() -> DynArray[address, MAX_QUEUE]:
     @notice Get the full default queue currently set.
     @return The current default withdrawal queue.
     """
-    return self.defaultQueue
+    queue: DynArray[address, MAX_QUEUE] = []
+    strategy: address = self._queueNext[QUEUE_SENTINEL]
+    for i in range(MAX_QUEUE):
+        if strategy == QUEUE_SENTINEL:
+            break
+        queue.append(strategy)
+        strategy = self._queueNext[strategy]
+
+    return queue
+
+@view
+@external
+def defaultQueue(index: uint256) -> address:
+    """
+    @notice Get the strategy at `index` in the default queue.
+    @dev Walks the queue from its start, so reading the whole queue
+        this way is quadratic. Use `getDefaultQueue` for that.
+    @param index The position in the default queue.
+    @return The strategy at `index`.
+    """
+    assert index < self._queueLength
+    strategy: address = self._queueNext[QUEUE_SENTINEL]
+    for i in range(MAX_QUEUE):
+        if i == index:
+            break
+        strategy = self._queueNext[strategy]
+
+    return strategy
 
 ## REPORTING MANAGEMENT ##
 @external
@@ -1615,7 +2042,31 @@ def processReport(strategy: address) -> (uint256, uint256):
     @return The gain and loss of the strategy.
     """
     self._enforceRole(msg.sender, Roles.REPORTING_MANAGER)
-    return self._processReport(strategy)
+    return self._processReports([strategy])
+
+@external
+@nonreentrant("lock")
+def processReports(strategies: DynArray[address, MAX_QUEUE]) -> (uint256, uint256):
+    """
+    @notice Process the reports of multiple strategies at once.
+    @dev Shares are issued or burned and the profit unlocking is
+        updated once for the whole batch. A `StrategyReported`
+        event is still emitted for every strategy.
+    @param strategies The strategies to process the reports for.
+    @return The total gain and loss of the strategies.
+    """
+    self._enforceRole(msg.sender, Roles.REPORTING_MANAGER)
+    return self._processReports(strategies)
+
+@external
+def syncProtocolFeeConfig() -> (uint16, address):
+    """
+    @notice Refresh the cached protocol fee config from the factory.
+    @dev Permissionless. Reports refresh the cache on their own
+        when the factory config changed, this allows doing it early.
+    @return The protocol fee in basis points and the fee recipient.
+    """
+    return self._syncProtocolFeeConfig()
 
 @external
 @nonreentrant("lock")
@@ -1631,14 +2082,14 @@ def buyDebt(strategy: address, amount: uint256):
     @param amount The amount of debt to buy from the vault.
     """
     self._enforceRole(msg.sender, Roles.DEBT_PURCHASER)
-    assert self.strategies[strategy].activation != 0, "not active"
+    self._assert(self._strategies[strategy] != 0, "not active")
     
     # Cache the current debt.
-    currentDebt: uint256 = self.strategies[strategy].currentDebt
+    currentDebt: uint256 = self._currentDebt(strategy)
     _amount: uint256 = amount
 
-    assert currentDebt > 0, "nothing to buy"
-    assert _amount > 0, "nothing to buy with"
+    self._assert(currentDebt > 0, "nothing to buy")
+    self._assert(_amount > 0, "nothing to buy with")
     
     if _amount > currentDebt:
         _amount = currentDebt
@@ -1648,16 +2099,14 @@ def buyDebt(strategy: address, amount: uint256):
     # due to strategy issues so won't rely on its conversion rates.
     shares: uint256 = IStrategy(strategy).balanceOf(self) * _amount / currentDebt
 
-    assert shares > 0, "cannot buy zero"
+    self._assert(shares > 0, "cannot buy zero")
 
     self._erc20SafeTransferFrom(self.asset, msg.sender, self, _amount)
 
     # Lower strategy debt
-    self.strategies[strategy].currentDebt -= _amount
-    # lower total debt
-    self._totalDebt -= _amount
-    # Increase total idle
-    self._totalIdle += _amount
+    self._setCurrentDebt(strategy, currentDebt - _amount)
+    # Lower total debt and increase total idle.
+    self._setTotals(self._totalIdle() + _amount, self._totalDebt() - _amount)
 
     # log debt change
     log DebtUpdated(strategy, currentDebt, currentDebt - _amount)
@@ -1709,8 +2158,8 @@ def updateMaxDebtForStrategy(strategy: address, newMaxDebt: uint256):
     @param newMaxDebt The new max debt for the strategy.
     """
     self._enforceRole(msg.sender, Roles.MAX_DEBT_MANAGER)
-    assert self.strategies[strategy].activation != 0, "inactive strategy"
-    self.strategies[strategy].maxDebt = newMaxDebt
+    self._assertActive(strategy)
+    self._maxDebt[strategy] = newMaxDebt
 
     log UpdatedMaxDebtForStrategy(msg.sender, strategy, newMaxDebt)
 
@@ -1799,8 +2248,12 @@ def withdraw(
     @param strategies Optional array of strategies to withdraw from.
     @return The amount of shares actually burnt.
     """
-    shares: uint256 = self._convertToShares(assets, Rounding.ROUND_UP)
-    self._redeem(msg.sender, receiver, owner, assets, shares, maxLoss, strategies)
+    totalIdle: uint256 = 0
+    totalDebt: uint256 = 0
+    totalSupply: uint256 = 0
+    totalIdle, totalDebt, totalSupply = self._loadAccounting()
+    shares: uint256 = self._assetsToShares(assets, totalIdle + totalDebt, totalSupply, Rounding.ROUND_UP)
+    self._redeem(msg.sender, receiver, owner, assets, shares, maxLoss, strategies, totalIdle, totalDebt)
     return shares
 
 @external
@@ -1822,9 +2275,13 @@ def redeem(
     @param strategies Optional array of strategies to withdraw from.
     @return The amount of assets actually withdrawn.
     """
-    assets: uint256 = self._convertToAssets(shares, Rounding.ROUND_DOWN)
+    totalIdle: uint256 = 0
+    totalDebt: uint256 = 0
+    totalSupply: uint256 = 0
+    totalIdle, totalDebt, totalSupply = self._loadAccounting()
+    assets: uint256 = self._sharesToAssets(shares, totalIdle + totalDebt, totalSupply, Rounding.ROUND_DOWN)
     # Always return the actual amount of assets withdrawn.
-    return self._redeem(msg.sender, receiver, owner, assets, shares, maxLoss, strategies)
+    return self._redeem(msg.sender, receiver, owner, assets, shares, maxLoss, strategies, totalIdle, totalDebt)
 
 
 @external
@@ -1845,7 +2302,6 @@ def transfer(receiver: address, amount: uint256) -> bool:
     @param amount The amount of shares to transfer.
     @return True if the transfer was successful.
     """
-    assert receiver not in [self, empty(address)]
     self._transfer(msg.sender, receiver, amount)
     return True
 
@@ -1858,8 +2314,9 @@ def transferFrom(sender: address, receiver: address, amount: uint256) -> bool:
     @param amount The amount of shares to transfer.
     @return True if the transfer was successful.
     """
-    assert receiver not in [self, empty(address)]
-    return self._transferFrom(sender, receiver, amount)
+    self._spendAllowance(sender, msg.sender, amount)
+    self._transfer(sender, receiver, amount)
+    return True
 
 ## ERC20+4626 compatibility
 @external
@@ -1917,6 +2374,34 @@ def totalAssets() -> uint256:
     """
     return self._totalAssets()
 
+@view
+@external
+def accountant() -> address:
+    """
+    @notice Get the contract that charges fees and can give refunds.
+    @return The current accountant.
+    """
+    return convert(convert(self._accountant & ADDRESS_MASK, uint160), address)
+
+@view
+@external
+def accountantV2() -> bool:
+    """
+    @notice Check if the accountant supports `IAccountantV2`.
+    @return True if the strategy context is sent with each report.
+    """
+    return (self._accountant & ACCOUNTANT_V2_FLAG) != 0
+
+@view
+@external
+def strategies(strategy: address) -> StrategyParams:
+    """
+    @notice Get the params the vault holds for `strategy`.
+    @param strategy The address of the strategy.
+    @return The strategies activation, last report, current debt and max debt.
+    """
+    return self._strategyParams(strategy)
+
 @view
 @external
 def totalIdle() -> uint256:
@@ -1924,7 +2409,7 @@ def totalIdle() -> uint256:
     @notice Get the amount of loose `asset` the vault holds.
     @return The current total idle.
     """
-    return self._totalIdle
+    return self._totalIdle()
 
 @view
 @external
@@ -1934,7 +2419,7 @@ def totalDebt() -> uint256:
     across all strategies.
     @return The current total debt.
     """
-    return self._totalDebt
+    return self._totalDebt()
 
 @view
 @external
@@ -1984,7 +2469,7 @@ def maxDeposit(receiver: address) -> uint256:
     @param receiver The address that will receive the shares.
     @return The maximum amount of assets that can be deposited.
     """
-    return self._maxDeposit(receiver)
+    return self._maxDeposit(receiver, self._totalAssets())
 
 @view
 @external
@@ -1994,7 +2479,7 @@ def maxMint(receiver: address) -> uint256:
     @param receiver The address that will receive the shares.
     @return The maximum amount of shares that can be minted.
     """
-    maxDeposit: uint256 = self._maxDeposit(receiver)
+    maxDeposit: uint256 = self._maxDeposit(receiver, self._totalAssets())
     return self._convertToShares(maxDeposit, Rounding.ROUND_DOWN)
 
 @view
@@ -2087,9 +2572,14 @@ def assessShareOfUnrealisedLosses(strategy: address, assetsNeeded: uint256) -> u
     @param assetsNeeded The amount of assets needed to be withdrawn.
     @return The share of unrealised losses that the strategy has.
     """
-    assert self.strategies[strategy].currentDebt >= assetsNeeded
+    currentDebt: uint256 = self._currentDebt(strategy)
+    assert currentDebt >= assetsNeeded
 
-    return self._assessShareOfUnrealisedLosses(strategy, assetsNeeded)
+    return self._shareOfUnrealisedLosses(
+        currentDebt, 
+        IStrategy(strategy).convertToAssets(IStrategy(strategy).balanceOf(self)), 
+        assetsNeeded
+    )
 
 ## Profit locking getter functions ##
 
@@ -2100,7 +2590,7 @@ def profitMaxUnlockTime() -> uint256:
     @notice Gets the current time profits are set to unlock over.
     @return The current profit max unlock time.
     """
-    return self._profitMaxUnlockTime
+    return (self._profitUnlock >> 144) & UNLOCK_TIME_MASK
 
 @view
 @external
@@ -2109,7 +2599,7 @@ def fullProfitUnlockDate() -> uint256:
     @notice Gets the timestamp at which all profits will be unlocked.
     @return The full profit unlocking timestamp
     """
-    return self._fullProfitUnlockDate
+    return self._profitUnlock >> 216
 
 @view
 @external
@@ -2119,7 +2609,7 @@ def profitUnlockingRate() -> uint256:
     @dev This is denominated in EXTENDED_BPS decimals.
     @return The current profit unlocking rate.
     """
-    return self._profitUnlockingRate
+    return self._profitUnlock & RATE_MASK
 
 
 @view
@@ -2129,7 +2619,7 @@ def lastProfitUpdate() -> uint256:
     @notice The timestamp of the last time shares were locked.
     @return The last profit update.
     """
-    return self._lastProfitUpdate
+    return (self._profitUnlock >> 176) & TIMESTAMP_MASK
 
 # eip-1344
 @view
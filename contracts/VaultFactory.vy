@@ -1,4 +1,4 @@
-# @version 0.3.7
+# pragma version 0.3.10
 
 """
 @title Gefion Vault Factory
@@ -98,6 +98,8 @@ defaultProtocolFeeConfig: public(PFConfig)
 customProtocolFee: public(HashMap[address, uint16])
 # Represents if a custom protocol fee should be used.
 useCustomProtocolFee: public(HashMap[address, bool])
+# Increased on every fee config change so vaults know to refresh their cache.
+feeConfigEpoch: public(uint256)
 
 @external
 def __init__(name: String[64], vaultOriginal: address, governance: address):
@@ -199,6 +201,7 @@ def setProtocolFeeBps(newProtocolFeeBps: uint16):
 
     # Set the new fee
     self.defaultProtocolFeeConfig.feeBps = newProtocolFeeBps
+    self.feeConfigEpoch += 1
 
     log UpdateProtocolFeeBps(
         defaultConfig.feeBps, 
@@ -219,6 +222,7 @@ def setProtocolFeeRecipient(newProtocolFeeRecipient: address):
     oldRecipient: address = self.defaultProtocolFeeConfig.feeRecipient
 
     self.defaultProtocolFeeConfig.feeRecipient = newProtocolFeeRecipient
+    self.feeConfigEpoch += 1
 
     log UpdateProtocolFeeRecipient(
         oldRecipient,
@@ -247,6 +251,8 @@ def setCustomProtocolFeeBps(vault: address, newCustomProtocolFee: uint16):
     if not self.useCustomProtocolFee[vault]:
         self.useCustomProtocolFee[vault] = True
 
+    self.feeConfigEpoch += 1
+
     log UpdateCustomProtocolFee(vault, newCustomProtocolFee)
 
 @external 
@@ -264,6 +270,7 @@ def removeCustomProtocolFee(vault: address):
 
     # Set custom fee bool back to false.
     self.useCustomProtocolFee[vault] = False
+    self.feeConfigEpoch += 1
 
     log RemovedCustomProtocolFee(vault)
 
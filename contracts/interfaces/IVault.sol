@@ -50,7 +50,14 @@ interface IVault is IERC4626 {
 
     function strategies(address) external view returns (StrategyParams memory);
 
-    function defaultQueue(uint256) external view returns (address);
+    function strategyLiquidity(address) external view returns (uint256);
+
+    function reportCheckpoints(
+        uint256 index,
+        uint256 word
+    ) external view returns (uint256);
+
+    function reportCheckpointCount() external view returns (uint256);
 
     function useDefaultQueue() external view returns (bool);
 
@@ -64,6 +71,8 @@ interface IVault is IERC4626 {
 
     function accountant() external view returns (address);
 
+    function accountantV2() external view returns (bool);
+
     function roles(address) external view returns (uint256);
 
     function roleManager() external view returns (address);
@@ -122,12 +131,20 @@ interface IVault is IERC4626 {
 
     function pricePerShare() external view returns (uint256);
 
+    function defaultQueue(uint256 index) external view returns (address);
+
     function getDefaultQueue() external view returns (address[] memory);
 
     function processReport(
         address strategy
     ) external returns (uint256, uint256);
 
+    function processReports(
+        address[] memory strategies
+    ) external returns (uint256, uint256);
+
+    function syncProtocolFeeConfig() external returns (uint16, address);
+
     function buyDebt(address strategy, uint256 amount) external;
 
     function addStrategy(address newStrategy) external;
@@ -33,6 +33,8 @@ interface IVaultFactory {
 
     function useCustomProtocolFee(address) external view returns (bool);
 
+    function feeConfigEpoch() external view returns (uint256);
+
     function deployNewVault(
         address asset,
         string memory name,
@@ -0,0 +1,212 @@
+# pragma version 0.3.10
+
+"""
+@title Gefion Auto Allocator
+@license GNU AGPLv3
+@author gefion.finance
+@notice
+    Deposit into a Gefion Vault and put the new funds to work in the
+    same transaction.
+
+    Deposits sit in the vaults idle until a DEBT_MANAGER calls
+    `updateDebt`. Depositing through this contract instead forwards
+    the deposited assets to the strategies configured for the vault,
+    in order, each within its `maxDebt` and `maxDeposit`. Depositors
+    pay for the extra `updateDebt` calls and no keeper transaction is
+    needed.
+
+    Only what the depositor brought is forwarded, never idle that was
+    already in the vault, and never so much that the idle drops below
+    the vaults `minimumTotalIdle`. A small deposit only moves a small
+    amount, the rest of the idle is left to the DEBT_MANAGER.
+
+    This contract must hold the vaults DEBT_MANAGER role. The
+    strategies can only be configured by addresses holding that role
+    on the vault as well.
+"""
+
+from vyper.interfaces import ERC20
+
+# INTERFACES #
+enum Roles:
+    ADD_STRATEGY_MANAGER
+    REVOKE_STRATEGY_MANAGER
+    FORCE_REVOKE_MANAGER
+    ACCOUNTANT_MANAGER
+    QUEUE_MANAGER
+    REPORTING_MANAGER
+    DEBT_MANAGER
+    MAX_DEBT_MANAGER
+    DEPOSIT_LIMIT_MANAGER
+    WITHDRAW_LIMIT_MANAGER
+    MINIMUM_IDLE_MANAGER
+    PROFIT_UNLOCK_MANAGER
+    DEBT_PURCHASER
+    EMERGENCY_MANAGER
+
+struct StrategyParams:
+    activation: uint256
+    lastReport: uint256
+    currentDebt: uint256
+    maxDebt: uint256
+
+interface IVault:
+    def asset() -> address: view
+    def roles(account: address) -> Roles: view
+    def strategies(strategy: address) -> StrategyParams: view
+    def totalIdle() -> uint256: view
+    def minimumTotalIdle() -> uint256: view
+    def previewMint(shares: uint256) -> uint256: view
+    def deposit(assets: uint256, receiver: address) -> uint256: nonpayable
+    def mint(shares: uint256, receiver: address) -> uint256: nonpayable
+
+interface IStrategy:
+    def maxDeposit(receiver: address) -> uint256: view
+
+# EVENTS #
+event UpdateStrategies:
+    vault: indexed(address)
+    strategies: DynArray[address, MAX_STRATEGIES]
+
+event Allocated:
+    vault: indexed(address)
+    assets: uint256
+
+# CONSTANTS #
+# Strategies a vault can spread its deposits across.
+MAX_STRATEGIES: constant(uint256) = 4
+# 100% in Basis Points.
+MAX_BPS: constant(uint256) = 10_000
+
+# STORAGE #
+# Vault => strategies deposits are forwarded to, in order.
+_strategies: HashMap[address, DynArray[address, MAX_STRATEGIES]]
+
+## CONFIGURATION ##
+@external
+def setStrategies(vault: address, strategies: DynArray[address, MAX_STRATEGIES]):
+    """
+    @notice Set the strategies deposits into `vault` are forwarded to.
+    @dev The first strategy is filled up to its limits before the next
+        one gets anything. An empty list turns allocation off.
+    @param vault The vault to configure.
+    @param strategies The strategies to forward deposits to, in order.
+    """
+    assert Roles.DEBT_MANAGER in IVault(vault).roles(msg.sender), "not allowed"
+
+    for strategy in strategies:
+        assert IVault(vault).strategies(strategy).activation != 0, "inactive strategy"
+
+    self._strategies[vault] = strategies
+
+    log UpdateStrategies(vault, strategies)
+
+@view
+@external
+def getStrategies(vault: address) -> DynArray[address, MAX_STRATEGIES]:
+    """
+    @notice Get the strategies deposits into `vault` are forwarded to.
+    @param vault The vault to check.
+    @return The strategies, in order.
+    """
+    return self._strategies[vault]
+
+## DEPOSITS ##
+@internal
+def _pullAssets(vault: address, assets: uint256):
+    """
+    Takes `assets` from the caller and lets `vault` pull them.
+    """
+    asset: address = IVault(vault).asset()
+    assert ERC20(asset).transferFrom(msg.sender, self, assets, default_return_value=True), "transfer failed"
+    assert ERC20(asset).approve(vault, assets, default_return_value=True), "approval failed"
+
+@internal
+def _allocate(vault: address, assets: uint256) -> uint256:
+    """
+    Forwards up to `assets` of the vaults idle to its strategies,
+    keeping the idle at or above `minimumTotalIdle`. Strategies that
+    are full, revoked or do not take deposits are skipped, and so is a
+    strategy whose `updateDebt` reverts, for example because its
+    deposit fails or this contract lost the DEBT_MANAGER role. The
+    deposit itself has already gone through and stays idle.
+    """
+    totalIdle: uint256 = IVault(vault).totalIdle()
+    minimumTotalIdle: uint256 = IVault(vault).minimumTotalIdle()
+    if totalIdle <= minimumTotalIdle:
+        return 0
+
+    toAllocate: uint256 = min(assets, totalIdle - minimumTotalIdle)
+    allocated: uint256 = 0
+    strategies: DynArray[address, MAX_STRATEGIES] = self._strategies[vault]
+
+    for strategy in strategies:
+        if allocated == toAllocate:
+            break
+
+        # A revoked strategy has no params left, so its `maxDebt` is 0.
+        params: StrategyParams = IVault(vault).strategies(strategy)
+        if params.maxDebt <= params.currentDebt or IStrategy(strategy).maxDeposit(vault) == 0:
+            continue
+
+        # The vault caps the deposit to the strategies `maxDeposit`.
+        targetDebt: uint256 = params.currentDebt + min(
+            toAllocate - allocated,
+            params.maxDebt - params.currentDebt
+        )
+        success: bool = False
+        response: Bytes[32] = b""
+        success, response = raw_call(
+            vault,
+            _abi_encode(
+                strategy,
+                targetDebt,
+                MAX_BPS,
+                method_id=method_id("updateDebt(address,uint256,uint256)")
+            ),
+            max_outsize=32,
+            revert_on_failure=False
+        )
+        if not success:
+            continue
+
+        allocated += convert(response, uint256) - params.currentDebt
+
+    if allocated != 0:
+        log Allocated(vault, allocated)
+    return allocated
+
+@external
+def deposit(vault: address, assets: uint256, receiver: address) -> uint256:
+    """
+    @notice Deposit `assets` into `vault` and forward them to the
+        configured strategies.
+    @dev This contract must be approved to spend `assets` of the
+        vaults asset.
+    @param vault The vault to deposit into.
+    @param assets The amount of asset to deposit.
+    @param receiver The address to receive the shares.
+    @return The amount of shares minted.
+    """
+    self._pullAssets(vault, assets)
+    shares: uint256 = IVault(vault).deposit(assets, receiver)
+    self._allocate(vault, assets)
+    return shares
+
+@external
+def mint(vault: address, shares: uint256, receiver: address) -> uint256:
+    """
+    @notice Mint `shares` of `vault` and forward the assets paid to
+        the configured strategies.
+    @dev This contract must be approved to spend the assets the
+        vault charges for `shares`, see `previewMint`.
+    @param vault The vault to mint from.
+    @param shares The amount of shares to mint.
+    @param receiver The address to receive the shares.
+    @return The amount of assets deposited.
+    """
+    assets: uint256 = IVault(vault).previewMint(shares)
+    self._pullAssets(vault, assets)
+    assets = IVault(vault).mint(shares, receiver)
+    self._allocate(vault, assets)
+    return assets
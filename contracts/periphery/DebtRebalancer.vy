@@ -0,0 +1,114 @@
+# pragma version 0.3.10
+
+"""
+@title Gefion Debt Rebalancer
+@license GNU AGPLv3
+@author gefion.finance
+@notice
+    Rebalance the debt of several strategies of a Gefion Vault in one
+    transaction.
+
+    Debt increases are funded from the vaults idle, so a rebalance done
+    with `updateDebt` had to be ordered by hand so that the strategies
+    losing debt are processed first, or deposits would revert with
+    "no funds to deposit". `updateDebts` takes the targets in any order,
+    runs all the decreases and then all the increases.
+
+    Each target is still one `updateDebt` call into the vault, so the
+    vault reads `asset`, `minimumTotalIdle` and its totals and writes
+    its totals once per strategy, not once per batch. Only the ordering
+    and the single transaction are saved.
+
+    Both this contract and the caller must hold the vaults DEBT_MANAGER
+    role, the vault checks the former and this contract the latter.
+"""
+
+# INTERFACES #
+enum Roles:
+    ADD_STRATEGY_MANAGER
+    REVOKE_STRATEGY_MANAGER
+    FORCE_REVOKE_MANAGER
+    ACCOUNTANT_MANAGER
+    QUEUE_MANAGER
+    REPORTING_MANAGER
+    DEBT_MANAGER
+    MAX_DEBT_MANAGER
+    DEPOSIT_LIMIT_MANAGER
+    WITHDRAW_LIMIT_MANAGER
+    MINIMUM_IDLE_MANAGER
+    PROFIT_UNLOCK_MANAGER
+    DEBT_PURCHASER
+    EMERGENCY_MANAGER
+
+struct StrategyParams:
+    activation: uint256
+    lastReport: uint256
+    currentDebt: uint256
+    maxDebt: uint256
+
+interface IVault:
+    def roles(account: address) -> Roles: view
+    def strategies(strategy: address) -> StrategyParams: view
+    def updateDebt(strategy: address, targetDebt: uint256, maxLoss: uint256) -> uint256: nonpayable
+
+# EVENTS #
+event DebtsUpdated:
+    vault: indexed(address)
+    caller: indexed(address)
+    decreases: uint256
+    increases: uint256
+
+# STRUCTS #
+struct DebtTarget:
+    strategy: address
+    targetDebt: uint256
+
+# CONSTANTS #
+# Must match the vaults max queue length.
+MAX_QUEUE: constant(uint256) = 64
+# 100% in Basis Points.
+MAX_BPS: constant(uint256) = 10_000
+
+@external
+def updateDebts(
+    vault: address,
+    targets: DynArray[DebtTarget, MAX_QUEUE],
+    maxLoss: uint256 = MAX_BPS
+) -> DynArray[uint256, MAX_QUEUE]:
+    """
+    @notice Move the debt of each strategy in `targets` to its target.
+    @dev Decreases are run first, in the order given, then increases.
+        Strategies already at their target are skipped instead of
+        reverting. The vault still applies its own limits, such as
+        `minimumTotalIdle` and the strategies `maxDebt`.
+    @param vault The vault to rebalance.
+    @param targets The strategies and their target debt.
+    @param maxLoss Optional amount of acceptable loss in Basis Points
+        on each debt decrease.
+    @return The new debt of each strategy, in the order of `targets`.
+    """
+    assert Roles.DEBT_MANAGER in IVault(vault).roles(msg.sender), "not allowed"
+
+    # Read the current debts once, they decide the order.
+    newDebts: DynArray[uint256, MAX_QUEUE] = []
+    for target in targets:
+        newDebts.append(IVault(vault).strategies(target.strategy).currentDebt)
+
+    decreases: uint256 = 0
+    for i in range(MAX_QUEUE):
+        if i == len(targets):
+            break
+        if targets[i].targetDebt < newDebts[i]:
+            newDebts[i] = IVault(vault).updateDebt(targets[i].strategy, targets[i].targetDebt, maxLoss)
+            decreases += 1
+
+    increases: uint256 = 0
+    for i in range(MAX_QUEUE):
+        if i == len(targets):
+            break
+        if targets[i].targetDebt > newDebts[i]:
+            newDebts[i] = IVault(vault).updateDebt(targets[i].strategy, targets[i].targetDebt, maxLoss)
+            increases += 1
+
+    log DebtsUpdated(vault, msg.sender, decreases, increases)
+    return newDebts
@@ -0,0 +1,271 @@
+# pragma version 0.3.10
+
+"""
+@title Gefion Idle Buffer
+@license GNU AGPLv3
+@author gefion.finance
+@notice
+    Size the `minimumTotalIdle` of a Gefion Vault from its recent
+    withdrawal flow.
+
+    A fixed `minimumTotalIdle` is too big in quiet periods, where it
+    only costs yield, and too small during exits, where every redeem
+    has to go through the strategies. This contract keeps an
+    exponential moving average of the assets leaving the vault and sets
+    `minimumTotalIdle` to cover `coverage` seconds of that flow, within
+    the bounds set by the vaults MINIMUM_IDLE_MANAGER.
+
+    The average is a decayed sum: what left the vault counts for its
+    assets, halved every `halfLife`. The flow per second it stands for
+    is that sum times ln(2) / `halfLife`. Between two full half lives
+    the decay is interpolated linearly, which overstates the sum by at
+    most 6%.
+
+    The outflow is read from the vault, as the decrease of the shares
+    held by users since the last `update`, valued at the current price
+    per share. Deposits and withdrawals between two updates net out, so
+    `update` should be called often. Shares deposited right before an
+    `update` and redeemed after it would count as an outflow, so only a
+    MINIMUM_IDLE_MANAGER of the vault can call it, and the shares are
+    read at most once per block.
+
+    When the buffer grows past the idle of the vault, `update` lowers
+    the debt of the strategies in the default queue, in order, until
+    the idle covers it. A strategy that cannot free funds is skipped.
+    A smaller buffer is put back to work by the DEBT_MANAGER.
+
+    This contract must hold the vaults MINIMUM_IDLE_MANAGER and
+    DEBT_MANAGER roles.
+"""
+
+# INTERFACES #
+enum Roles:
+    ADD_STRATEGY_MANAGER
+    REVOKE_STRATEGY_MANAGER
+    FORCE_REVOKE_MANAGER
+    ACCOUNTANT_MANAGER
+    QUEUE_MANAGER
+    REPORTING_MANAGER
+    DEBT_MANAGER
+    MAX_DEBT_MANAGER
+    DEPOSIT_LIMIT_MANAGER
+    WITHDRAW_LIMIT_MANAGER
+    MINIMUM_IDLE_MANAGER
+    PROFIT_UNLOCK_MANAGER
+    DEBT_PURCHASER
+    EMERGENCY_MANAGER
+
+struct StrategyParams:
+    activation: uint256
+    lastReport: uint256
+    currentDebt: uint256
+    maxDebt: uint256
+
+interface IVault:
+    def roles(account: address) -> Roles: view
+    def strategies(strategy: address) -> StrategyParams: view
+    def getDefaultQueue() -> DynArray[address, MAX_QUEUE]: view
+    def totalIdle() -> uint256: view
+    def totalSupply() -> uint256: view
+    def balanceOf(addr: address) -> uint256: view
+    def convertToAssets(shares: uint256) -> uint256: view
+    def minimumTotalIdle() -> uint256: view
+    def setMinimumTotalIdle(minimumTotalIdle: uint256): nonpayable
+
+# EVENTS #
+event UpdateConfig:
+    vault: indexed(address)
+    halfLife: uint256
+    coverage: uint256
+    minimum: uint256
+    maximum: uint256
+
+event UpdateBuffer:
+    vault: indexed(address)
+    withdrawn: uint256
+    minimumTotalIdle: uint256
+    totalIdle: uint256
+
+# STRUCTS #
+struct Config:
+    # Time for an outflow to weigh half as much.
+    halfLife: uint256
+    # Seconds of outflow the buffer should serve.
+    coverage: uint256
+    # Bounds of the buffer, in assets.
+    minimum: uint256
+    maximum: uint256
+
+struct Flow:
+    # Decayed sum of the outflow up to `lastUpdate`.
+    withdrawn: uint256
+    lastUpdate: uint256
+    # Shares held by users at `lastUpdate`.
+    userShares: uint256
+
+# CONSTANTS #
+# Must match the vaults max queue length.
+MAX_QUEUE: constant(uint256) = 64
+# ln(2) scaled by 1e18.
+LN_2: constant(uint256) = 693_147_180_559_945_309
+WAD: constant(uint256) = 10 ** 18
+
+# STORAGE #
+config: public(HashMap[address, Config])
+flow: public(HashMap[address, Flow])
+
+# INTERNAL FUNCTIONS #
+@view
+@internal
+def _userShares(vault: address) -> uint256:
+    # Neither getter counts the unlocked shares, the difference is
+    # what the users hold.
+    return IVault(vault).totalSupply() - IVault(vault).balanceOf(vault)
+
+@pure
+@internal
+def _decay(amount: uint256, elapsed: uint256, halfLife: uint256) -> uint256:
+    # Halve once per full half life, linear in between.
+    decayed: uint256 = amount >> (elapsed / halfLife)
+    return decayed - decayed * (elapsed % halfLife) / (2 * halfLife)
+
+@view
+@internal
+def _sync(vault: address) -> Flow:
+    """
+    The flow of `vault` with the outflow since the last update folded
+    in and decayed to now.
+    """
+    flow: Flow = self.flow[vault]
+    if flow.lastUpdate == block.timestamp:
+        return flow
+
+    userShares: uint256 = self._userShares(vault)
+
+    withdrawn: uint256 = self._decay(
+        flow.withdrawn, block.timestamp - flow.lastUpdate, self.config[vault].halfLife
+    )
+    if userShares < flow.userShares:
+        withdrawn += IVault(vault).convertToAssets(flow.userShares - userShares)
+
+    return Flow({withdrawn: withdrawn, lastUpdate: block.timestamp, userShares: userShares})
+
+@view
+@internal
+def _bufferSize(vault: address, withdrawn: uint256) -> uint256:
+    config: Config = self.config[vault]
+    size: uint256 = withdrawn * LN_2 / WAD * config.coverage / config.halfLife
+    return min(max(size, config.minimum), config.maximum)
+
+@internal
+def _refill(vault: address, target: uint256) -> uint256:
+    """
+    Lower the debt of the default queue until the idle of `vault`
+    covers `target`. Returns the new idle.
+    """
+    totalIdle: uint256 = IVault(vault).totalIdle()
+    queue: DynArray[address, MAX_QUEUE] = IVault(vault).getDefaultQueue()
+    for strategy in queue:
+        if totalIdle >= target:
+            break
+
+        currentDebt: uint256 = IVault(vault).strategies(strategy).currentDebt
+        if currentDebt == 0:
+            continue
+
+        # The vault withdraws up to `minimumTotalIdle` and never more
+        # than the strategy can free. No loss is accepted, a strategy
+        # that cannot free anything without a loss reverts and is
+        # skipped.
+        success: bool = raw_call(
+            vault,
+            _abi_encode(
+                strategy,
+                currentDebt - min(target - totalIdle, currentDebt),
+                empty(uint256),
+                method_id=method_id("updateDebt(address,uint256,uint256)")
+            ),
+            revert_on_failure=False
+        )
+        totalIdle = IVault(vault).totalIdle()
+
+    return totalIdle
+
+# EXTERNAL FUNCTIONS #
+@external
+def setConfig(
+    vault: address,
+    halfLife: uint256,
+    coverage: uint256,
+    minimum: uint256,
+    maximum: uint256
+):
+    """
+    @notice Set how the buffer of `vault` is sized.
+    @dev The flow tracked so far is kept.
+    @param vault The vault to configure.
+    @param halfLife Time for an outflow to weigh half as much.
+    @param coverage Seconds of outflow the buffer should serve.
+    @param minimum The lowest buffer, in assets.
+    @param maximum The highest buffer, in assets.
+    """
+    assert Roles.MINIMUM_IDLE_MANAGER in IVault(vault).roles(msg.sender), "not allowed"
+    assert halfLife != 0, "zero half life"
+    assert minimum <= maximum, "minimum above maximum"
+
+    if self.config[vault].halfLife == 0:
+        # Start tracking from now.
+        self.flow[vault] = Flow({
+            withdrawn: 0,
+            lastUpdate: block.timestamp,
+            userShares: self._userShares(vault)
+        })
+    else:
+        # Decay with the old half life up to now.
+        self.flow[vault] = self._sync(vault)
+
+    self.config[vault] = Config({
+        halfLife: halfLife,
+        coverage: coverage,
+        minimum: minimum,
+        maximum: maximum
+    })
+
+    log UpdateConfig(vault, halfLife, coverage, minimum, maximum)
+
+@view
+@external
+def target(vault: address) -> uint256:
+    """
+    @notice The buffer `update` would set for `vault` now.
+    @param vault The vault to check.
+    @return The target minimum total idle.
+    """
+    assert self.config[vault].halfLife != 0, "not configured"
+    return self._bufferSize(vault, self._sync(vault).withdrawn)
+
+@external
+def update(vault: address) -> uint256:
+    """
+    @notice Fold the recent outflow of `vault` into its average and
+        move its `minimumTotalIdle` to the buffer it calls for.
+    @dev Pulls funds back from the default queue if the idle is below
+        the new buffer. Takes MINIMUM_IDLE_MANAGER on the vault. A
+        second call in the same block does not read the shares again.
+    @param vault The vault to update.
+    @return The new minimum total idle.
+    """
+    assert Roles.MINIMUM_IDLE_MANAGER in IVault(vault).roles(msg.sender), "not allowed"
+    assert self.config[vault].halfLife != 0, "not configured"
+
+    flow: Flow = self._sync(vault)
+    self.flow[vault] = flow
+
+    target: uint256 = self._bufferSize(vault, flow.withdrawn)
+    if target != IVault(vault).minimumTotalIdle():
+        IVault(vault).setMinimumTotalIdle(target)
+
+    totalIdle: uint256 = self._refill(vault, target)
+
+    log UpdateBuffer(vault, flow.withdrawn, target, totalIdle)
+    return target
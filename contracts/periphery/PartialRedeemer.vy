@@ -0,0 +1,229 @@
+# pragma version 0.3.10
+
+"""
+@title Gefion Partial Redeemer
+@license GNU AGPLv3
+@author gefion.finance
+@notice
+    Best effort `withdraw` and `redeem` for Gefion Vaults.
+
+    The vaults `withdraw` and `redeem` revert if the full amount cannot
+    be freed from the strategies. This contract takes the callers
+    shares, asks the vault for the full amount and, if that reverts,
+    retries with what the vault reports it can service through
+    `maxWithdraw` or `maxRedeem`, then with half of that, up to
+    MAX_ATTEMPTS calls. The result is settled on what actually moved:
+    the assets that arrived are forwarded to the receiver, the shares
+    that were not burned go back to the caller and the rest of the
+    request is logged as unfilled.
+
+    When the full amount can be freed the queue is walked once, as in
+    a direct call. Every failed attempt walks it again and is paid for
+    by the caller.
+
+    Remaining failure modes:
+    - The call reverts if this contract is not approved for the shares
+      it pulls, `redeem` pulls `shares` and `withdraw` pulls
+      `previewWithdraw(assets)` capped at the callers balance.
+    - The call reverts if `maxWithdraw` or `maxRedeem` revert, e.g. a
+      reverting withdraw limit module.
+    - A loss above `maxLoss` usually grows with the amount, retrying
+      with less rarely helps and the request can end up fully unfilled.
+    - Only the last successful attempt is filled, the gap between it
+      and the largest amount that would have worked is left unfilled.
+"""
+
+from vyper.interfaces import ERC20
+
+interface IVault:
+    def asset() -> address: view
+    def balanceOf(addr: address) -> uint256: view
+    def transfer(receiver: address, amount: uint256) -> bool: nonpayable
+    def transferFrom(sender: address, receiver: address, amount: uint256) -> bool: nonpayable
+    def previewWithdraw(assets: uint256) -> uint256: view
+    def maxWithdraw(owner: address, maxLoss: uint256, strategies: DynArray[address, MAX_QUEUE]) -> uint256: view
+    def maxRedeem(owner: address, maxLoss: uint256, strategies: DynArray[address, MAX_QUEUE]) -> uint256: view
+
+# EVENTS #
+event PartialWithdraw:
+    vault: indexed(address)
+    owner: indexed(address)
+    receiver: indexed(address)
+    assets: uint256
+    shares: uint256
+    unfilledAssets: uint256
+
+event PartialRedeem:
+    vault: indexed(address)
+    owner: indexed(address)
+    receiver: indexed(address)
+    shares: uint256
+    assets: uint256
+    unfilledShares: uint256
+
+# CONSTANTS #
+# Must match the vaults max queue length.
+MAX_QUEUE: constant(uint256) = 64
+# 100% in Basis Points.
+MAX_BPS: constant(uint256) = 10_000
+# Calls to the vault before giving up.
+MAX_ATTEMPTS: constant(uint256) = 4
+
+# INTERNAL FUNCTIONS #
+@internal
+def _tryExit(
+    vault: address,
+    isRedeem: bool,
+    amount: uint256,
+    maxLoss: uint256,
+    strategies: DynArray[address, MAX_QUEUE]
+) -> bool:
+    """
+    Call `withdraw` or `redeem` on `vault` for this contracts shares
+    without reverting.
+    """
+    if isRedeem:
+        return raw_call(
+            vault,
+            _abi_encode(
+                amount, self, self, maxLoss, strategies,
+                method_id=method_id("redeem(uint256,address,address,uint256,address[])")
+            ),
+            revert_on_failure=False
+        )
+    return raw_call(
+        vault,
+        _abi_encode(
+            amount, self, self, maxLoss, strategies,
+            method_id=method_id("withdraw(uint256,address,address,uint256,address[])")
+        ),
+        revert_on_failure=False
+    )
+
+@internal
+def _exit(
+    vault: address,
+    isRedeem: bool,
+    amount: uint256,
+    maxLoss: uint256,
+    strategies: DynArray[address, MAX_QUEUE]
+) -> uint256:
+    """
+    Try `amount` and then smaller amounts until the vault accepts one.
+    Returns the amount accepted, 0 if none was.
+    """
+    for attempt in range(MAX_ATTEMPTS):
+        if amount == 0:
+            break
+        if self._tryExit(vault, isRedeem, amount, maxLoss, strategies):
+            return amount
+        available: uint256 = max_value(uint256)
+        if attempt == 0:
+            # Fall back to what the vault reports it can service.
+            if isRedeem:
+                available = IVault(vault).maxRedeem(self, maxLoss, strategies)
+            else:
+                available = IVault(vault).maxWithdraw(self, maxLoss, strategies)
+        # Do not retry the same amount.
+        if available < amount:
+            amount = available
+        else:
+            amount /= 2
+
+    return 0
+
+@internal
+def _settle(
+    vault: address,
+    asset: address,
+    owner: address,
+    receiver: address,
+    pulled: uint256,
+    sharesBefore: uint256,
+    assetsBefore: uint256
+) -> (uint256, uint256):
+    """
+    Forward the assets that arrived to `receiver` and return the shares
+    that were not burned to `owner`. Returns the shares burned and the
+    assets forwarded.
+    """
+    sharesLeft: uint256 = IVault(vault).balanceOf(self) - sharesBefore
+    if sharesLeft != 0:
+        IVault(vault).transfer(owner, sharesLeft)
+
+    assets: uint256 = ERC20(asset).balanceOf(self) - assetsBefore
+    if assets != 0:
+        assert ERC20(asset).transfer(receiver, assets, default_return_value=True), "transfer failed"
+
+    return (pulled - sharesLeft, assets)
+
+# EXTERNAL FUNCTIONS #
+@external
+def withdraw(
+    vault: address,
+    assets: uint256,
+    receiver: address,
+    maxLoss: uint256 = 0,
+    strategies: DynArray[address, MAX_QUEUE] = []
+) -> (uint256, uint256):
+    """
+    @notice Withdraw up to `assets` from `vault` for the caller.
+    @dev The part of `assets` the vault cannot free is logged as
+        unfilled instead of reverting. A loss within `maxLoss` lowers
+        the assets received but does not count as unfilled.
+    @param vault The vault to withdraw from.
+    @param assets The amount of asset requested.
+    @param receiver The address to receive the assets.
+    @param maxLoss Optional amount of acceptable loss in Basis Points.
+    @param strategies Optional array of strategies to withdraw from.
+    @return The assets received and the shares burned.
+    """
+    asset: address = IVault(vault).asset()
+    sharesBefore: uint256 = IVault(vault).balanceOf(self)
+    assetsBefore: uint256 = ERC20(asset).balanceOf(self)
+
+    pulled: uint256 = min(IVault(vault).previewWithdraw(assets), IVault(vault).balanceOf(msg.sender))
+    IVault(vault).transferFrom(msg.sender, self, pulled)
+
+    filled: uint256 = self._exit(vault, False, assets, maxLoss, strategies)
+
+    shares: uint256 = 0
+    received: uint256 = 0
+    shares, received = self._settle(vault, asset, msg.sender, receiver, pulled, sharesBefore, assetsBefore)
+
+    log PartialWithdraw(vault, msg.sender, receiver, received, shares, assets - filled)
+    return (received, shares)
+
+@external
+def redeem(
+    vault: address,
+    shares: uint256,
+    receiver: address,
+    maxLoss: uint256 = MAX_BPS,
+    strategies: DynArray[address, MAX_QUEUE] = []
+) -> (uint256, uint256):
+    """
+    @notice Redeem up to `shares` from `vault` for the caller.
+    @dev The shares the vault cannot service are returned to the caller
+        and logged as unfilled instead of reverting.
+    @param vault The vault to redeem from.
+    @param shares The amount of shares requested.
+    @param receiver The address to receive the assets.
+    @param maxLoss Optional amount of acceptable loss in Basis Points.
+    @param strategies Optional array of strategies to withdraw from.
+    @return The shares burned and the assets received.
+    """
+    asset: address = IVault(vault).asset()
+    sharesBefore: uint256 = IVault(vault).balanceOf(self)
+    assetsBefore: uint256 = ERC20(asset).balanceOf(self)
+
+    IVault(vault).transferFrom(msg.sender, self, shares)
+
+    self._exit(vault, True, shares, maxLoss, strategies)
+
+    burned: uint256 = 0
+    assets: uint256 = 0
+    burned, assets = self._settle(vault, asset, msg.sender, receiver, shares, sharesBefore, assetsBefore)
+
+    log PartialRedeem(vault, msg.sender, receiver, burned, assets, shares - burned)
+    return (burned, assets)
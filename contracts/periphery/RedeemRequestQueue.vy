@@ -0,0 +1,248 @@
+# pragma version 0.3.10
+
+"""
+@title Gefion Redeem Request Queue
+@license GNU AGPLv3
+@author gefion.finance
+@notice
+    Asynchronous, ERC-7540 style, redemptions for a Gefion Vault.
+
+    Instead of walking the withdraw queue themselves, users lock their
+    vault shares here with `requestRedeem`. Requests are grouped into
+    epochs. An address holding the vaults DEBT_MANAGER role settles the
+    open epoch in one `redeem` once liquidity is available, and every
+    request in that epoch shares the resulting price.
+
+    If the vault could only service part of the epoch, each request is
+    filled pro rata and the unfilled shares are handed back on `claim`
+    so they can be requested again.
+"""
+
+from vyper.interfaces import ERC20
+
+# INTERFACES #
+enum Roles:
+    ADD_STRATEGY_MANAGER
+    REVOKE_STRATEGY_MANAGER
+    FORCE_REVOKE_MANAGER
+    ACCOUNTANT_MANAGER
+    QUEUE_MANAGER
+    REPORTING_MANAGER
+    DEBT_MANAGER
+    MAX_DEBT_MANAGER
+    DEPOSIT_LIMIT_MANAGER
+    WITHDRAW_LIMIT_MANAGER
+    MINIMUM_IDLE_MANAGER
+    PROFIT_UNLOCK_MANAGER
+    DEBT_PURCHASER
+    EMERGENCY_MANAGER
+
+interface IVault:
+    def asset() -> address: view
+    def roles(account: address) -> Roles: view
+    def maxRedeem(owner: address, maxLoss: uint256, strategies: DynArray[address, MAX_QUEUE]) -> uint256: view
+    def redeem(shares: uint256, receiver: address, owner: address, maxLoss: uint256, strategies: DynArray[address, MAX_QUEUE]) -> uint256: nonpayable
+
+# EVENTS #
+event RedeemRequest:
+    owner: indexed(address)
+    epoch: indexed(uint256)
+    shares: uint256
+
+event CancelRedeemRequest:
+    owner: indexed(address)
+    epoch: indexed(uint256)
+    shares: uint256
+
+event EpochSettled:
+    epoch: indexed(uint256)
+    requestedShares: uint256
+    redeemedShares: uint256
+    assets: uint256
+
+event Claim:
+    owner: indexed(address)
+    receiver: indexed(address)
+    epoch: indexed(uint256)
+    assets: uint256
+    returnedShares: uint256
+
+# STRUCTS #
+struct Epoch:
+    # Total shares requested during the epoch.
+    requestedShares: uint256
+    # Shares the vault redeemed when the epoch was settled.
+    redeemedShares: uint256
+    # Assets received for the redeemed shares.
+    assets: uint256
+
+# CONSTANTS #
+# Must match the vaults max queue length.
+MAX_QUEUE: constant(uint256) = 64
+# 100% in Basis Points.
+MAX_BPS: constant(uint256) = 10_000
+
+# STORAGE #
+# The vault requests are made against.
+vault: public(immutable(address))
+# The vaults underlying asset.
+asset: public(immutable(address))
+# The epoch new requests are added to.
+currentEpoch: public(uint256)
+# Epoch id => Epoch totals.
+epochs: public(HashMap[uint256, Epoch])
+# Owner => epoch id => shares requested.
+requests: public(HashMap[address, HashMap[uint256, uint256]])
+
+@external
+def __init__(_vault: address):
+    vault = _vault
+    asset = IVault(_vault).asset()
+
+## REQUESTS ##
+@external
+def requestRedeem(shares: uint256) -> uint256:
+    """
+    @notice Lock `shares` of the vault to be redeemed in the current epoch.
+    @dev This contract must be approved to transfer the shares.
+    @param shares The amount of vault shares to lock.
+    @return The epoch the request was added to.
+    """
+    assert shares > 0, "no shares"
+    epoch: uint256 = self.currentEpoch
+
+    assert ERC20(vault).transferFrom(msg.sender, self, shares, default_return_value=True), "transfer failed"
+
+    self.requests[msg.sender][epoch] += shares
+    self.epochs[epoch].requestedShares += shares
+
+    log RedeemRequest(msg.sender, epoch, shares)
+    return epoch
+
+@external
+def cancelRedeemRequest() -> uint256:
+    """
+    @notice Take back the shares requested in the current epoch.
+    @dev Requests in epochs that were already settled can only be claimed.
+    @return The amount of shares returned.
+    """
+    epoch: uint256 = self.currentEpoch
+    shares: uint256 = self.requests[msg.sender][epoch]
+    assert shares > 0, "no request"
+
+    self.requests[msg.sender][epoch] = 0
+    self.epochs[epoch].requestedShares -= shares
+
+    assert ERC20(vault).transfer(msg.sender, shares, default_return_value=True), "transfer failed"
+
+    log CancelRedeemRequest(msg.sender, epoch, shares)
+    return shares
+
+## SETTLEMENT ##
+@external
+def settle(
+    maxLoss: uint256 = MAX_BPS,
+    strategies: DynArray[address, MAX_QUEUE] = []
+) -> uint256:
+    """
+    @notice Redeem as much of the current epoch as the vault can service.
+    @dev Closes the epoch even if it was only partially filled, the
+        rest of the shares are returned to the owners on claim.
+    @param maxLoss Amount of acceptable loss in Basis Points.
+    @param strategies Optional array of strategies to withdraw from.
+    @return The assets received for the epoch.
+    """
+    assert Roles.DEBT_MANAGER in IVault(vault).roles(msg.sender), "not allowed"
+
+    epoch: uint256 = self.currentEpoch
+    requestedShares: uint256 = self.epochs[epoch].requestedShares
+    assert requestedShares > 0, "nothing to settle"
+
+    # Only redeem what the vault can currently service.
+    redeemedShares: uint256 = min(
+        requestedShares,
+        IVault(vault).maxRedeem(self, maxLoss, strategies)
+    )
+    assert redeemedShares > 0, "nothing to redeem"
+
+    assets: uint256 = IVault(vault).redeem(redeemedShares, self, self, maxLoss, strategies)
+
+    self.epochs[epoch] = Epoch({
+        requestedShares: requestedShares,
+        redeemedShares: redeemedShares,
+        assets: assets
+    })
+    self.currentEpoch = epoch + 1
+
+    log EpochSettled(epoch, requestedShares, redeemedShares, assets)
+    return assets
+
+## CLAIMS ##
+@view
+@internal
+def _claimable(owner: address, epoch: uint256) -> (uint256, uint256):
+    """
+    Returns the assets and unfilled shares owed to `owner` for a settled
+    `epoch`. Both round down so the totals never exceed what is held.
+    """
+    if epoch >= self.currentEpoch:
+        return (0, 0)
+
+    shares: uint256 = self.requests[owner][epoch]
+    if shares == 0:
+        return (0, 0)
+
+    settled: Epoch = self.epochs[epoch]
+    return (
+        shares * settled.assets / settled.requestedShares,
+        shares * (settled.requestedShares - settled.redeemedShares) / settled.requestedShares
+    )
+
+@external
+def claim(epoch: uint256, receiver: address = msg.sender) -> (uint256, uint256):
+    """
+    @notice Claim the assets for a request in a settled epoch.
+    @dev Any of the request the vault could not fill is returned as
+        vault shares to the `receiver`.
+    @param epoch The epoch the request was made in.
+    @param receiver The address to receive the assets and shares.
+    @return The assets and the unfilled shares sent.
+    """
+    assert epoch < self.currentEpoch, "not settled"
+    assert self.requests[msg.sender][epoch] > 0, "nothing to claim"
+
+    assets: uint256 = 0
+    returnedShares: uint256 = 0
+    assets, returnedShares = self._claimable(msg.sender, epoch)
+
+    self.requests[msg.sender][epoch] = 0
+
+    if assets > 0:
+        assert ERC20(asset).transfer(receiver, assets, default_return_value=True), "transfer failed"
+
+    if returnedShares > 0:
+        assert ERC20(vault).transfer(receiver, returnedShares, default_return_value=True), "transfer failed"
+
+    log Claim(msg.sender, receiver, epoch, assets, returnedShares)
+    return (assets, returnedShares)
+
+@view
+@external
+def pendingRedeemRequest(owner: address) -> uint256:
+    """
+    @notice Shares `owner` has requested in the open epoch.
+    @param owner The address that made the request.
+    @return The amount of shares pending.
+    """
+    return self.requests[owner][self.currentEpoch]
+
+@view
+@external
+def claimableRedeemRequest(owner: address, epoch: uint256) -> (uint256, uint256):
+    """
+    @notice What `owner` can claim for `epoch`.
+    @param owner The address that made the request.
+    @param epoch The epoch the request was made in.
+    @return The assets and unfilled shares that can be claimed.
+    """
+    return self._claimable(owner, epoch)
@@ -0,0 +1,753 @@
+# pragma version 0.3.10
+
+"""
+@title Gefion Vault Lens
+@license GNU AGPLv3
+@author gefion.finance
+@notice
+    Read only helpers for Gefion Vaults.
+
+    The vault itself is kept as close to the contract size limit as
+    possible, so views that are only ever used off chain or by
+    integrators live here instead. Every function takes the vault to
+    read as its first argument and only relies on the vaults public
+    getters, so one lens can serve every vault of the same API version.
+"""
+
+# INTERFACES #
+
+struct StrategyParams:
+    activation: uint256
+    lastReport: uint256
+    currentDebt: uint256
+    maxDebt: uint256
+
+interface IVault:
+    def decimals() -> uint8: view
+    def isShutdown() -> bool: view
+    def minimumTotalIdle() -> uint256: view
+    def totalDebt() -> uint256: view
+    def totalAssets() -> uint256: view
+    def previewWithdraw(assets: uint256) -> uint256: view
+    def totalSupply() -> uint256: view
+    def pricePerShare() -> uint256: view
+    def unlockedShares() -> uint256: view
+    def fullProfitUnlockDate() -> uint256: view
+    def profitUnlockingRate() -> uint256: view
+    def lastProfitUpdate() -> uint256: view
+    def profitMaxUnlockTime() -> uint256: view
+    def depositLimit() -> uint256: view
+    def depositLimitModule() -> address: view
+    def accountant() -> address: view
+    def assessShareOfUnrealisedLosses(strategy: address, assetsNeeded: uint256) -> uint256: view
+    def reportCheckpoints(index: uint256, word: uint256) -> uint256: view
+    def reportCheckpointCount() -> uint256: view
+    def balanceOf(owner: address) -> uint256: view
+    def convertToAssets(shares: uint256) -> uint256: view
+    def convertToShares(assets: uint256) -> uint256: view
+    def totalIdle() -> uint256: view
+    def useDefaultQueue() -> bool: view
+    def getDefaultQueue() -> DynArray[address, MAX_QUEUE]: view
+    def withdrawLimitModule() -> address: view
+    def strategies(strategy: address) -> StrategyParams: view
+    def strategyLiquidity(strategy: address) -> uint256: view
+
+interface IWithdrawLimitModule:
+    def availableWithdrawLimit(owner: address, maxLoss: uint256, strategies: DynArray[address, MAX_QUEUE]) -> uint256: view
+
+interface IStrategy:
+    def balanceOf(owner: address) -> uint256: view
+    def convertToAssets(shares: uint256) -> uint256: view
+    def maxDeposit(receiver: address) -> uint256: view
+    def maxRedeem(owner: address) -> uint256: view
+
+# STRUCTS #
+struct StrategyLiquidity:
+    # Assets the vault could withdraw from the strategy.
+    withdrawable: uint256
+    # Unrealised loss as a share of the strategies debt in MAX_BPS_EXTENDED.
+    lossRatio: uint256
+    # Timestamp the liquidity was recorded at.
+    lastSnapshot: uint256
+
+struct DebtTarget:
+    strategy: address
+    targetDebt: uint256
+
+struct DebtUpdatePreview:
+    strategy: address
+    currentDebt: uint256
+    # The strategies debt after the update.
+    newDebt: uint256
+    # The vaults totals after the update.
+    totalIdle: uint256
+    totalDebt: uint256
+    # The revert reason of the guard that would fire, empty if none.
+    reason: String[32]
+
+struct VaultState:
+    totalAssets: uint256
+    totalSupply: uint256
+    totalIdle: uint256
+    totalDebt: uint256
+    pricePerShare: uint256
+    unlockedShares: uint256
+    fullProfitUnlockDate: uint256
+    profitUnlockingRate: uint256
+    lastProfitUpdate: uint256
+    profitMaxUnlockTime: uint256
+    depositLimit: uint256
+    minimumTotalIdle: uint256
+    isShutdown: bool
+    defaultQueue: DynArray[address, MAX_QUEUE]
+    accountant: address
+    depositLimitModule: address
+    withdrawLimitModule: address
+
+struct StrategyState:
+    strategy: address
+    params: StrategyParams
+    # Strategy shares held by the vault and what they are worth.
+    shares: uint256
+    assets: uint256
+    # Debt not covered by `assets`.
+    unrealisedLoss: uint256
+    # Assets the vault can take out of the strategy now.
+    redeemable: uint256
+    # Assets `updateDebt` could add to the strategy now.
+    depositable: uint256
+
+struct RedeemSource:
+    strategy: address
+    # Assets pulled from the strategy.
+    assets: uint256
+    # Unrealised loss of the strategy the redeemer takes.
+    unrealisedLoss: uint256
+
+struct RedeemPreview:
+    shares: uint256
+    # What the shares are worth, and what the redeemer would receive.
+    assets: uint256
+    received: uint256
+    # Part of `assets` served from the vaults idle.
+    fromIdle: uint256
+    # Lowest `maxLoss` in Basis Points the call would go through with.
+    maxLoss: uint256
+    sources: DynArray[RedeemSource, MAX_QUEUE]
+    # The revert reason of the guard that would fire, empty if none.
+    reason: String[32]
+
+# CONSTANTS #
+# Must match the vaults max queue length.
+MAX_QUEUE: constant(uint256) = 64
+# 100% in Basis Points.
+MAX_BPS: constant(uint256) = 10_000
+# Extended for the liquidity loss ratio and the profit unlocking rate.
+MAX_BPS_EXTENDED: constant(uint256) = 1_000_000_000_000
+# Must match the vaults report checkpoints ring buffer size.
+MAX_CHECKPOINTS: constant(uint256) = 128
+# Halvings needed to binary search MAX_CHECKPOINTS checkpoints.
+CHECKPOINT_SEARCH_STEPS: constant(uint256) = 7
+# Masks for the packed checkpoints and liquidity snapshots.
+AMOUNT_MASK: constant(uint256) = 2**128 - 1
+TIMESTAMP_MASK: constant(uint256) = 2**40 - 1
+RATE_MASK: constant(uint256) = 2**144 - 1
+
+## LIQUIDITY SNAPSHOT ##
+@view
+@internal
+def _strategyLiquidity(vault: address, strategy: address) -> StrategyLiquidity:
+    """
+    Unpacks the liquidity snapshot the vault holds for `strategy`.
+    """
+    packed: uint256 = IVault(vault).strategyLiquidity(strategy)
+    return StrategyLiquidity({
+        withdrawable: packed & AMOUNT_MASK,
+        lossRatio: (packed >> 128) & TIMESTAMP_MASK,
+        lastSnapshot: packed >> 168
+    })
+
+@view
+@external
+def strategyLiquidity(vault: address, strategy: address) -> StrategyLiquidity:
+    """
+    @notice Get the liquidity snapshot `vault` holds for `strategy`.
+    @dev The vault records it on every report of the strategy and
+        every debt decrease, see `maxWithdrawFromSnapshot`.
+    @param vault The vault to check.
+    @param strategy The strategy to check.
+    @return The withdrawable assets, the unrealised loss ratio in
+        MAX_BPS_EXTENDED and the timestamp of the snapshot.
+    """
+    return self._strategyLiquidity(vault, strategy)
+
+@view
+@internal
+def _maxWithdrawFromSnapshot(
+    vault: address,
+    owner: address,
+    maxLoss: uint256,
+    strategies: DynArray[address, MAX_QUEUE]
+) -> (uint256, uint256):
+    """
+    Mirrors the vaults `_maxWithdraw` simulation but uses the liquidity
+    each strategy had at its last report or debt update instead of
+    calling the strategy.
+
+    Returns the max assets and the age in seconds of the oldest
+    snapshot that was used.
+    """
+    # Get the max amount for the owner if fully liquid.
+    maxAssets: uint256 = IVault(vault).convertToAssets(IVault(vault).balanceOf(owner))
+
+    # If there is a withdraw limit module use that.
+    withdrawLimitModule: address = IVault(vault).withdrawLimitModule()
+    if withdrawLimitModule != empty(address):
+        return (
+            min(
+                IWithdrawLimitModule(withdrawLimitModule).availableWithdrawLimit(owner, maxLoss, strategies),
+                maxAssets
+            ),
+            0
+        )
+
+    # See if we have enough idle to service the withdraw.
+    currentIdle: uint256 = IVault(vault).totalIdle()
+    if maxAssets <= currentIdle:
+        return (maxAssets, 0)
+
+    # Track how much we can pull.
+    have: uint256 = currentIdle
+    loss: uint256 = 0
+    # Timestamp of the oldest snapshot used.
+    oldestSnapshot: uint256 = block.timestamp
+
+    _strategies: DynArray[address, MAX_QUEUE] = strategies
+    # If no custom queue was passed, or we force the default queue.
+    if len(strategies) == 0 or IVault(vault).useDefaultQueue():
+        _strategies = IVault(vault).getDefaultQueue()
+
+    for strategy in _strategies:
+        params: StrategyParams = IVault(vault).strategies(strategy)
+        # Can't use an invalid strategy.
+        assert params.activation != 0, "inactive strategy"
+
+        # Get the maximum amount the vault would withdraw from the strategy.
+        toWithdraw: uint256 = min(maxAssets - have, params.currentDebt)
+
+        # If 0 move on to the next strategy.
+        if toWithdraw == 0:
+            continue
+
+        liquidity: StrategyLiquidity = self._strategyLiquidity(vault, strategy)
+        oldestSnapshot = min(oldestSnapshot, liquidity.lastSnapshot)
+
+        # Users take their share of any unrealised loss, rounded up.
+        unrealisedLoss: uint256 = 0
+        if liquidity.lossRatio != 0:
+            numerator: uint256 = toWithdraw * liquidity.lossRatio
+            unrealisedLoss = numerator / MAX_BPS_EXTENDED
+            if numerator % MAX_BPS_EXTENDED != 0:
+                unrealisedLoss += 1
+
+        # Adjust accordingly if there is a max withdraw limit.
+        strategyLimit: uint256 = liquidity.withdrawable
+        realizableWithdraw: uint256 = toWithdraw - unrealisedLoss
+        if strategyLimit < realizableWithdraw:
+            if unrealisedLoss != 0:
+                # lower unrealised loss proportional to the limit.
+                unrealisedLoss = unrealisedLoss * strategyLimit / realizableWithdraw
+
+            # Still count the unrealised loss as withdrawable.
+            toWithdraw = strategyLimit + unrealisedLoss
+
+        if toWithdraw == 0:
+            continue
+
+        # If there would be a loss with a non-maximum `maxLoss` value.
+        if unrealisedLoss > 0 and maxLoss < MAX_BPS:
+            # Check if the loss is greater than the allowed range.
+            if loss + unrealisedLoss > (have + toWithdraw) * maxLoss / MAX_BPS:
+                # If so use the amounts up till now.
+                break
+
+        # Add to what we can pull.
+        have += toWithdraw
+
+        # If we have all we need break.
+        if have >= maxAssets:
+            break
+
+        # Add any unrealised loss to the total
+        loss += unrealisedLoss
+
+    return (have, block.timestamp - oldestSnapshot)
+
+@view
+@external
+def maxWithdrawFromSnapshot(
+    vault: address,
+    owner: address,
+    maxLoss: uint256 = 0,
+    strategies: DynArray[address, MAX_QUEUE] = []
+) -> (uint256, uint256):
+    """
+    @notice Estimate `maxWithdraw` from the vaults liquidity snapshots.
+    @dev Does not call any strategy. The snapshots are recorded by the
+        vault during `processReport` and debt decreases, so the returned
+        age should be checked and the exact `maxWithdraw` used if it is
+        too old. A debt decrease records the quote taken before it less
+        the assets moved. A debt increase does not refresh the snapshot,
+        so the estimate stays low until the next report. Neither does a
+        withdraw through the strategy, so the estimate can be high until
+        then, only capped by the debt the strategy has left.
+    @param vault The vault to check.
+    @param owner The address that owns the shares.
+    @param maxLoss Custom maxLoss if any.
+    @param strategies Custom strategies queue if any.
+    @return The estimated max assets and the age of the oldest snapshot used.
+    """
+    return self._maxWithdrawFromSnapshot(vault, owner, maxLoss, strategies)
+
+@view
+@external
+def maxRedeemFromSnapshot(
+    vault: address,
+    owner: address,
+    maxLoss: uint256 = MAX_BPS,
+    strategies: DynArray[address, MAX_QUEUE] = []
+) -> (uint256, uint256):
+    """
+    @notice Estimate `maxRedeem` from the vaults liquidity snapshots.
+    @dev See `maxWithdrawFromSnapshot`.
+    @param vault The vault to check.
+    @param owner The address that owns the shares.
+    @param maxLoss Custom maxLoss if any.
+    @param strategies Custom strategies queue if any.
+    @return The estimated max shares and the age of the oldest snapshot used.
+    """
+    maxAssets: uint256 = 0
+    age: uint256 = 0
+    maxAssets, age = self._maxWithdrawFromSnapshot(vault, owner, maxLoss, strategies)
+
+    return (
+        min(IVault(vault).convertToShares(maxAssets), IVault(vault).balanceOf(owner)),
+        age
+    )
+
+## REPORT CHECKPOINTS ##
+@view
+@internal
+def _checkpointTime(vault: address, index: uint256) -> uint256:
+    # The report time is stored as the checkpoints lastProfitUpdate.
+    return (IVault(vault).reportCheckpoints(index % MAX_CHECKPOINTS, 1) >> 176) & TIMESTAMP_MASK
+
+@view
+@external
+def pricePerShareAt(vault: address, timestamp: uint256) -> uint256:
+    """
+    @notice Get the price per share the vault had at a past timestamp.
+    @dev Uses the checkpoint of the last report at or before `timestamp`
+        and unlocks its locked profit up to `timestamp`, so no archive
+        node is needed. Matches `pricePerShare` up to rounding as long as
+        nothing else moved the totals since that report. Deposits and
+        withdraws made while profit was still unlocking took a share of
+        it, which makes the result slightly off until the next report.
+        Anything else that changes the price outside of a report, like a
+        force revoke, shows from the next report on. Reverts if
+        `timestamp` is older than the oldest checkpoint kept.
+    @param vault The vault to check.
+    @param timestamp The timestamp to get the price per share at.
+    @return The price per share at `timestamp`.
+    """
+    assert timestamp <= block.timestamp, "future timestamp"
+
+    count: uint256 = IVault(vault).reportCheckpointCount()
+    # Oldest checkpoint not overwritten yet.
+    low: uint256 = 0
+    if count > MAX_CHECKPOINTS:
+        low = count - MAX_CHECKPOINTS
+    assert count != 0 and self._checkpointTime(vault, low) <= timestamp, "not covered"
+
+    # Find the last checkpoint at or before `timestamp`, `high` is
+    # always past it.
+    high: uint256 = count
+    for i in range(CHECKPOINT_SEARCH_STEPS):
+        if high - low == 1:
+            break
+        middle: uint256 = (low + high) / 2
+        if self._checkpointTime(vault, middle) <= timestamp:
+            low = middle
+        else:
+            high = middle
+
+    totals: uint256 = IVault(vault).reportCheckpoints(low % MAX_CHECKPOINTS, 0)
+    profitUnlock: uint256 = IVault(vault).reportCheckpoints(low % MAX_CHECKPOINTS, 1)
+    totalSupply: uint256 = totals & AMOUNT_MASK
+
+    fullProfitUnlockDate: uint256 = profitUnlock >> 216
+    if fullProfitUnlockDate != 0:
+        # Once the period ended every locked share has unlocked.
+        lastProfitUpdate: uint256 = (profitUnlock >> 176) & TIMESTAMP_MASK
+        totalSupply -= (profitUnlock & RATE_MASK) * (min(timestamp, fullProfitUnlockDate) - lastProfitUpdate) / MAX_BPS_EXTENDED
+
+    oneShare: uint256 = 10 ** convert(IVault(vault).decimals(), uint256)
+    if totalSupply == 0:
+        return oneShare
+    return oneShare * (totals >> 128) / totalSupply
+
+## DEBT UPDATES ##
+@view
+@internal
+def _previewUpdateDebt(
+    vault: address,
+    strategy: address,
+    targetDebt: uint256,
+    totalIdle: uint256,
+    totalDebt: uint256,
+    minimumTotalIdle: uint256,
+    shutdown: bool
+) -> DebtUpdatePreview:
+    """
+    Mirrors the vaults `_updateDebt` starting from the given totals.
+    Stops at the first guard that would revert and leaves the debt and
+    totals unchanged in that case.
+    """
+    params: StrategyParams = IVault(vault).strategies(strategy)
+    preview: DebtUpdatePreview = DebtUpdatePreview({
+        strategy: strategy,
+        currentDebt: params.currentDebt,
+        newDebt: params.currentDebt,
+        totalIdle: totalIdle,
+        totalDebt: totalDebt,
+        reason: ""
+    })
+
+    newDebt: uint256 = targetDebt
+    # If the vault is shutdown we can only pull funds.
+    if shutdown:
+        newDebt = 0
+
+    if newDebt == params.currentDebt:
+        preview.reason = "new debt equals current debt"
+        return preview
+
+    if params.currentDebt > newDebt:
+        assetsToWithdraw: uint256 = params.currentDebt - newDebt
+
+        # Respect minimum total idle in vault.
+        if totalIdle + assetsToWithdraw < minimumTotalIdle:
+            assetsToWithdraw = min(minimumTotalIdle - totalIdle, params.currentDebt)
+
+        shares: uint256 = IStrategy(strategy).balanceOf(vault)
+        withdrawable: uint256 = IStrategy(strategy).convertToAssets(
+            min(IStrategy(strategy).maxRedeem(vault), shares)
+        )
+        if withdrawable == 0:
+            preview.reason = "nothing to withdraw"
+            return preview
+
+        assetsToWithdraw = min(assetsToWithdraw, withdrawable)
+
+        if IVault(vault).assessShareOfUnrealisedLosses(strategy, assetsToWithdraw) != 0:
+            preview.reason = "strategy has unrealised losses"
+            return preview
+
+        # Assumes the strategy pays out in full, losses on redeem are
+        # only known once it happens.
+        preview.newDebt = params.currentDebt - assetsToWithdraw
+        preview.totalIdle = totalIdle + assetsToWithdraw
+        preview.totalDebt = totalDebt - assetsToWithdraw
+        return preview
+
+    if newDebt > params.maxDebt:
+        preview.reason = "target debt higher than max debt"
+        return preview
+
+    maxDeposit: uint256 = IStrategy(strategy).maxDeposit(vault)
+    if maxDeposit == 0:
+        preview.reason = "nothing to deposit"
+        return preview
+
+    if totalIdle <= minimumTotalIdle:
+        preview.reason = "no funds to deposit"
+        return preview
+
+    # Deposit as much as possible of what is free.
+    assetsToDeposit: uint256 = min(min(newDebt - params.currentDebt, maxDeposit), totalIdle - minimumTotalIdle)
+    preview.newDebt = params.currentDebt + assetsToDeposit
+    preview.totalIdle = totalIdle - assetsToDeposit
+    preview.totalDebt = totalDebt + assetsToDeposit
+    return preview
+
+@view
+@external
+def previewUpdateDebt(vault: address, strategy: address, targetDebt: uint256) -> DebtUpdatePreview:
+    """
+    @notice Simulate `updateDebt` for `strategy` without sending it.
+    @dev `reason` holds the revert reason of the guard that would fire,
+        the debt and totals are left unchanged if it is set. A loss
+        when redeeming from the strategy can not be foreseen, the
+        `maxLoss` check is not simulated.
+    @param vault The vault to check.
+    @param strategy The strategy to update the debt for.
+    @param targetDebt The target debt for the strategy.
+    @return The debt and vault totals the update would end with.
+    """
+    return self._previewUpdateDebt(
+        vault,
+        strategy,
+        targetDebt,
+        IVault(vault).totalIdle(),
+        IVault(vault).totalDebt(),
+        IVault(vault).minimumTotalIdle(),
+        IVault(vault).isShutdown()
+    )
+
+@view
+@external
+def previewUpdateDebts(vault: address, targets: DynArray[DebtTarget, MAX_QUEUE]) -> DynArray[DebtUpdatePreview, MAX_QUEUE]:
+    """
+    @notice Simulate a sequence of `updateDebt` calls, in order.
+    @dev Each call starts from the totals the previous ones would leave,
+        calls that would revert leave them unchanged. Each strategy
+        should only appear once, its debt is always read from the vault.
+    @param vault The vault to check.
+    @param targets The strategies and their target debt.
+    @return One preview per target, see `previewUpdateDebt`.
+    """
+    totalIdle: uint256 = IVault(vault).totalIdle()
+    totalDebt: uint256 = IVault(vault).totalDebt()
+    minimumTotalIdle: uint256 = IVault(vault).minimumTotalIdle()
+    shutdown: bool = IVault(vault).isShutdown()
+
+    previews: DynArray[DebtUpdatePreview, MAX_QUEUE] = []
+    for target in targets:
+        preview: DebtUpdatePreview = self._previewUpdateDebt(
+            vault, target.strategy, target.targetDebt, totalIdle, totalDebt, minimumTotalIdle, shutdown
+        )
+        totalIdle = preview.totalIdle
+        totalDebt = preview.totalDebt
+        previews.append(preview)
+
+    return previews
+
+## VAULT STATE ##
+@view
+@external
+def getVaultState(vault: address) -> VaultState:
+    """
+    @notice Get the accounting and configuration of `vault` in one call.
+    @dev All values are read in the same call, so they are consistent
+        with each other and with the block the call is made at.
+    @param vault The vault to check.
+    @return The vaults state.
+    """
+    return VaultState({
+        totalAssets: IVault(vault).totalAssets(),
+        totalSupply: IVault(vault).totalSupply(),
+        totalIdle: IVault(vault).totalIdle(),
+        totalDebt: IVault(vault).totalDebt(),
+        pricePerShare: IVault(vault).pricePerShare(),
+        unlockedShares: IVault(vault).unlockedShares(),
+        fullProfitUnlockDate: IVault(vault).fullProfitUnlockDate(),
+        profitUnlockingRate: IVault(vault).profitUnlockingRate(),
+        lastProfitUpdate: IVault(vault).lastProfitUpdate(),
+        profitMaxUnlockTime: IVault(vault).profitMaxUnlockTime(),
+        depositLimit: IVault(vault).depositLimit(),
+        minimumTotalIdle: IVault(vault).minimumTotalIdle(),
+        isShutdown: IVault(vault).isShutdown(),
+        defaultQueue: IVault(vault).getDefaultQueue(),
+        accountant: IVault(vault).accountant(),
+        depositLimitModule: IVault(vault).depositLimitModule(),
+        withdrawLimitModule: IVault(vault).withdrawLimitModule()
+    })
+
+@view
+@external
+def getStrategyStates(
+    vault: address,
+    strategies: DynArray[address, MAX_QUEUE] = []
+) -> DynArray[StrategyState, MAX_QUEUE]:
+    """
+    @notice Get the params and live position of `vault` in each strategy.
+    @dev `redeemable` is capped by the strategies `maxRedeem` for the
+        vault. `depositable` is capped by its `maxDeposit`, the room
+        left under `maxDebt` and the vaults idle above the minimum, as
+        in `updateDebt`, and is 0 once the vault is shutdown. A
+        strategy with an unrealised loss can not have its debt
+        decreased by `updateDebt`.
+    @param vault The vault to check.
+    @param strategies Optional strategies to check, the default queue
+        if empty.
+    @return One state per strategy, in order.
+    """
+    _strategies: DynArray[address, MAX_QUEUE] = strategies
+    if len(strategies) == 0:
+        _strategies = IVault(vault).getDefaultQueue()
+
+    # What `updateDebt` can deposit, shared by all the strategies.
+    available: uint256 = 0
+    if not IVault(vault).isShutdown():
+        totalIdle: uint256 = IVault(vault).totalIdle()
+        minimumTotalIdle: uint256 = IVault(vault).minimumTotalIdle()
+        if totalIdle > minimumTotalIdle:
+            available = totalIdle - minimumTotalIdle
+
+    states: DynArray[StrategyState, MAX_QUEUE] = []
+    for strategy in _strategies:
+        params: StrategyParams = IVault(vault).strategies(strategy)
+        # Can't use an invalid strategy.
+        assert params.activation != 0, "inactive strategy"
+
+        shares: uint256 = IStrategy(strategy).balanceOf(vault)
+        assets: uint256 = IStrategy(strategy).convertToAssets(shares)
+
+        unrealisedLoss: uint256 = 0
+        if assets < params.currentDebt:
+            unrealisedLoss = params.currentDebt - assets
+
+        depositable: uint256 = 0
+        if available != 0 and params.maxDebt > params.currentDebt:
+            depositable = min(
+                min(params.maxDebt - params.currentDebt, IStrategy(strategy).maxDeposit(vault)),
+                available
+            )
+
+        states.append(StrategyState({
+            strategy: strategy,
+            params: params,
+            shares: shares,
+            assets: assets,
+            unrealisedLoss: unrealisedLoss,
+            redeemable: IStrategy(strategy).convertToAssets(min(IStrategy(strategy).maxRedeem(vault), shares)),
+            depositable: depositable
+        }))
+
+    return states
+
+## REDEEM PREVIEW ##
+@view
+@internal
+def _previewRedeem(
+    vault: address,
+    shares: uint256,
+    assets: uint256,
+    strategies: DynArray[address, MAX_QUEUE]
+) -> RedeemPreview:
+    """
+    Mirrors the vaults `_redeem` for `shares` worth `assets`, assuming
+    each strategy returns exactly what is asked. Stops at the first
+    guard that would revert.
+    """
+    preview: RedeemPreview = empty(RedeemPreview)
+    preview.shares = shares
+    preview.assets = assets
+    if shares == 0:
+        preview.reason = "no shares to redeem"
+        return preview
+    if assets == 0:
+        preview.reason = "no assets to withdraw"
+        return preview
+
+    requestedAssets: uint256 = assets
+    totalIdle: uint256 = IVault(vault).totalIdle()
+    preview.fromIdle = min(assets, totalIdle)
+
+    if requestedAssets > totalIdle:
+        _strategies: DynArray[address, MAX_QUEUE] = strategies
+        # If no custom queue was passed, or we force the default queue.
+        if len(strategies) == 0 or IVault(vault).useDefaultQueue():
+            _strategies = IVault(vault).getDefaultQueue()
+
+        assetsNeeded: uint256 = requestedAssets - totalIdle
+        for strategy in _strategies:
+            params: StrategyParams = IVault(vault).strategies(strategy)
+            if params.activation == 0:
+                preview.reason = "inactive strategy"
+                return preview
+
+            assetsToWithdraw: uint256 = min(assetsNeeded, params.currentDebt)
+            if assetsToWithdraw == 0:
+                continue
+
+            strategyShares: uint256 = IStrategy(strategy).balanceOf(vault)
+            redeemable: uint256 = min(IStrategy(strategy).maxRedeem(vault), strategyShares)
+            maxWithdraw: uint256 = IStrategy(strategy).convertToAssets(redeemable)
+
+            unrealisedLoss: uint256 = IVault(vault).assessShareOfUnrealisedLosses(strategy, assetsToWithdraw)
+            if unrealisedLoss > 0:
+                # Only take the share of the loss of what can be pulled.
+                if maxWithdraw < assetsToWithdraw - unrealisedLoss:
+                    wanted: uint256 = assetsToWithdraw - unrealisedLoss
+                    unrealisedLoss = unrealisedLoss * maxWithdraw / wanted
+                    assetsToWithdraw = maxWithdraw + unrealisedLoss
+
+                assetsToWithdraw -= unrealisedLoss
+                requestedAssets -= unrealisedLoss
+                assetsNeeded -= unrealisedLoss
+
+            assetsToWithdraw = min(assetsToWithdraw, maxWithdraw)
+            if assetsToWithdraw == 0 and unrealisedLoss == 0:
+                continue
+
+            preview.sources.append(RedeemSource({
+                strategy: strategy,
+                assets: assetsToWithdraw,
+                unrealisedLoss: unrealisedLoss
+            }))
+
+            totalIdle += assetsToWithdraw
+            if requestedAssets <= totalIdle:
+                break
+            assetsNeeded -= assetsToWithdraw
+
+        if totalIdle < requestedAssets:
+            preview.reason = "insufficient assets in vault"
+            return preview
+
+    preview.received = requestedAssets
+    loss: uint256 = assets - requestedAssets
+    if loss != 0:
+        # Rounded up so the loss check passes with it.
+        preview.maxLoss = (loss * MAX_BPS + assets - 1) / assets
+    return preview
+
+@view
+@external
+def previewRedeemDetailed(
+    vault: address,
+    shares: uint256,
+    strategies: DynArray[address, MAX_QUEUE] = []
+) -> RedeemPreview:
+    """
+    @notice Simulate `redeem` of `shares` without sending it.
+    @dev Returns the strategies that would be pulled from, in order,
+        with the assets pulled and the unrealised loss taken on each.
+        Strategies are assumed to return exactly what is asked, a loss
+        realised by the strategy itself can not be foreseen. The
+        owners balance and the withdraw limit module are not checked.
+    @param vault The vault to check.
+    @param shares The amount of shares to redeem.
+    @param strategies Optional array of strategies to withdraw from.
+    @return The sources, assets received and `maxLoss` needed.
+    """
+    return self._previewRedeem(vault, shares, IVault(vault).convertToAssets(shares), strategies)
+
+@view
+@external
+def previewWithdrawDetailed(
+    vault: address,
+    assets: uint256,
+    strategies: DynArray[address, MAX_QUEUE] = []
+) -> RedeemPreview:
+    """
+    @notice Simulate `withdraw` of `assets` without sending it.
+    @dev See `previewRedeemDetailed`. `withdraw` does not accept any
+        loss by default, `maxLoss` is the value it needs instead.
+    @param vault The vault to check.
+    @param assets The amount of asset to withdraw.
+    @param strategies Optional array of strategies to withdraw from.
+    @return The sources, assets received and `maxLoss` needed.
+    """
+    return self._previewRedeem(vault, IVault(vault).previewWithdraw(assets), assets, strategies)
@@ -1,4 +1,4 @@
-# @version 0.3.7
+# pragma version 0.3.10
 
 from vyper.interfaces import ERC20
 
@@ -41,6 +41,11 @@ struct Fee:
 
 # CONSTANTS #
 MAX_BPS: constant(uint256) = 10_000
+ERC165_INTERFACE_ID: constant(bytes4) = 0x01ffc9a7
+ACCOUNTANT_V2_INTERFACE_ID: constant(bytes4) = method_id(
+    "report(address,uint256,uint256,(uint256,uint256,uint256,uint256),uint256,uint256)",
+    output_type=bytes4
+)
 MAX_SHARE: constant(uint256) = 7_500
 # NOTE: A four-century period will be missing 3 of its 100 Julian leap years, leaving 97.
 #       So the average year has 365 + 97/400 = 365.2425 days
@@ -65,13 +70,29 @@ def __init__(asset: address):
     self.asset = asset
 
 
+@view
+@external
+def supportsInterface(interfaceId: bytes4) -> bool:
+    return interfaceId in [ERC165_INTERFACE_ID, ACCOUNTANT_V2_INTERFACE_ID]
+
+
 @external
-def report(strategy: address, gain: uint256, loss: uint256) -> (uint256, uint256):
+def report(
+    strategy: address,
+    gain: uint256,
+    loss: uint256,
+    params: StrategyParams = empty(StrategyParams),
+    totalAssets: uint256 = 0,
+    totalSupply: uint256 = 0
+) -> (uint256, uint256):
     """ """
     totalRefunds: uint256 = 0
 
     # managementFee is charged in both profit and loss scenarios
-    strategyParams: StrategyParams = IVault(msg.sender).strategies(strategy)
+    # Vaults using the v2 interface send the params, older ones are called back.
+    strategyParams: StrategyParams = params
+    if strategyParams.activation == 0:
+        strategyParams = IVault(msg.sender).strategies(strategy)
     fee: Fee = self.fees[strategy]
     duration: uint256 = block.timestamp - strategyParams.lastReport
 
@@ -160,7 +181,7 @@ def commitFeeManager(futureFeeManager: address):
 @external
 def applyFeeManager():
     assert msg.sender == self.feeManager, "not fee manager"
-    assert self.futureFeeManager != ZERO_ADDRESS, "future fee manager != zero address"
+    assert self.futureFeeManager != empty(address), "future fee manager != zero address"
     futureFeeManager: address = self.futureFeeManager
     self.feeManager = futureFeeManager
     log ApplyFeeManager(futureFeeManager)
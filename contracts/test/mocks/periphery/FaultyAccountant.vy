@@ -1,4 +1,4 @@
-# @version 0.3.7
+# pragma version 0.3.10
 
 # FeeManager without any fee threshold
 
@@ -1,4 +1,4 @@
-# @version 0.3.7
+# pragma version 0.3.10
 
 # FeeManager without any fee threshold
 
@@ -49,6 +49,11 @@ struct Fee:
 
 # CONSTANTS #
 MAX_BPS: constant(uint256) = 10_000
+ERC165_INTERFACE_ID: constant(bytes4) = 0x01ffc9a7
+ACCOUNTANT_V2_INTERFACE_ID: constant(bytes4) = method_id(
+    "report(address,uint256,uint256,(uint256,uint256,uint256,uint256),uint256,uint256)",
+    output_type=bytes4
+)
 # NOTE: A four-century period will be missing 3 of its 100 Julian leap years, leaving 97.
 #       So the average year has 365 + 97/400 = 365.2425 days
 #       ERROR(Julian): -0.0078
@@ -71,8 +76,21 @@ def __init__(asset: address):
     self.asset = asset
 
 
+@view
 @external
-def report(strategy: address, gain: uint256, loss: uint256) -> (uint256, uint256):
+def supportsInterface(interfaceId: bytes4) -> bool:
+    return interfaceId in [ERC165_INTERFACE_ID, ACCOUNTANT_V2_INTERFACE_ID]
+
+
+@external
+def report(
+    strategy: address,
+    gain: uint256,
+    loss: uint256,
+    params: StrategyParams = empty(StrategyParams),
+    totalAssets: uint256 = 0,
+    totalSupply: uint256 = 0
+) -> (uint256, uint256):
     """
     """
     totalRefunds: uint256 = 0
@@ -81,7 +99,10 @@ def report(strategy: address, gain: uint256, loss: uint256) -> (uint256, uint256
     strategistFee: uint256 = 0
 
     # managementFee is charged in both profit and loss scenarios
-    strategyParams: StrategyParams = IVault(msg.sender).strategies(strategy)
+    # Vaults using the v2 interface send the params, older ones are called back.
+    strategyParams: StrategyParams = params
+    if strategyParams.activation == 0:
+        strategyParams = IVault(msg.sender).strategies(strategy)
     fee: Fee = self.fees[strategy]
     refundRatio: uint256 = self.refundRatios[strategy]
     duration: uint256 = block.timestamp - strategyParams.lastReport
@@ -1,4 +1,4 @@
-# @version 0.3.7
+# pragma version 0.3.10
 
 interface IVault:
     def totalAssets() -> uint256: view
@@ -28,14 +28,14 @@ def availableDepositLimit(receiver: address) -> uint256:
         if not self.whitelist[receiver]:
             return 0
 
-    if self.defaultDepositLimit == MAX_UINT256:
-        return MAX_UINT256
+    if self.defaultDepositLimit == max_value(uint256):
+        return max_value(uint256)
         
     return self.defaultDepositLimit - IVault(msg.sender).totalAssets()
 
 @view
 @external
-def availableWithdrawLimit(owner: address, maxLoss: uint256, strategies: DynArray[address, 10]) -> uint256:
+def availableWithdrawLimit(owner: address, maxLoss: uint256, strategies: DynArray[address, 64]) -> uint256:
     return self.defaultWithdrawLimit
 
 @external
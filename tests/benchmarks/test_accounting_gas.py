@@ -0,0 +1,167 @@
+"""
+Gas benchmarks for the vault accounting paths.
+
+Covers the operations that read the totals, the profit unlocking state
+and the strategy params: deposits, mints, withdraws, redeems, the price
+views, reports and debt updates. The measured gas is compared against
+the versioned baseline in `accounting_gas_baseline.json` and a cell
+fails if it costs more than the baseline plus `GAS_REGRESSION_THRESHOLD`
+(a fraction, defaults to 0.02).
+
+A cell missing from the baseline fails as well. Run with
+`GAS_BASELINE_UPDATE=1` to record a new baseline instead of comparing,
+e.g. after an intended change to the storage layout. Until it is
+recorded every cell fails.
+
+`GAS_BASELINE_PATH` points the module at another baseline file. To
+compare two storage layouts, record one file per layout and diff them:
+
+    GAS_BASELINE_UPDATE=1 GAS_BASELINE_PATH=before.json ape test tests/benchmarks/test_accounting_gas.py
+"""
+
+import json
+import os
+from pathlib import Path
+
+import pytest
+from ape import chain
+from utils.constants import DAY, MAX_BPS_ACCOUNTANT
+
+BASELINE_PATH = Path(
+    os.environ.get(
+        "GAS_BASELINE_PATH", Path(__file__).parent / "accounting_gas_baseline.json"
+    )
+)
+UPDATE_BASELINE = os.environ.get("GAS_BASELINE_UPDATE", "") == "1"
+THRESHOLD = float(os.environ.get("GAS_REGRESSION_THRESHOLD", "0.02"))
+
+# Whether the vault is still unlocking profit when measured.
+STATES = ["settled", "unlocking"]
+OPERATIONS = [
+    "deposit",
+    "mint",
+    "withdraw",
+    "redeem",
+    "pricePerShare",
+    "totalAssets",
+    "convertToAssets",
+    "processReport",
+    "updateDebt_up",
+    "updateDebt_down",
+]
+
+results = {}
+
+
+def load_baseline():
+    if not BASELINE_PATH.exists():
+        return {"version": None, "cells": {}}
+    return json.loads(BASELINE_PATH.read_text())
+
+
+@pytest.fixture(scope="module", autouse=True)
+def gas_baseline(vaultOriginal):
+    baseline = load_baseline()
+    yield baseline
+
+    if UPDATE_BASELINE and results:
+        baseline["version"] = vaultOriginal.apiVersion()
+        baseline["cells"].update(results)
+        baseline["cells"] = dict(sorted(baseline["cells"].items()))
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2) + "\n")
+
+
+@pytest.fixture(scope="module")
+def build_vault(
+    gov,
+    fish,
+    asset,
+    create_vault,
+    create_strategy,
+    airdrop_asset,
+    user_deposit,
+    add_strategy_to_vault,
+    add_debt_to_strategy,
+):
+    amount = 10**18
+
+    def build_vault(state):
+        vault = create_vault(
+            asset, vault_name=f"Gas accounting {state}", vault_symbol="gA"
+        )
+        airdrop_asset(gov, asset, fish, amount * 4)
+        user_deposit(fish, vault, asset, amount * 2)
+
+        strategy = create_strategy(vault)
+        add_strategy_to_vault(gov, strategy, vault)
+        add_debt_to_strategy(gov, strategy, vault, amount)
+
+        if state == "unlocking":
+            # Lock some profit so the price reads the unlocking state.
+            airdrop_asset(gov, asset, strategy, amount // 10)
+            strategy.report(sender=gov)
+            vault.processReport(strategy, sender=gov)
+            chain.pending_timestamp += DAY
+
+        return vault, strategy, amount
+
+    return build_vault
+
+
+@pytest.mark.parametrize("state", STATES)
+def test_accounting_gas(fish, gov, build_vault, gas_baseline, state):
+    vault, strategy, amount = build_vault(state)
+    measured = {}
+
+    measured["pricePerShare"] = vault.pricePerShare.estimate_gas_cost()
+    measured["totalAssets"] = vault.totalAssets.estimate_gas_cost()
+    measured["convertToAssets"] = vault.convertToAssets.estimate_gas_cost(amount)
+
+    snapshot = chain.snapshot()
+
+    measured["deposit"] = vault.deposit(amount, fish.address, sender=fish).gas_used
+    measured["mint"] = vault.mint(amount // 2, fish.address, sender=fish).gas_used
+    measured["withdraw"] = vault.withdraw(
+        amount // 4, fish.address, fish.address, sender=fish
+    ).gas_used
+    measured["redeem"] = vault.redeem(
+        amount // 4, fish.address, fish.address, sender=fish
+    ).gas_used
+    chain.restore(snapshot)
+
+    vault.updateMaxDebtForStrategy(strategy, amount * 2, sender=gov)
+    measured["processReport"] = vault.processReport(strategy, sender=gov).gas_used
+    measured["updateDebt_up"] = vault.updateDebt(
+        strategy, amount * 3 // 2, sender=gov
+    ).gas_used
+    measured["updateDebt_down"] = vault.updateDebt(
+        strategy, amount // 2, MAX_BPS_ACCOUNTANT, sender=gov
+    ).gas_used
+
+    failures = []
+    missing = []
+    for operation in OPERATIONS:
+        cell = f"{state}/{operation}"
+        results[cell] = measured[operation]
+
+        expected = gas_baseline["cells"].get(cell)
+        if UPDATE_BASELINE:
+            continue
+        if expected is None:
+            missing.append(cell)
+            continue
+
+        if measured[operation] > expected * (1 + THRESHOLD):
+            failures.append(f"{cell}: {measured[operation]} > {expected}")
+
+    if missing:
+        if gas_baseline["version"] is None:
+            pytest.fail(
+                f"{BASELINE_PATH.name} was never recorded, record it with "
+                "GAS_BASELINE_UPDATE=1"
+            )
+        pytest.fail(
+            "no baseline for " + ", ".join(missing) + ", record it with "
+            "GAS_BASELINE_UPDATE=1"
+        )
+    assert not failures, "gas regression: " + ", ".join(failures)
@@ -0,0 +1,159 @@
+"""
+Gas benchmarks for the withdraw path.
+
+Every cell is a queue shape (strategy mix and queue length) and one of
+`withdraw`, `redeem`, `maxWithdraw` or `maxRedeem`. The measured gas is
+compared against the versioned baseline in `withdraw_gas_baseline.json`
+and a cell fails if it costs more than the baseline plus
+`GAS_REGRESSION_THRESHOLD` (a fraction, defaults to 0.02).
+
+A cell missing from the baseline fails as well. Run with
+`GAS_BASELINE_UPDATE=1` to record a new baseline instead of comparing,
+e.g. after an intended change to the withdraw path:
+
+    GAS_BASELINE_UPDATE=1 ape test tests/benchmarks/test_withdraw_gas.py
+
+The baseline stores the `apiVersion` of `vaultOriginal` it was recorded
+against. Until it is recorded every cell fails.
+"""
+
+import json
+import os
+from pathlib import Path
+
+import pytest
+from ape import chain
+from utils.constants import DAY, MAX_BPS_ACCOUNTANT, MAX_QUEUE
+
+BASELINE_PATH = Path(__file__).parent / "withdraw_gas_baseline.json"
+UPDATE_BASELINE = os.environ.get("GAS_BASELINE_UPDATE", "") == "1"
+THRESHOLD = float(os.environ.get("GAS_REGRESSION_THRESHOLD", "0.02"))
+
+QUEUE_LENGTHS = [1, 2, 4, 8, 16, 32, MAX_QUEUE]
+# Strategy types used round robin to build each queue.
+SHAPES = {
+    "liquid": ["liquid"],
+    "mixed": ["liquid", "lossy", "locked", "faulty"],
+}
+OPERATIONS = ["withdraw", "redeem", "maxWithdraw", "maxRedeem"]
+
+results = {}
+
+
+def load_baseline():
+    if not BASELINE_PATH.exists():
+        return {"version": None, "cells": {}}
+    return json.loads(BASELINE_PATH.read_text())
+
+
+@pytest.fixture(scope="module", autouse=True)
+def gas_baseline(vaultOriginal):
+    baseline = load_baseline()
+    yield baseline
+
+    if UPDATE_BASELINE and results:
+        baseline["version"] = vaultOriginal.apiVersion()
+        baseline["cells"].update(results)
+        baseline["cells"] = dict(sorted(baseline["cells"].items()))
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2) + "\n")
+
+
+@pytest.fixture(scope="module")
+def build_queue(
+    gov,
+    fish,
+    asset,
+    create_vault,
+    create_strategy,
+    create_lossy_strategy,
+    create_locked_strategy,
+    create_faulty_strategy,
+    airdrop_asset,
+    user_deposit,
+    add_strategy_to_vault,
+    add_debt_to_strategy,
+):
+    amount_per_strategy = 10**18
+    creators = {
+        "liquid": create_strategy,
+        "lossy": create_lossy_strategy,
+        "locked": create_locked_strategy,
+        "faulty": create_faulty_strategy,
+    }
+
+    def build_queue(shape, length):
+        vault = create_vault(
+            asset, vault_name=f"Gas {shape} {length}", vault_symbol=f"g{length}"
+        )
+        total = amount_per_strategy * length
+        airdrop_asset(gov, asset, fish, total)
+        user_deposit(fish, vault, asset, total)
+
+        kinds = SHAPES[shape]
+        for i in range(length):
+            kind = kinds[i % len(kinds)]
+            strategy = creators[kind](vault)
+            add_strategy_to_vault(gov, strategy, vault)
+            add_debt_to_strategy(gov, strategy, vault, amount_per_strategy)
+
+            # Put each position in the state its type is meant to exercise.
+            if kind == "lossy":
+                strategy.setLoss(gov, amount_per_strategy // 10, sender=gov)
+            elif kind == "locked":
+                strategy.setLockedFunds(amount_per_strategy // 2, DAY, sender=gov)
+
+        return vault
+
+    return build_queue
+
+
+@pytest.mark.parametrize("length", QUEUE_LENGTHS)
+@pytest.mark.parametrize("shape", SHAPES.keys())
+def test_withdraw_gas(fish, build_queue, gas_baseline, shape, length):
+    vault = build_queue(shape, length)
+    maxLoss = MAX_BPS_ACCOUNTANT
+    measured = {}
+
+    measured["maxWithdraw"] = vault.maxWithdraw.estimate_gas_cost(
+        fish.address, maxLoss, []
+    )
+    measured["maxRedeem"] = vault.maxRedeem.estimate_gas_cost(fish.address, maxLoss, [])
+
+    assets = vault.maxWithdraw(fish.address, maxLoss, [])
+    shares = vault.maxRedeem(fish.address, maxLoss, [])
+
+    snapshot = chain.snapshot()
+    tx = vault.withdraw(assets, fish.address, fish.address, maxLoss, [], sender=fish)
+    measured["withdraw"] = tx.gas_used
+    chain.restore(snapshot)
+
+    tx = vault.redeem(shares, fish.address, fish.address, maxLoss, [], sender=fish)
+    measured["redeem"] = tx.gas_used
+
+    failures = []
+    missing = []
+    for operation in OPERATIONS:
+        cell = f"{shape}/{length}/{operation}"
+        results[cell] = measured[operation]
+
+        expected = gas_baseline["cells"].get(cell)
+        if UPDATE_BASELINE:
+            continue
+        if expected is None:
+            missing.append(cell)
+            continue
+
+        if measured[operation] > expected * (1 + THRESHOLD):
+            failures.append(f"{cell}: {measured[operation]} > {expected}")
+
+    if missing:
+        if gas_baseline["version"] is None:
+            pytest.fail(
+                f"{BASELINE_PATH.name} was never recorded, record it with "
+                "GAS_BASELINE_UPDATE=1"
+            )
+        pytest.fail(
+            "no baseline for " + ", ".join(missing) + ", record it with "
+            "GAS_BASELINE_UPDATE=1"
+        )
+    assert not failures, "gas regression: " + ", ".join(failures)
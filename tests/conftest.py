@@ -370,6 +370,39 @@ def deploy_limit_module(project, gov):
     yield deploy_limit_module
 
 
+@pytest.fixture(scope="session")
+def vault_lens(project, gov):
+    yield gov.deploy(project.VaultLens)
+
+
+@pytest.fixture(scope="session")
+def partial_redeemer(project, gov):
+    yield gov.deploy(project.PartialRedeemer)
+
+
+@pytest.fixture(scope="session")
+def auto_allocator(project, gov):
+    yield gov.deploy(project.AutoAllocator)
+
+
+@pytest.fixture(scope="session")
+def debt_rebalancer(project, gov):
+    yield gov.deploy(project.DebtRebalancer)
+
+
+@pytest.fixture(scope="session")
+def idle_buffer(project, gov):
+    yield gov.deploy(project.IdleBuffer)
+
+
+@pytest.fixture(scope="session")
+def deploy_redeem_request_queue(project, gov):
+    def deploy_redeem_request_queue(vault):
+        return gov.deploy(project.RedeemRequestQueue, vault)
+
+    yield deploy_redeem_request_queue
+
+
 @pytest.fixture(scope="session")
 def mint_and_deposit_into_strategy(gov, asset):
     def mint_and_deposit_into_strategy(
@@ -119,9 +119,7 @@ def test__removeCustomProtocolFee(gov, vault_factory, create_vault, asset):
         vault_factory.protocolFeeConfig(sender=vault.address).feeRecipient
         == gov.address
     )
-    assert (
-        vault_factory.protocolFeeConfig(sender=vault.address).feeBps == generic_fee
-    )
+    assert vault_factory.protocolFeeConfig(sender=vault.address).feeBps == generic_fee
     assert vault_factory.protocolFeeConfig(vault.address).feeRecipient == gov.address
     assert vault_factory.protocolFeeConfig(vault.address).feeBps == generic_fee
 
@@ -129,6 +127,22 @@ def test__removeCustomProtocolFee(gov, vault_factory, create_vault, asset):
     assert vault_factory.customProtocolFee(vault.address) == 0
 
 
+def test__fee_config_changes__bump_fee_config_epoch(gov, vault_factory, vault):
+    epoch = vault_factory.feeConfigEpoch()
+
+    vault_factory.setProtocolFeeRecipient(gov.address, sender=gov)
+    assert vault_factory.feeConfigEpoch() == epoch + 1
+
+    vault_factory.setProtocolFeeBps(20, sender=gov)
+    assert vault_factory.feeConfigEpoch() == epoch + 2
+
+    vault_factory.setCustomProtocolFeeBps(vault.address, 10, sender=gov)
+    assert vault_factory.feeConfigEpoch() == epoch + 3
+
+    vault_factory.removeCustomProtocolFee(vault.address, sender=gov)
+    assert vault_factory.feeConfigEpoch() == epoch + 4
+
+
 def test__set_protocol_fee_before_recipient__reverts(gov, vault_factory):
     assert vault_factory.protocolFeeConfig().feeRecipient == ZERO_ADDRESS
 
@@ -0,0 +1,175 @@
+import ape
+import pytest
+from utils.constants import MAX_INT, ROLES
+
+
+@pytest.fixture
+def allocate_vault(
+    gov,
+    fish,
+    fish_amount,
+    asset,
+    create_vault,
+    create_strategy,
+    add_strategy_to_vault,
+    auto_allocator,
+):
+    vault = create_vault(asset)
+    strategies = [create_strategy(vault), create_strategy(vault)]
+    for strategy in strategies:
+        add_strategy_to_vault(gov, strategy, vault)
+        vault.updateMaxDebtForStrategy(strategy.address, MAX_INT, sender=gov)
+
+    vault.setRole(auto_allocator.address, ROLES.DEBT_MANAGER, sender=gov)
+    auto_allocator.setStrategies(
+        vault.address, [s.address for s in strategies], sender=gov
+    )
+    asset.approve(auto_allocator.address, MAX_INT, sender=fish)
+
+    return vault, strategies
+
+
+def test_deposit__forwards_idle_above_minimum_in_order(
+    gov, fish, fish_amount, asset, allocate_vault, auto_allocator
+):
+    vault, strategies = allocate_vault
+    minimum_total_idle = fish_amount // 10
+    max_debt = fish_amount // 2
+    vault.setMinimumTotalIdle(minimum_total_idle, sender=gov)
+    vault.updateMaxDebtForStrategy(strategies[0].address, max_debt, sender=gov)
+
+    tx = auto_allocator.deposit(vault.address, fish_amount, fish.address, sender=fish)
+    event = list(tx.decode_logs(auto_allocator.Allocated))
+
+    assert tx.return_value == fish_amount
+    assert vault.balanceOf(fish) == fish_amount
+    assert len(event) == 1
+    assert event[0].vault == vault.address
+    assert event[0].assets == fish_amount - minimum_total_idle
+    # The first strategy is filled up to its max debt first.
+    assert vault.strategies(strategies[0]).currentDebt == max_debt
+    assert (
+        vault.strategies(strategies[1]).currentDebt
+        == fish_amount - minimum_total_idle - max_debt
+    )
+    assert vault.totalIdle() == minimum_total_idle
+    assert asset.balanceOf(auto_allocator) == 0
+
+
+def test_deposit__existing_idle__forwards_only_deposit(
+    gov, fish, fish_amount, asset, allocate_vault, auto_allocator, user_deposit
+):
+    vault, strategies = allocate_vault
+    idle = fish_amount // 2
+    user_deposit(fish, vault, asset, idle)
+    assets = fish_amount // 10
+
+    tx = auto_allocator.deposit(vault.address, assets, fish.address, sender=fish)
+    event = list(tx.decode_logs(auto_allocator.Allocated))
+
+    # The idle that was already there is left to the debt manager.
+    assert event[0].assets == assets
+    assert vault.strategies(strategies[0]).currentDebt == assets
+    assert vault.strategies(strategies[1]).currentDebt == 0
+    assert vault.totalIdle() == idle
+
+
+def test_deposit__below_minimum_total_idle__keeps_funds_idle(
+    gov, fish, fish_amount, asset, allocate_vault, auto_allocator, user_deposit
+):
+    vault, strategies = allocate_vault
+    minimum_total_idle = fish_amount // 2
+    vault.setMinimumTotalIdle(minimum_total_idle, sender=gov)
+    assets = fish_amount // 4
+
+    tx = auto_allocator.deposit(vault.address, assets, fish.address, sender=fish)
+
+    assert list(tx.decode_logs(auto_allocator.Allocated)) == []
+    assert vault.totalIdle() == assets
+
+    # Only the part above the minimum is forwarded.
+    tx = auto_allocator.deposit(vault.address, assets * 2, fish.address, sender=fish)
+    event = list(tx.decode_logs(auto_allocator.Allocated))
+
+    assert event[0].assets == assets * 3 - minimum_total_idle
+    assert vault.totalIdle() == minimum_total_idle
+
+
+def test_mint__forwards_idle(fish, fish_amount, allocate_vault, auto_allocator):
+    vault, strategies = allocate_vault
+
+    tx = auto_allocator.mint(vault.address, fish_amount, fish.address, sender=fish)
+
+    assert tx.return_value == fish_amount
+    assert vault.balanceOf(fish) == fish_amount
+    assert vault.strategies(strategies[0]).currentDebt == fish_amount
+    assert vault.totalIdle() == 0
+
+
+def test_deposit__strategies_full__keeps_funds_idle(
+    gov, fish, fish_amount, allocate_vault, auto_allocator
+):
+    vault, strategies = allocate_vault
+    for strategy in strategies:
+        vault.updateMaxDebtForStrategy(strategy.address, 0, sender=gov)
+
+    tx = auto_allocator.deposit(vault.address, fish_amount, fish.address, sender=fish)
+
+    assert list(tx.decode_logs(auto_allocator.Allocated)) == []
+    assert vault.balanceOf(fish) == fish_amount
+    assert vault.totalIdle() == fish_amount
+    assert vault.totalDebt() == 0
+
+
+def test_deposit__revoked_strategy__forwards_to_next(
+    gov, fish, fish_amount, allocate_vault, auto_allocator
+):
+    vault, strategies = allocate_vault
+    vault.revokeStrategy(strategies[0].address, sender=gov)
+
+    auto_allocator.deposit(vault.address, fish_amount, fish.address, sender=fish)
+
+    assert vault.balanceOf(fish) == fish_amount
+    assert vault.strategies(strategies[1]).currentDebt == fish_amount
+    assert vault.totalIdle() == 0
+
+
+def test_deposit__update_debt_reverts__keeps_funds_idle(
+    gov, fish, fish_amount, allocate_vault, auto_allocator
+):
+    vault, _ = allocate_vault
+    # Without the role every `updateDebt` reverts.
+    vault.setRole(auto_allocator.address, 0, sender=gov)
+
+    tx = auto_allocator.deposit(vault.address, fish_amount, fish.address, sender=fish)
+
+    assert list(tx.decode_logs(auto_allocator.Allocated)) == []
+    assert vault.balanceOf(fish) == fish_amount
+    assert vault.totalIdle() == fish_amount
+    assert vault.totalDebt() == 0
+
+
+def test_set_strategies__without_debt_manager_role__reverts(
+    fish, allocate_vault, auto_allocator
+):
+    vault, strategies = allocate_vault
+
+    with ape.reverts("not allowed"):
+        auto_allocator.setStrategies(vault.address, [], sender=fish)
+
+
+def test_set_strategies__inactive_strategy__reverts(
+    gov, fish, allocate_vault, auto_allocator
+):
+    vault, strategies = allocate_vault
+
+    with ape.reverts("inactive strategy"):
+        auto_allocator.setStrategies(vault.address, [fish.address], sender=gov)
+
+    tx = auto_allocator.setStrategies(
+        vault.address, [strategies[1].address], sender=gov
+    )
+    event = list(tx.decode_logs(auto_allocator.UpdateStrategies))
+
+    assert event[0].strategies == [strategies[1].address]
+    assert auto_allocator.getStrategies(vault.address) == [strategies[1].address]
@@ -0,0 +1,110 @@
+import ape
+import pytest
+from utils.constants import ROLES
+
+
+@pytest.fixture
+def rebalance_vault(
+    gov,
+    fish,
+    fish_amount,
+    asset,
+    create_vault,
+    create_strategy,
+    user_deposit,
+    add_strategy_to_vault,
+    add_debt_to_strategy,
+    debt_rebalancer,
+):
+    vault = create_vault(asset)
+    strategies = [create_strategy(vault), create_strategy(vault)]
+
+    user_deposit(fish, vault, asset, fish_amount)
+    for strategy in strategies:
+        add_strategy_to_vault(gov, strategy, vault)
+    # All the funds are in the first strategy, nothing is idle.
+    add_debt_to_strategy(gov, strategies[0], vault, fish_amount)
+    vault.setRole(debt_rebalancer.address, ROLES.DEBT_MANAGER, sender=gov)
+
+    return vault, strategies
+
+
+def test_update_debts__increase_listed_first__runs_decreases_first(
+    gov, fish_amount, rebalance_vault, debt_rebalancer
+):
+    vault, strategies = rebalance_vault
+    new_debt = fish_amount // 4
+    targets = [
+        (strategies[1].address, fish_amount - new_debt),
+        (strategies[0].address, new_debt),
+    ]
+
+    with ape.reverts("no funds to deposit"):
+        vault.updateDebt(strategies[1].address, fish_amount - new_debt, sender=gov)
+
+    tx = debt_rebalancer.updateDebts(vault.address, targets, sender=gov)
+    event = list(tx.decode_logs(debt_rebalancer.DebtsUpdated))
+    debt_updates = list(tx.decode_logs(vault.DebtUpdated))
+
+    assert tx.return_value == [fish_amount - new_debt, new_debt]
+    assert len(event) == 1
+    assert event[0].vault == vault.address
+    assert event[0].caller == gov.address
+    assert event[0].decreases == 1
+    assert event[0].increases == 1
+    assert [log.strategy for log in debt_updates] == [
+        strategies[0].address,
+        strategies[1].address,
+    ]
+
+    assert vault.strategies(strategies[0]).currentDebt == new_debt
+    assert vault.strategies(strategies[1]).currentDebt == fish_amount - new_debt
+    assert vault.totalDebt() == fish_amount
+    assert vault.totalIdle() == 0
+
+
+def test_update_debts__strategy_at_target__skipped(
+    gov, fish_amount, rebalance_vault, debt_rebalancer
+):
+    vault, strategies = rebalance_vault
+    targets = [
+        (strategies[0].address, fish_amount // 2),
+        (strategies[1].address, 0),
+    ]
+
+    tx = debt_rebalancer.updateDebts(vault.address, targets, sender=gov)
+    event = list(tx.decode_logs(debt_rebalancer.DebtsUpdated))
+
+    assert tx.return_value == [fish_amount // 2, 0]
+    assert event[0].decreases == 1
+    assert event[0].increases == 0
+    assert vault.totalIdle() == fish_amount // 2
+
+
+def test_update_debts__minimum_total_idle__kept_idle(
+    gov, fish_amount, rebalance_vault, debt_rebalancer
+):
+    vault, strategies = rebalance_vault
+    minimum_total_idle = fish_amount // 10
+    vault.setMinimumTotalIdle(minimum_total_idle, sender=gov)
+    targets = [
+        (strategies[1].address, fish_amount // 2),
+        (strategies[0].address, fish_amount // 2),
+    ]
+
+    tx = debt_rebalancer.updateDebts(vault.address, targets, sender=gov)
+
+    # The increase only gets what is left above the minimum.
+    assert tx.return_value == [fish_amount // 2 - minimum_total_idle, fish_amount // 2]
+    assert vault.totalIdle() == minimum_total_idle
+
+
+def test_update_debts__without_debt_manager_role__reverts(
+    fish, fish_amount, rebalance_vault, debt_rebalancer
+):
+    vault, strategies = rebalance_vault
+
+    with ape.reverts("not allowed"):
+        debt_rebalancer.updateDebts(
+            vault.address, [(strategies[0].address, 0)], sender=fish
+        )
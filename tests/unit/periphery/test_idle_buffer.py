@@ -0,0 +1,118 @@
+import math
+
+import ape
+import pytest
+from utils.constants import DAY, ROLES
+
+
+@pytest.fixture
+def buffer_vault(gov, fish, fish_amount, asset, initial_set_up, idle_buffer):
+    # All the funds are in the strategy, nothing is idle.
+    vault, strategy, _ = initial_set_up(asset, gov, fish_amount, fish)
+    vault.setRole(
+        idle_buffer.address,
+        ROLES.MINIMUM_IDLE_MANAGER | ROLES.DEBT_MANAGER,
+        sender=gov,
+    )
+    vault.setRole(gov.address, ROLES.ALL, sender=gov)
+
+    return vault, strategy
+
+
+def test_set_config__no_role__reverts(fish, buffer_vault, idle_buffer):
+    vault, _ = buffer_vault
+
+    with ape.reverts("not allowed"):
+        idle_buffer.setConfig(vault.address, DAY, DAY, 0, 0, sender=fish)
+
+
+def test_update__no_role__reverts(fish, gov, buffer_vault, idle_buffer):
+    vault, _ = buffer_vault
+    idle_buffer.setConfig(vault.address, DAY, DAY, 0, 0, sender=gov)
+
+    with ape.reverts("not allowed"):
+        idle_buffer.update(vault.address, sender=fish)
+
+
+def test_update__no_withdrawals__refills_minimum(
+    gov, fish_amount, buffer_vault, idle_buffer
+):
+    vault, strategy = buffer_vault
+    minimum = fish_amount // 10
+    idle_buffer.setConfig(vault.address, DAY, DAY, minimum, fish_amount, sender=gov)
+
+    tx = idle_buffer.update(vault.address, sender=gov)
+    event = list(tx.decode_logs(idle_buffer.UpdateBuffer))
+
+    assert tx.return_value == minimum
+    assert event[0].withdrawn == 0
+    assert event[0].minimumTotalIdle == minimum
+    assert event[0].totalIdle == minimum
+    assert vault.minimumTotalIdle() == minimum
+    # The higher minimum was pulled back from the strategy.
+    assert vault.totalIdle() == minimum
+    assert vault.strategies(strategy).currentDebt == fish_amount - minimum
+
+
+def test_update__withdrawals__buffer_follows_flow(
+    chain, gov, fish, fish_amount, buffer_vault, idle_buffer
+):
+    vault, strategy = buffer_vault
+    idle_buffer.setConfig(vault.address, DAY, DAY, 0, fish_amount, sender=gov)
+    withdrawn = fish_amount // 10
+    vault.withdraw(withdrawn, fish.address, fish.address, sender=fish)
+
+    target = idle_buffer.update(vault.address, sender=gov).return_value
+
+    # A day of flow, a withdrawal weighs ln(2) of itself right after.
+    assert target == pytest.approx(withdrawn * math.log(2), rel=1e-9)
+    assert vault.minimumTotalIdle() == target
+    assert vault.totalIdle() == target
+
+    chain.pending_timestamp += DAY
+    chain.mine()
+
+    assert idle_buffer.target(vault.address) == pytest.approx(target / 2, rel=1e-9)
+
+    # The flow fades out, the smaller buffer stays idle until the
+    # DEBT_MANAGER puts it back to work.
+    chain.pending_timestamp += 300 * DAY
+    chain.mine()
+    target = idle_buffer.update(vault.address, sender=gov).return_value
+
+    assert target == 0
+    assert vault.minimumTotalIdle() == 0
+
+
+def test_update__large_exit__capped_at_maximum(
+    gov, fish, fish_amount, buffer_vault, idle_buffer
+):
+    vault, _ = buffer_vault
+    maximum = fish_amount // 10
+    idle_buffer.setConfig(vault.address, DAY, DAY, 0, maximum, sender=gov)
+    vault.withdraw(fish_amount // 2, fish.address, fish.address, sender=fish)
+
+    target = idle_buffer.update(vault.address, sender=gov).return_value
+
+    assert target == maximum
+    assert vault.minimumTotalIdle() == maximum
+    assert vault.totalIdle() == maximum
+
+
+def test_update__deposit__not_counted_as_flow(
+    gov,
+    fish,
+    fish_amount,
+    asset,
+    buffer_vault,
+    idle_buffer,
+    user_deposit,
+    airdrop_asset,
+):
+    vault, _ = buffer_vault
+    idle_buffer.setConfig(vault.address, DAY, DAY, 0, fish_amount, sender=gov)
+    airdrop_asset(gov, asset, fish, fish_amount // 10)
+    user_deposit(fish, vault, asset, fish_amount // 10)
+
+    assert idle_buffer.update(vault.address, sender=gov).return_value == 0
+    assert idle_buffer.flow(vault.address).withdrawn == 0
@@ -0,0 +1,126 @@
+import pytest
+from utils.constants import DAY, ROLES
+
+
+@pytest.fixture
+def locked_vault(
+    gov,
+    fish,
+    fish_amount,
+    asset,
+    create_vault,
+    create_locked_strategy,
+    user_deposit,
+    add_strategy_to_vault,
+    add_debt_to_strategy,
+):
+    vault = create_vault(asset)
+    strategy = create_locked_strategy(vault)
+    vault.setRole(gov.address, ROLES.ALL, sender=gov)
+
+    user_deposit(fish, vault, asset, fish_amount)
+    add_strategy_to_vault(gov, strategy, vault)
+    add_debt_to_strategy(gov, strategy, vault, fish_amount)
+    # Lock half of the funds in the strategy.
+    strategy.setLockedFunds(fish_amount // 2, DAY, sender=gov)
+
+    return vault
+
+
+def test_redeem__with_locked_funds__redeems_available(
+    fish, fish_amount, asset, locked_vault, partial_redeemer
+):
+    vault = locked_vault
+    available = fish_amount // 2
+    vault.approve(partial_redeemer.address, fish_amount, sender=fish)
+
+    tx = partial_redeemer.redeem(vault.address, fish_amount, fish.address, sender=fish)
+    event = list(tx.decode_logs(partial_redeemer.PartialRedeem))
+
+    assert len(event) == 1
+    assert event[0].vault == vault.address
+    assert event[0].owner == fish.address
+    assert event[0].receiver == fish.address
+    assert event[0].shares == available
+    assert event[0].assets == available
+    assert event[0].unfilledShares == fish_amount - available
+
+    assert vault.balanceOf(fish) == fish_amount - available
+    assert vault.balanceOf(partial_redeemer) == 0
+    assert asset.balanceOf(fish) == available
+    assert asset.balanceOf(partial_redeemer) == 0
+
+
+def test_withdraw__with_locked_funds__withdraws_available(
+    fish, fish_amount, asset, locked_vault, partial_redeemer
+):
+    vault = locked_vault
+    available = fish_amount // 2
+    vault.approve(partial_redeemer.address, fish_amount, sender=fish)
+
+    tx = partial_redeemer.withdraw(
+        vault.address, fish_amount, fish.address, sender=fish
+    )
+    event = list(tx.decode_logs(partial_redeemer.PartialWithdraw))
+
+    assert len(event) == 1
+    assert event[0].assets == available
+    assert event[0].shares == available
+    assert event[0].unfilledAssets == fish_amount - available
+
+    assert vault.balanceOf(fish) == fish_amount - available
+    assert asset.balanceOf(fish) == available
+
+
+def test_redeem__with_fully_liquid_vault__redeems_all(
+    gov, fish, fish_amount, asset, initial_set_up, partial_redeemer
+):
+    vault, _, _ = initial_set_up(asset, gov, fish_amount, fish)
+    vault.approve(partial_redeemer.address, fish_amount, sender=fish)
+
+    tx = partial_redeemer.redeem(vault.address, fish_amount, fish.address, sender=fish)
+    event = list(tx.decode_logs(partial_redeemer.PartialRedeem))
+
+    assert event[0].shares == fish_amount
+    assert event[0].unfilledShares == 0
+    assert vault.balanceOf(fish) == 0
+    assert asset.balanceOf(fish) == fish_amount
+
+
+def test_redeem__nothing_available__does_not_revert(
+    fish, fish_amount, locked_vault, partial_redeemer
+):
+    vault = locked_vault
+    vault.approve(partial_redeemer.address, fish_amount, sender=fish)
+    # Take everything that is not locked.
+    vault.redeem(fish_amount // 2, fish.address, fish.address, sender=fish)
+
+    tx = partial_redeemer.redeem(
+        vault.address, fish_amount // 2, fish.address, sender=fish
+    )
+    event = list(tx.decode_logs(partial_redeemer.PartialRedeem))
+
+    assert event[0].shares == 0
+    assert event[0].assets == 0
+    assert event[0].unfilledShares == fish_amount // 2
+    assert vault.balanceOf(fish) == fish_amount // 2
+
+
+def test_withdraw__loss_above_max_loss__returns_shares(
+    gov, fish, fish_amount, asset, initial_set_up_lossy, partial_redeemer
+):
+    vault, strategy, _ = initial_set_up_lossy(asset, gov, fish_amount, fish)
+    strategy.setWithdrawingLoss(fish_amount // 10, sender=gov)
+    vault.approve(partial_redeemer.address, fish_amount, sender=fish)
+
+    tx = partial_redeemer.withdraw(
+        vault.address, fish_amount, fish.address, sender=fish
+    )
+    event = list(tx.decode_logs(partial_redeemer.PartialWithdraw))
+
+    assert event[0].assets == 0
+    assert event[0].shares == 0
+    assert event[0].unfilledAssets == fish_amount
+    assert vault.balanceOf(fish) == fish_amount
+    assert vault.balanceOf(partial_redeemer) == 0
+    assert asset.balanceOf(fish) == 0
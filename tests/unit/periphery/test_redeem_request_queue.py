@@ -0,0 +1,133 @@
+import ape
+from utils.constants import DAY, ROLES
+
+
+def test_request_redeem__locks_shares(
+    gov, fish, fish_amount, asset, initial_set_up, deploy_redeem_request_queue
+):
+    vault, _, _ = initial_set_up(asset, gov, fish_amount, fish)
+    queue = deploy_redeem_request_queue(vault)
+    vault.approve(queue.address, fish_amount, sender=fish)
+
+    tx = queue.requestRedeem(fish_amount, sender=fish)
+    event = list(tx.decode_logs(queue.RedeemRequest))
+
+    assert len(event) == 1
+    assert event[0].owner == fish.address
+    assert event[0].epoch == 0
+    assert event[0].shares == fish_amount
+
+    assert vault.balanceOf(queue) == fish_amount
+    assert queue.pendingRedeemRequest(fish) == fish_amount
+    assert queue.epochs(0).requestedShares == fish_amount
+
+
+def test_cancel_redeem_request__returns_shares(
+    gov, fish, fish_amount, asset, initial_set_up, deploy_redeem_request_queue
+):
+    vault, _, _ = initial_set_up(asset, gov, fish_amount, fish)
+    queue = deploy_redeem_request_queue(vault)
+    vault.approve(queue.address, fish_amount, sender=fish)
+    queue.requestRedeem(fish_amount, sender=fish)
+
+    queue.cancelRedeemRequest(sender=fish)
+
+    assert vault.balanceOf(fish) == fish_amount
+    assert queue.pendingRedeemRequest(fish) == 0
+    assert queue.epochs(0).requestedShares == 0
+
+    with ape.reverts("no request"):
+        queue.cancelRedeemRequest(sender=fish)
+
+
+def test_settle__no_role__reverts(
+    gov, fish, bunny, fish_amount, asset, initial_set_up, deploy_redeem_request_queue
+):
+    vault, _, _ = initial_set_up(asset, gov, fish_amount, fish)
+    queue = deploy_redeem_request_queue(vault)
+    vault.approve(queue.address, fish_amount, sender=fish)
+    queue.requestRedeem(fish_amount, sender=fish)
+
+    with ape.reverts("not allowed"):
+        queue.settle(sender=bunny)
+
+
+def test_settle_and_claim__shared_price(
+    gov,
+    fish,
+    bunny,
+    fish_amount,
+    asset,
+    initial_set_up,
+    user_deposit,
+    deploy_redeem_request_queue,
+):
+    vault, _, _ = initial_set_up(asset, gov, fish_amount, fish)
+    user_deposit(bunny, vault, asset, fish_amount)
+    queue = deploy_redeem_request_queue(vault)
+    half = fish_amount // 2
+
+    vault.approve(queue.address, half, sender=fish)
+    vault.approve(queue.address, fish_amount, sender=bunny)
+    queue.requestRedeem(half, sender=fish)
+    queue.requestRedeem(fish_amount, sender=bunny)
+
+    with ape.reverts("not settled"):
+        queue.claim(0, sender=fish)
+
+    tx = queue.settle(sender=gov)
+    event = list(tx.decode_logs(queue.EpochSettled))
+
+    assert len(event) == 1
+    assert event[0].epoch == 0
+    assert event[0].requestedShares == half + fish_amount
+    assert event[0].redeemedShares == half + fish_amount
+    assert event[0].assets == half + fish_amount
+    assert queue.currentEpoch() == 1
+
+    assert queue.claimableRedeemRequest(fish, 0) == (half, 0)
+    queue.claim(0, sender=fish)
+    queue.claim(0, sender=bunny)
+
+    assert asset.balanceOf(fish) == half
+    assert asset.balanceOf(bunny) == fish_amount
+    assert asset.balanceOf(queue) == 0
+
+    with ape.reverts("nothing to claim"):
+        queue.claim(0, sender=fish)
+
+
+def test_settle__with_locked_funds__returns_unfilled_shares(
+    gov,
+    fish,
+    fish_amount,
+    asset,
+    create_vault,
+    create_locked_strategy,
+    user_deposit,
+    add_strategy_to_vault,
+    add_debt_to_strategy,
+    deploy_redeem_request_queue,
+):
+    vault = create_vault(asset)
+    strategy = create_locked_strategy(vault)
+    vault.setRole(gov.address, ROLES.ALL, sender=gov)
+    user_deposit(fish, vault, asset, fish_amount)
+    add_strategy_to_vault(gov, strategy, vault)
+    add_debt_to_strategy(gov, strategy, vault, fish_amount)
+    strategy.setLockedFunds(fish_amount // 2, DAY, sender=gov)
+
+    queue = deploy_redeem_request_queue(vault)
+    vault.approve(queue.address, fish_amount, sender=fish)
+    queue.requestRedeem(fish_amount, sender=fish)
+
+    queue.settle(sender=gov)
+    assert queue.epochs(0).redeemedShares == fish_amount // 2
+
+    tx = queue.claim(0, sender=fish)
+    event = list(tx.decode_logs(queue.Claim))
+
+    assert event[0].assets == fish_amount // 2
+    assert event[0].returnedShares == fish_amount // 2
+    assert asset.balanceOf(fish) == fish_amount // 2
+    assert vault.balanceOf(fish) == fish_amount // 2
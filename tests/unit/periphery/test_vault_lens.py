@@ -0,0 +1,407 @@
+import ape
+from ape import chain
+from utils.constants import DAY, ROLES, WEEK
+
+
+def test_process_report__records_liquidity_snapshot(
+    gov, fish, fish_amount, asset, initial_set_up, vault_lens
+):
+    vault, strategy, _ = initial_set_up(asset, gov, fish_amount, fish)
+
+    vault.processReport(strategy.address, sender=gov)
+
+    liquidity = vault_lens.strategyLiquidity(vault, strategy.address)
+    assert liquidity.withdrawable == fish_amount
+    assert liquidity.lossRatio == 0
+    assert liquidity.lastSnapshot == chain.blocks.head.timestamp
+    # Packed into one slot.
+    assert vault.strategyLiquidity(strategy.address) == (
+        liquidity.lastSnapshot << 168 | fish_amount
+    )
+
+
+def test_update_debt__increase__leaves_snapshot(
+    gov, fish, fish_amount, asset, initial_set_up, vault_lens
+):
+    # The debt was only ever increased.
+    vault, strategy, _ = initial_set_up(asset, gov, fish_amount, fish)
+
+    assert vault.strategyLiquidity(strategy.address) == 0
+
+    # Nothing recorded, the estimate stays low until the next report.
+    amount, age = vault_lens.maxWithdrawFromSnapshot(vault, fish)
+    assert amount == 0
+    assert age == chain.blocks.head.timestamp
+
+
+def test_update_debt__decrease__records_what_is_left(
+    gov, fish, fish_amount, asset, initial_set_up, vault_lens
+):
+    vault, strategy, _ = initial_set_up(asset, gov, fish_amount, fish)
+
+    vault.updateDebt(strategy.address, fish_amount // 4, sender=gov)
+
+    liquidity = vault_lens.strategyLiquidity(vault, strategy.address)
+    assert liquidity.withdrawable == fish_amount // 4
+    assert liquidity.lossRatio == 0
+    assert liquidity.lastSnapshot == chain.blocks.head.timestamp
+
+    amount, age = vault_lens.maxWithdrawFromSnapshot(vault, fish)
+    assert amount == vault.maxWithdraw(fish) == fish_amount
+    assert age == 0
+
+
+def test_withdraw__from_strategy__leaves_snapshot(
+    gov, fish, fish_amount, asset, initial_set_up, vault_lens
+):
+    vault, strategy, _ = initial_set_up(asset, gov, fish_amount, fish)
+    vault.processReport(strategy.address, sender=gov)
+    recorded = vault.strategyLiquidity(strategy.address)
+
+    vault.redeem(fish_amount // 2, fish.address, fish.address, sender=fish)
+
+    # Withdraws do not write the snapshot, the debt left still caps it.
+    assert vault.strategyLiquidity(strategy.address) == recorded
+    amount, _ = vault_lens.maxWithdrawFromSnapshot(vault, fish)
+    assert amount == vault.maxWithdraw(fish) == fish_amount // 2
+
+
+def test_max_withdraw_from_snapshot__liquid_strategy__matches_max_withdraw(
+    gov, fish, fish_amount, asset, initial_set_up, vault_lens
+):
+    vault, strategy, _ = initial_set_up(asset, gov, fish_amount, fish)
+    vault.processReport(strategy.address, sender=gov)
+
+    amount, age = vault_lens.maxWithdrawFromSnapshot(vault, fish)
+    assert amount == vault.maxWithdraw(fish) == fish_amount
+    assert age == 0
+
+    shares, age = vault_lens.maxRedeemFromSnapshot(vault, fish)
+    assert shares == vault.maxRedeem(fish) == fish_amount
+    assert age == 0
+
+
+def test_max_withdraw_from_snapshot__locked_strategy__returns_snapshot_age(
+    gov,
+    fish,
+    fish_amount,
+    asset,
+    create_vault,
+    create_locked_strategy,
+    user_deposit,
+    add_strategy_to_vault,
+    add_debt_to_strategy,
+    vault_lens,
+    chain,
+):
+    vault = create_vault(asset)
+    locked_strategy = create_locked_strategy(vault)
+    vault.setRole(gov.address, ROLES.ALL, sender=gov)
+    amount_to_lock = fish_amount // 2
+
+    user_deposit(fish, vault, asset, fish_amount)
+    add_strategy_to_vault(gov, locked_strategy, vault)
+    add_debt_to_strategy(gov, locked_strategy, vault, fish_amount)
+    locked_strategy.setLockedFunds(amount_to_lock, DAY, sender=gov)
+    # The snapshot only sees the locked funds once the vault checks again.
+    vault.processReport(locked_strategy.address, sender=gov)
+
+    chain.pending_timestamp += DAY // 2
+    chain.mine()
+
+    amount, age = vault_lens.maxWithdrawFromSnapshot(vault, fish)
+    assert amount == vault.maxWithdraw(fish) == fish_amount - amount_to_lock
+    assert age >= DAY // 2
+
+
+def test_max_withdraw_from_snapshot__with_inactive_strategy__reverts(
+    gov, fish, fish_amount, asset, initial_set_up, create_strategy, vault_lens
+):
+    vault, _, _ = initial_set_up(asset, gov, fish_amount, fish)
+    inactive_strategy = create_strategy(vault)
+
+    with ape.reverts("inactive strategy"):
+        vault_lens.maxWithdrawFromSnapshot(vault, fish, 0, [inactive_strategy.address])
+
+
+def report_profit(asset, strategy, vault, gov, profit):
+    asset.transfer(strategy, profit, sender=gov)
+    strategy.report(sender=gov)
+    vault.processReport(strategy, sender=gov)
+
+
+def test_process_report__writes_checkpoint(
+    gov, fish, fish_amount, asset, initial_set_up
+):
+    vault, strategy, _ = initial_set_up(asset, gov, fish_amount, fish)
+    assert vault.reportCheckpointCount() == 0
+
+    report_profit(asset, strategy, vault, gov, fish_amount // 10)
+
+    assert vault.reportCheckpointCount() == 1
+    totals = vault.reportCheckpoints(0, 0)
+    profit_unlock = vault.reportCheckpoints(0, 1)
+    assert totals >> 128 == vault.totalAssets()
+    assert totals & (2**128 - 1) == vault.totalSupply() + vault.unlockedShares()
+    assert profit_unlock >> 216 == vault.fullProfitUnlockDate()
+    assert (profit_unlock >> 176) & (2**40 - 1) == chain.blocks.head.timestamp
+    assert profit_unlock & (2**144 - 1) == vault.profitUnlockingRate()
+
+
+def test_price_per_share_at__profit_unlocking__matches_past_price_per_share(
+    gov, fish, fish_amount, asset, initial_set_up, vault_lens
+):
+    vault, strategy, _ = initial_set_up(asset, gov, fish_amount, fish)
+    report_profit(asset, strategy, vault, gov, fish_amount // 10)
+
+    history = []
+    for offset in [DAY, 3 * DAY, WEEK - 1, WEEK + DAY]:
+        chain.mine(timestamp=vault.lastProfitUpdate() + offset)
+        head = chain.blocks.head
+        history.append((head.timestamp, vault.pricePerShare(block_id=head.number)))
+
+    # A later report does not change the past.
+    report_profit(asset, strategy, vault, gov, fish_amount // 20)
+    chain.mine(timestamp=chain.blocks.head.timestamp + DAY)
+
+    for timestamp, price_per_share in history[:-1]:
+        assert vault_lens.pricePerShareAt(vault, timestamp) == price_per_share
+    # Past the unlock period it may be a wei off the locked shares rounding.
+    timestamp, price_per_share = history[-1]
+    assert abs(vault_lens.pricePerShareAt(vault, timestamp) - price_per_share) <= 1
+    assert vault_lens.pricePerShareAt(
+        vault, chain.blocks.head.timestamp
+    ) == vault.pricePerShare(block_id=chain.blocks.head.number)
+
+
+def test_price_per_share_at__not_covered__reverts(
+    gov, fish, fish_amount, asset, initial_set_up, vault_lens
+):
+    vault, strategy, _ = initial_set_up(asset, gov, fish_amount, fish)
+
+    with ape.reverts("not covered"):
+        vault_lens.pricePerShareAt(vault, chain.blocks.head.timestamp)
+
+    report_profit(asset, strategy, vault, gov, fish_amount // 10)
+    report_timestamp = chain.blocks.head.timestamp
+
+    with ape.reverts("not covered"):
+        vault_lens.pricePerShareAt(vault, report_timestamp - 1)
+    with ape.reverts("future timestamp"):
+        vault_lens.pricePerShareAt(vault, report_timestamp + WEEK)
+
+
+def test_price_per_share_at__ring_buffer_full__drops_oldest_checkpoint(
+    gov, fish, fish_amount, asset, initial_set_up, vault_lens
+):
+    vault, strategy, _ = initial_set_up(asset, gov, fish_amount, fish)
+    reports = []
+    for _ in range(129):
+        chain.pending_timestamp += DAY
+        vault.processReport(strategy, sender=gov)
+        reports.append(chain.blocks.head.timestamp)
+
+    assert vault.reportCheckpointCount() == 129
+    with ape.reverts("not covered"):
+        vault_lens.pricePerShareAt(vault, reports[0])
+    assert vault_lens.pricePerShareAt(vault, reports[1]) == vault.pricePerShare()
+
+
+def test_preview_update_debt__matches_update_debt(
+    gov, fish, fish_amount, asset, initial_set_up, vault_lens, user_deposit
+):
+    vault, strategy, _ = initial_set_up(asset, gov, fish_amount // 2, fish)
+    user_deposit(fish, vault, asset, fish_amount // 2)
+    for target_debt, minimum_total_idle in [
+        (fish_amount, fish_amount // 4),
+        # Only asks for 1 but the vault refills its minimum idle.
+        (fish_amount * 3 // 4 - 1, fish_amount // 2),
+    ]:
+        vault.setMinimumTotalIdle(minimum_total_idle, sender=gov)
+        preview = vault_lens.previewUpdateDebt(vault, strategy, target_debt)
+        vault.updateDebt(strategy, target_debt, sender=gov)
+
+        assert preview.reason == ""
+        assert preview.newDebt == vault.strategies(strategy).currentDebt
+        assert preview.totalIdle == vault.totalIdle()
+        assert preview.totalDebt == vault.totalDebt()
+
+    assert vault.totalIdle() == fish_amount // 2
+
+
+def test_preview_update_debt__guard_would_fire__returns_reason(
+    gov, fish, fish_amount, asset, initial_set_up_lossy, vault_lens
+):
+    vault, strategy, _ = initial_set_up_lossy(asset, gov, fish_amount, fish)
+
+    preview = vault_lens.previewUpdateDebt(vault, strategy, fish_amount)
+    assert preview.reason == "new debt equals current debt"
+    assert preview.newDebt == preview.currentDebt == fish_amount
+
+    preview = vault_lens.previewUpdateDebt(vault, strategy, 2 * fish_amount)
+    assert preview.reason == "target debt higher than max debt"
+
+    vault.updateMaxDebtForStrategy(strategy, 2 * fish_amount, sender=gov)
+    preview = vault_lens.previewUpdateDebt(vault, strategy, 2 * fish_amount)
+    assert preview.reason == "no funds to deposit"
+    with ape.reverts(preview.reason):
+        vault.updateDebt(strategy, 2 * fish_amount, sender=gov)
+
+    strategy.setLoss(gov, fish_amount // 10, sender=gov)
+    preview = vault_lens.previewUpdateDebt(vault, strategy, 0)
+    assert preview.reason == "strategy has unrealised losses"
+    assert preview.totalIdle == vault.totalIdle()
+    assert preview.totalDebt == vault.totalDebt()
+    with ape.reverts(preview.reason):
+        vault.updateDebt(strategy, 0, sender=gov)
+
+
+def test_preview_update_debts__decrease_funds_increase(
+    gov,
+    fish,
+    fish_amount,
+    asset,
+    initial_set_up,
+    create_strategy,
+    add_strategy_to_vault,
+    vault_lens,
+):
+    vault, strategy, _ = initial_set_up(asset, gov, fish_amount, fish)
+    other_strategy = create_strategy(vault)
+    add_strategy_to_vault(gov, other_strategy, vault)
+    vault.updateMaxDebtForStrategy(other_strategy, fish_amount, sender=gov)
+
+    increase_first = vault_lens.previewUpdateDebts(
+        vault, [(other_strategy, fish_amount // 2), (strategy, fish_amount // 2)]
+    )
+    previews = vault_lens.previewUpdateDebts(
+        vault, [(strategy, fish_amount // 2), (other_strategy, fish_amount // 2)]
+    )
+
+    assert increase_first[0].reason == "no funds to deposit"
+    assert increase_first[1].reason == ""
+    assert [preview.reason for preview in previews] == ["", ""]
+    assert previews[0].totalIdle == fish_amount // 2
+    assert previews[1].newDebt == fish_amount // 2
+    assert previews[1].totalIdle == 0
+    assert previews[1].totalDebt == fish_amount
+
+
+def test_get_vault_state__matches_vault_getters(
+    gov, fish, fish_amount, asset, initial_set_up, vault_lens
+):
+    vault, strategy, accountant = initial_set_up(
+        asset, gov, fish_amount // 2, fish, performanceFee=1_000
+    )
+    vault.setMinimumTotalIdle(fish_amount // 10, sender=gov)
+    report_profit(asset, strategy, vault, gov, fish_amount // 10)
+    chain.pending_timestamp += DAY
+    chain.mine()
+
+    state = vault_lens.getVaultState(vault)
+
+    assert state.accountant == accountant.address
+    assert state.unlockedShares > 0
+    assert state.defaultQueue == [strategy.address]
+    for name in [
+        "totalAssets",
+        "totalSupply",
+        "totalIdle",
+        "totalDebt",
+        "pricePerShare",
+        "unlockedShares",
+        "fullProfitUnlockDate",
+        "profitUnlockingRate",
+        "lastProfitUpdate",
+        "profitMaxUnlockTime",
+        "depositLimit",
+        "minimumTotalIdle",
+        "isShutdown",
+        "depositLimitModule",
+        "withdrawLimitModule",
+    ]:
+        assert getattr(state, name) == getattr(vault, name)()
+
+
+def test_get_strategy_states__lossy_strategy__reports_live_position(
+    gov,
+    fish,
+    fish_amount,
+    asset,
+    initial_set_up_lossy,
+    create_strategy,
+    add_strategy_to_vault,
+    user_deposit,
+    vault_lens,
+):
+    vault, strategy, _ = initial_set_up_lossy(asset, gov, fish_amount // 2, fish)
+    user_deposit(fish, vault, asset, fish_amount // 2)
+    vault.setMinimumTotalIdle(fish_amount // 10, sender=gov)
+    other_strategy = create_strategy(vault)
+    add_strategy_to_vault(gov, other_strategy, vault)
+    vault.updateMaxDebtForStrategy(other_strategy, fish_amount, sender=gov)
+    loss = fish_amount // 10
+    strategy.setLoss(gov, loss, sender=gov)
+
+    states = vault_lens.getStrategyStates(vault)
+
+    assert [state.strategy for state in states] == [
+        strategy.address,
+        other_strategy.address,
+    ]
+    state = states[0]
+    assert state.params.currentDebt == fish_amount // 2
+    assert state.shares == strategy.balanceOf(vault)
+    assert state.assets == fish_amount // 2 - loss
+    assert state.unrealisedLoss == loss
+    assert state.redeemable == strategy.convertToAssets(strategy.maxRedeem(vault))
+    # Already at its max debt.
+    assert state.depositable == 0
+    assert states[1].assets == 0
+    # Only the idle above the minimum can be deposited.
+    assert states[1].depositable == fish_amount // 2 - fish_amount // 10
+
+    states = vault_lens.getStrategyStates(vault, [other_strategy])
+    assert [state.strategy for state in states] == [other_strategy.address]
+
+    with ape.reverts("inactive strategy"):
+        vault_lens.getStrategyStates(vault, [fish])
+
+    vault.shutdownVault(sender=gov)
+
+    (state,) = vault_lens.getStrategyStates(vault, [other_strategy])
+    assert state.depositable == 0
+
+
+def test_preview_redeem_detailed__unrealised_loss__matches_redeem(
+    gov, fish, fish_amount, asset, initial_set_up_lossy, vault_lens
+):
+    vault, strategy, _ = initial_set_up_lossy(asset, gov, fish_amount, fish)
+    loss = fish_amount // 10
+    strategy.setLoss(gov, loss, sender=gov)
+    shares = vault.balanceOf(fish) // 2
+
+    preview = vault_lens.previewRedeemDetailed(vault, shares)
+
+    assert preview.reason == ""
+    assert preview.assets == fish_amount // 2
+    assert preview.received == fish_amount // 2 - loss // 2
+    assert preview.fromIdle == 0
+    # 10% of the debt is lost.
+    assert preview.maxLoss == 1_000
+    assert len(preview.sources) == 1
+    assert preview.sources[0].strategy == strategy.address
+    assert preview.sources[0].assets == preview.received
+    assert preview.sources[0].unrealisedLoss == loss // 2
+    withdraw_preview = vault_lens.previewWithdrawDetailed(vault, preview.assets)
+    assert withdraw_preview.received == preview.received
+    assert withdraw_preview.maxLoss == preview.maxLoss
+
+    with ape.reverts("too much loss"):
+        vault.redeem(
+            shares, fish.address, fish.address, preview.maxLoss - 1, sender=fish
+        )
+    tx = vault.redeem(shares, fish.address, fish.address, preview.maxLoss, sender=fish)
+
+    assert tx.return_value == preview.received
+    assert vault_lens.previewRedeemDetailed(vault, 0).reason == "no shares to redeem"
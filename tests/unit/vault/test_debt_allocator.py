@@ -0,0 +1,132 @@
+import pytest
+from utils.allocator import (
+    AllocationConfig,
+    StrategyState,
+    allocate,
+    execute,
+    solve,
+)
+from utils.constants import MAX_INT
+
+UNLIMITED = 10**30
+
+
+@pytest.fixture
+def set_up_allocation(
+    gov,
+    fish,
+    fish_amount,
+    asset,
+    create_vault,
+    create_strategy,
+    create_lossy_strategy,
+    user_deposit,
+    add_strategy_to_vault,
+):
+    def set_up_allocation(debts, lossy=False):
+        vault = create_vault(asset)
+        user_deposit(fish, vault, asset, fish_amount)
+        strategies = []
+        for debt in debts:
+            strategy = (create_lossy_strategy if lossy else create_strategy)(vault)
+            add_strategy_to_vault(gov, strategy, vault)
+            vault.updateMaxDebtForStrategy(strategy.address, MAX_INT, sender=gov)
+            if debt > 0:
+                vault.updateDebt(strategy.address, debt, sender=gov)
+            strategies.append(strategy)
+        return vault, strategies
+
+    return set_up_allocation
+
+
+def test_allocate__moves_debt_to_best_apr__executes_on_chain(
+    gov, fish_amount, set_up_allocation
+):
+    vault, strategies = set_up_allocation([fish_amount // 2, fish_amount // 4, 0])
+    max_debt = fish_amount // 4
+    vault.updateMaxDebtForStrategy(strategies[2].address, max_debt, sender=gov)
+    minimum_total_idle = fish_amount // 20
+    vault.setMinimumTotalIdle(minimum_total_idle, sender=gov)
+    aprs = {strategies[0]: 0.02, strategies[1]: 0.05, strategies[2]: 0.10}
+
+    plan = allocate(vault, aprs)
+    execute(plan, vault, gov)
+
+    # The worst strategy is emptied first to fill the best ones.
+    assert [strategy for strategy, _ in plan.moves] == [
+        strategies[0].address,
+        strategies[2].address,
+        strategies[1].address,
+    ]
+    assert plan.yield_gain > plan.gas_cost
+    for strategy, target_debt in plan.moves:
+        assert vault.strategies(strategy).currentDebt == target_debt
+    assert vault.strategies(strategies[0]).currentDebt == 0
+    assert vault.strategies(strategies[2]).currentDebt == pytest.approx(
+        max_debt, rel=1e-9
+    )
+    assert vault.strategies(strategies[1]).currentDebt == pytest.approx(
+        fish_amount - minimum_total_idle - max_debt, rel=1e-9
+    )
+    assert vault.totalIdle() >= minimum_total_idle
+
+
+def test_allocate__gain_below_gas_cost__no_moves(fish_amount, set_up_allocation):
+    vault, strategies = set_up_allocation([fish_amount // 2, fish_amount // 2])
+    aprs = {strategies[0]: 0.05, strategies[1]: 0.0501}
+    config = AllocationConfig(gas_price=10**15)
+
+    plan = allocate(vault, aprs, config)
+
+    assert plan.moves == []
+
+
+def test_allocate__unrealised_losses__debt_not_decreased(
+    gov, fish_amount, set_up_allocation
+):
+    vault, strategies = set_up_allocation(
+        [fish_amount // 2, fish_amount // 4], lossy=True
+    )
+    strategies[0].setLoss(gov, fish_amount // 100, sender=gov)
+    aprs = {strategies[0]: 0.01, strategies[1]: 0.10}
+
+    plan = allocate(vault, aprs)
+    execute(plan, vault, gov)
+
+    # Only the idle can go to the better strategy.
+    assert len(plan.moves) == 1
+    assert plan.moves[0][0] == strategies[1].address
+    assert plan.moves[0][1] == pytest.approx(fish_amount // 2, rel=1e-9)
+    assert vault.strategies(strategies[0]).currentDebt == fish_amount // 2
+    assert vault.strategies(strategies[1]).currentDebt == plan.moves[0][1]
+
+
+def test_solve__idle_below_minimum__withdraws_from_worst_strategy():
+    unit = 10**6
+    strategies = [
+        StrategyState("a", 500 * unit, UNLIMITED, 0, 500 * unit, 0, 0.08),
+        StrategyState("b", 500 * unit, UNLIMITED, 0, 100 * unit, 0, 0.02),
+    ]
+
+    plan = solve(strategies, 0, 50 * unit, 6, AllocationConfig())
+
+    assert len(plan.moves) == 1
+    assert plan.moves[0][0] == "b"
+    assert plan.moves[0][1] == pytest.approx(450 * unit, abs=1)
+    assert plan.yield_gain < 0
+
+
+def test_solve__withdraw_limit__caps_decrease():
+    unit = 10**18
+    strategies = [
+        StrategyState("a", 500 * unit, UNLIMITED, 0, 100 * unit, 0, 0.01),
+        StrategyState("b", 0, UNLIMITED, UNLIMITED, 0, 0, 0.10),
+    ]
+
+    plan = solve(strategies, 0, 0, 18, AllocationConfig())
+
+    assert [strategy for strategy, _ in plan.moves] == ["a", "b"]
+    assert plan.moves[0][1] == pytest.approx(400 * unit, rel=1e-9)
+    # Never deposits more than was withdrawn.
+    assert plan.moves[1][1] <= 500 * unit - plan.moves[0][1]
+    assert plan.moves[1][1] == pytest.approx(100 * unit, rel=1e-9)
@@ -0,0 +1,160 @@
+import pytest
+from ape_ethereum import multicall
+from utils.constants import DAY, WEEK, YEAR
+from utils.keeper import Keeper, KeeperConfig
+
+GAS_PRICE = 10**9
+
+
+@pytest.fixture(scope="module", autouse=True)
+def inject_multicall():
+    # Multicall3 is not deployed on the local network.
+    multicall.Call.inject()
+
+
+@pytest.fixture
+def set_up_keeper(
+    asset,
+    gov,
+    fish,
+    fish_amount,
+    create_vault,
+    create_lossy_strategy,
+    user_deposit,
+    add_strategy_to_vault,
+    add_debt_to_strategy,
+):
+    def set_up_keeper():
+        vault = create_vault(asset)
+        user_deposit(fish, vault, asset, fish_amount)
+        strategies = [create_lossy_strategy(vault), create_lossy_strategy(vault)]
+        for strategy in strategies:
+            add_strategy_to_vault(gov, strategy, vault)
+            add_debt_to_strategy(gov, strategy, vault, fish_amount // 2)
+        return vault, strategies
+
+    return set_up_keeper
+
+
+def test_plan__no_gain__reports_nothing(chain, gov, set_up_keeper):
+    vault, strategies = set_up_keeper()
+    keeper = Keeper(vault, gov, KeeperConfig(gas_price=GAS_PRICE))
+    chain.pending_timestamp += DAY
+    chain.mine()
+
+    plan, receipt = keeper.run()
+
+    assert receipt is None
+    assert plan.strategies == []
+    assert [status.strategy for status in plan.statuses] == [
+        strategy.address for strategy in strategies
+    ]
+    for status in plan.statuses:
+        assert status.value == 0
+        assert status.staleness >= DAY
+
+
+def test_run__gain_on_one_strategy__reports_only_it(
+    chain, gov, asset, fish_amount, set_up_keeper
+):
+    vault, strategies = set_up_keeper()
+    keeper = Keeper(vault, gov, KeeperConfig(gas_price=GAS_PRICE))
+    gain = fish_amount // 100
+    asset.mint(strategies[0], gain, sender=gov)
+    strategies[0].report(sender=gov)
+    # Not worth the gas.
+    asset.mint(strategies[1], 1, sender=gov)
+    strategies[1].report(sender=gov)
+    chain.pending_timestamp += DAY
+    chain.mine()
+
+    plan, receipt = keeper.run()
+
+    assert plan.strategies == [strategies[0].address]
+    assert plan.statuses[0].gain == gain
+    assert plan.statuses[1].gain == 1
+    assert plan.value > plan.cost
+    event = list(receipt.decode_logs(vault.StrategyReported))
+    assert len(event) == 1
+    assert event[0].strategy == strategies[0].address
+    assert event[0].gain == gain
+
+
+def test_plan__loss__reports_it(chain, gov, fish_amount, set_up_keeper):
+    vault, strategies = set_up_keeper()
+    keeper = Keeper(vault, gov, KeeperConfig(gas_price=GAS_PRICE))
+    loss = fish_amount // 100
+    strategies[1].setLoss(gov, loss, sender=gov)
+    chain.pending_timestamp += DAY
+    chain.mine()
+
+    plan = keeper.plan()
+
+    assert plan.strategies == [strategies[1].address]
+    assert plan.statuses[1].loss == loss
+
+
+def test_plan__stale_strategies__reported_without_value(chain, gov, set_up_keeper):
+    vault, strategies = set_up_keeper()
+    keeper = Keeper(vault, gov, KeeperConfig(gas_price=GAS_PRICE))
+    chain.pending_timestamp += WEEK
+    chain.mine()
+
+    plan = keeper.plan()
+
+    assert plan.value == 0
+    assert plan.strategies == [strategy.address for strategy in strategies]
+
+
+def test_plan__reported_recently__skipped(
+    chain, gov, asset, fish_amount, set_up_keeper
+):
+    vault, strategies = set_up_keeper()
+    keeper = Keeper(vault, gov, KeeperConfig(gas_price=GAS_PRICE))
+    asset.mint(strategies[0], fish_amount // 100, sender=gov)
+    strategies[0].report(sender=gov)
+
+    plan = keeper.plan()
+
+    assert plan.statuses[0].gain == fish_amount // 100
+    assert plan.strategies == []
+
+
+def test_plan__management_fee__makes_report_worth_it(
+    chain, gov, fish_amount, set_up_keeper, deploy_flexible_accountant
+):
+    vault, strategies = set_up_keeper()
+    accountant = deploy_flexible_accountant(vault)
+    accountant.setManagementFee(strategies[0], 1_000, sender=gov)
+    keeper = Keeper(
+        vault, gov, KeeperConfig(gas_price=GAS_PRICE, max_report_interval=YEAR)
+    )
+    chain.pending_timestamp += 30 * DAY
+    chain.mine()
+
+    plan = keeper.plan()
+
+    debt = fish_amount // 2
+    fees = plan.statuses[0].fees
+    assert fees == pytest.approx(debt * 30 * DAY // 10 // YEAR, rel=1e-3)
+    assert plan.statuses[1].fees == 0
+    assert plan.strategies == [strategies[0].address]
+
+
+def test_plan__high_gas_price__reports_nothing(
+    chain, gov, asset, fish_amount, set_up_keeper
+):
+    vault, strategies = set_up_keeper()
+    gain = fish_amount // 100
+    asset.mint(strategies[0], gain, sender=gov)
+    strategies[0].report(sender=gov)
+    chain.pending_timestamp += DAY
+    chain.mine()
+    # Not even twice the gain pays for the gas.
+    gas_price = gain * 10**18 // 10 ** vault.decimals() // 100_000
+    keeper = Keeper(vault, gov, KeeperConfig(gas_price=gas_price))
+
+    plan = keeper.plan()
+
+    assert plan.gas_price == gas_price
+    assert plan.strategies == []
@@ -0,0 +1,131 @@
+from ape import chain
+import numpy as np
+import pytest
+from utils.constants import DAY, WEEK
+from utils.pps import (
+    VaultSnapshot,
+    convert_to_assets,
+    price_per_share,
+    total_supply,
+    unlocked_shares,
+)
+
+
+def mine_at(timestamp):
+    chain.mine(timestamp=timestamp)
+    return chain.blocks.head.number
+
+
+def report_profit(asset, strategy, vault, gov, profit):
+    asset.transfer(strategy, profit, sender=gov)
+    strategy.report(sender=gov)
+    vault.processReport(strategy, sender=gov)
+
+
+def check_against_chain(vault, snapshot, block_id, timestamp):
+    shares = 10 ** vault.decimals() * 3 + 7
+
+    assert vault.unlockedShares(block_id=block_id) == unlocked_shares(
+        snapshot, timestamp
+    )
+    assert vault.totalSupply(block_id=block_id) == total_supply(snapshot, timestamp)
+    assert vault.pricePerShare(block_id=block_id) == price_per_share(
+        snapshot, timestamp
+    )
+    assert vault.convertToAssets(shares, block_id=block_id) == convert_to_assets(
+        snapshot, shares, timestamp
+    )
+    assert vault.previewMint(shares, block_id=block_id) == convert_to_assets(
+        snapshot, shares, timestamp, round_up=True
+    )
+
+
+def test_snapshot__no_profit__price_per_share_is_constant(
+    asset, fish_amount, fish, initial_set_up, gov
+):
+    amount = fish_amount // 10
+    vault, strategy, _ = initial_set_up(asset, gov, amount, fish)
+
+    snapshot = VaultSnapshot.from_vault(vault)
+
+    assert snapshot.full_profit_unlock_date == 0
+    assert unlocked_shares(snapshot, snapshot.timestamp + WEEK) == 0
+    assert (
+        price_per_share(snapshot, snapshot.timestamp + WEEK) == 10 ** vault.decimals()
+    )
+
+
+@pytest.mark.parametrize(
+    "offset", [1, DAY // 3, 3 * DAY + 17, WEEK - 1, WEEK, 2 * WEEK]
+)
+def test_snapshot__profit_unlocking__matches_chain(
+    asset, fish_amount, fish, initial_set_up, gov, offset
+):
+    amount = fish_amount // 10
+    vault, strategy, _ = initial_set_up(asset, gov, amount, fish)
+    report_profit(asset, strategy, vault, gov, amount // 10)
+
+    snapshot = VaultSnapshot.from_vault(vault)
+    timestamp = snapshot.timestamp + offset
+    block_id = mine_at(timestamp)
+
+    check_against_chain(vault, snapshot, block_id, timestamp)
+
+
+def test_snapshot__with_fees_and_unlocked_shares__matches_chain(
+    asset, fish_amount, fish, initial_set_up, gov
+):
+    amount = fish_amount // 10
+    vault, strategy, _ = initial_set_up(
+        asset, gov, amount, fish, managementFee=0, performanceFee=1_000
+    )
+    report_profit(asset, strategy, vault, gov, amount // 10)
+    mine_at(chain.blocks.head.timestamp + 2 * DAY)
+    # A second report while the first profit is still unlocking.
+    report_profit(asset, strategy, vault, gov, amount // 20)
+
+    # Take the snapshot some time after the last report, so some shares
+    # have unlocked but not been burnt yet.
+    mine_at(chain.blocks.head.timestamp + DAY)
+    snapshot = VaultSnapshot.from_vault(vault)
+    assert unlocked_shares(snapshot, snapshot.timestamp) > 0
+
+    for offset in [DAY, 4 * DAY, 2 * WEEK]:
+        timestamp = snapshot.timestamp + offset
+        block_id = mine_at(timestamp)
+        check_against_chain(vault, snapshot, block_id, timestamp)
+
+
+def test_vectorised__many_vaults_and_timestamps__matches_scalar(
+    asset, fish_amount, fish, initial_set_up, gov
+):
+    amount = fish_amount // 10
+    snapshots = []
+    for profit in [0, amount // 10, amount // 3]:
+        vault, strategy, _ = initial_set_up(asset, gov, amount, fish)
+        if profit:
+            report_profit(asset, strategy, vault, gov, profit)
+        snapshots.append(VaultSnapshot.from_vault(vault))
+
+    start = max(snapshot.timestamp for snapshot in snapshots)
+    timestamps = np.arange(start, start + 2 * WEEK, DAY, dtype=np.uint64)
+
+    grid = price_per_share(snapshots, timestamps)
+
+    assert grid.shape == (len(snapshots), len(timestamps))
+    for i, snapshot in enumerate(snapshots):
+        for j, timestamp in enumerate(timestamps):
+            assert grid[i, j] == price_per_share(snapshot, int(timestamp))
+    # Profits only ever push the price up while unlocking.
+    assert all(np.all(np.diff(row.astype(float)) >= 0) for row in grid)
+
+
+def test_extrapolate__before_snapshot__raises(
+    asset, fish_amount, fish, initial_set_up, gov
+):
+    amount = fish_amount // 10
+    vault, _, _ = initial_set_up(asset, gov, amount, fish)
+    snapshot = VaultSnapshot.from_vault(vault)
+
+    with pytest.raises(ValueError, match="cannot extrapolate before the snapshot"):
+        price_per_share(snapshot, snapshot.timestamp - 1)
@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+from utils.constants import DAY, WEEK
+from utils.simulator import (
+    SimulationConfig,
+    UnlockSimulator,
+    generate,
+    replay_on_chain,
+    simulate,
+)
+
+
+@pytest.mark.parametrize("profit_max_unlock_time", [WEEK, 0])
+@pytest.mark.parametrize("refund_ratio", [0, 5_000])
+def test_replay__random_reports__matches_contract(
+    asset,
+    fish_amount,
+    fish,
+    gov,
+    bunny,
+    initial_set_up_lossy,
+    set_factory_fee_config,
+    profit_max_unlock_time,
+    refund_ratio,
+):
+    amount = fish_amount // 10
+    config = SimulationConfig(
+        profit_max_unlock_time=profit_max_unlock_time,
+        report_interval=DAY,
+        reports=8,
+        mean_return=0.001,
+        return_volatility=0.01,
+        management_fee=200,
+        performance_fee=1_000,
+        refund_ratio=refund_ratio,
+        protocol_fee=1_000,
+    )
+    set_factory_fee_config(config.protocol_fee, bunny)
+    vault, strategy, accountant = initial_set_up_lossy(
+        asset,
+        gov,
+        amount,
+        fish,
+        config.management_fee,
+        config.performance_fee,
+        config.refund_ratio,
+        accountant_mint=amount // 10,
+    )
+    vault.setProfitMaxUnlockTime(profit_max_unlock_time, sender=gov)
+
+    intervals, returns = generate(config, 2, np.random.default_rng(42))
+    protocol_shares = 0
+    for path in range(2):
+        simulator = replay_on_chain(
+            config,
+            intervals[path],
+            returns[path],
+            vault,
+            strategy,
+            accountant,
+            asset,
+            gov,
+        )
+        protocol_shares += simulator.protocol_shares[0]
+
+    assert vault.balanceOf(bunny) == protocol_shares
+
+
+def test_simulate__same_seed__reproducible():
+    config = SimulationConfig(reports=10, performance_fee=1_000)
+
+    first = simulate(config, 50, seed=7, batch_size=20)
+    second = simulate(config, 50, seed=7, batch_size=20)
+
+    assert len(first.final_pps) == 50
+    for name, values in vars(first).items():
+        assert np.array_equal(values, getattr(second, name))
+
+
+def test_simulate__only_gains_with_unlocking__nothing_to_sandwich():
+    config = SimulationConfig(reports=20, mean_return=0.002, return_volatility=0.0)
+
+    result = simulate(config, 100, seed=1)
+
+    assert np.all(result.sandwich_capture == 0)
+    assert np.all(result.final_pps > 1)
+
+
+def test_simulate__only_gains_without_unlocking__price_jumps_on_report():
+    config = SimulationConfig(
+        profit_max_unlock_time=0, reports=20, mean_return=0.002, return_volatility=0.0
+    )
+
+    result = simulate(config, 100, seed=1)
+
+    assert np.all(result.sandwich_capture > 0)
+    assert np.all(result.max_pps_jump >= 0.0019)
+
+
+def test_simulate__fees__dilute_depositors():
+    no_fees = simulate(SimulationConfig(reports=20), 100, seed=3)
+    fees = simulate(
+        SimulationConfig(reports=20, management_fee=200, performance_fee=2_000),
+        100,
+        seed=3,
+    )
+
+    assert np.all(no_fees.fee_dilution == 0)
+    assert np.all(fees.fee_dilution > 0)
+    assert np.all(fees.final_pps < no_fees.final_pps)
+    assert set(fees.summary()) == set(vars(fees))
+
+
+def test_report__loss_larger_than_locked_profit__burns_locked_shares_first():
+    config = SimulationConfig(initial_deposit=10**6, decimals=6)
+    simulator = UnlockSimulator.fresh(config, paths=1)
+    now = config.start + DAY
+
+    simulator.report(now, 10**5, 0)
+    assert simulator.vault_shares[0] == 10**5
+    assert simulator.price_per_share(now)[0] == 10**6
+
+    simulator.report(now + DAY, 0, 2 * 10**5)
+    assert simulator.vault_shares[0] == 0
+    assert simulator.full_profit_unlock_date[0] == 0
+    assert simulator.price_per_share(now + DAY)[0] < 10**6
@@ -198,3 +198,99 @@ def test__report_gain_with_protocolFees__no_accountant_fees(
         == expected_protocol_fee
     )
     assert vault.pricePerShare() == int(10 ** vault.decimals())
+
+
+def test__sync_protocol_fee_config__permissionless(
+    vault_factory, set_factory_fee_config, create_vault, asset, gov, bunny
+):
+    vault = create_vault(asset)
+    set_factory_fee_config(1_000, gov)
+
+    tx = vault.syncProtocolFeeConfig(sender=bunny)
+
+    assert tx.return_value == (1_000, gov.address)
+
+
+def test__report_after_factory_fee_change__uses_new_config(
+    vault_factory,
+    set_factory_fee_config,
+    initial_set_up,
+    asset,
+    fish_amount,
+    fish,
+    gov,
+    bunny,
+    airdrop_asset,
+):
+    amount = fish_amount // 10
+    profit = int(amount * 0.1)
+    performanceFee = 1_000
+
+    set_factory_fee_config(1_000, gov)
+    vault, strategy, accountant = initial_set_up(
+        asset, gov, amount, fish, 0, performanceFee, 0
+    )
+    # Cache the current config in the vault.
+    vault.syncProtocolFeeConfig(sender=gov)
+
+    # Change the config after it was cached.
+    new_protocol_fee = 2_000
+    vault_factory.setProtocolFeeRecipient(bunny, sender=gov)
+    vault_factory.setProtocolFeeBps(new_protocol_fee, sender=gov)
+
+    airdrop_asset(gov, asset, strategy, profit)
+    strategy.report(sender=gov)
+    tx = vault.processReport(strategy, sender=gov)
+
+    expected_accountant_fee = profit * performanceFee / MAX_BPS_ACCOUNTANT
+    expected_protocol_fee = (
+        expected_accountant_fee * new_protocol_fee / MAX_BPS_ACCOUNTANT
+    )
+    event = list(tx.decode_logs(vault.StrategyReported))
+    assert event[0].protocolFees == expected_protocol_fee
+    assert vault.balanceOf(bunny) > 0
+
+
+def test__report_after_custom_fee_change__uses_new_config(
+    vault_factory,
+    set_factory_fee_config,
+    initial_set_up,
+    asset,
+    fish_amount,
+    fish,
+    gov,
+    airdrop_asset,
+):
+    amount = fish_amount // 10
+    profit = int(amount * 0.1)
+    performanceFee = 1_000
+
+    set_factory_fee_config(1_000, gov)
+    vault, strategy, accountant = initial_set_up(
+        asset, gov, amount, fish, 0, performanceFee, 0
+    )
+
+    # Custom fee changes also move the epoch.
+    custom_protocol_fee = 3_000
+    vault_factory.setCustomProtocolFeeBps(vault, custom_protocol_fee, sender=gov)
+
+    airdrop_asset(gov, asset, strategy, profit)
+    strategy.report(sender=gov)
+    tx = vault.processReport(strategy, sender=gov)
+
+    expected_accountant_fee = profit * performanceFee / MAX_BPS_ACCOUNTANT
+    event = list(tx.decode_logs(vault.StrategyReported))
+    assert event[0].protocolFees == (
+        expected_accountant_fee * custom_protocol_fee / MAX_BPS_ACCOUNTANT
+    )
+
+    vault_factory.removeCustomProtocolFee(vault, sender=gov)
+
+    airdrop_asset(gov, asset, strategy, profit)
+    strategy.report(sender=gov)
+    tx = vault.processReport(strategy, sender=gov)
+
+    event = list(tx.decode_logs(vault.StrategyReported))
+    assert event[0].protocolFees == (
+        expected_accountant_fee * 1_000 / MAX_BPS_ACCOUNTANT
+    )
@@ -2,7 +2,7 @@ import ape
 import pytest
 from web3 import Web3
 from utils import checks
-from utils.constants import DAY, ROLES
+from utils.constants import DAY, MAX_QUEUE, ROLES
 
 
 def test_withdraw__no_queue__with_insufficient_funds_in_vault__reverts(
@@ -263,21 +263,21 @@ def test__add_strategy__dont_add_to_queue(create_vault, asset, gov, create_strat
     assert vault.getDefaultQueue() == []
 
 
-def test__add_eleven_strategies__adds_ten_to_queue(
+def test__add_more_than_max_queue_strategies__fills_queue(
     create_vault, asset, gov, create_strategy
 ):
     vault = create_vault(asset)
 
     assert vault.getDefaultQueue() == []
 
-    for i in range(10):
+    for i in range(MAX_QUEUE):
         strategy = create_strategy(vault)
         vault.addStrategy(strategy.address, sender=gov)
 
         assert len(vault.getDefaultQueue()) == i + 1
 
     defaultQueue = vault.getDefaultQueue()
-    assert len(defaultQueue) == 10
+    assert len(defaultQueue) == MAX_QUEUE
 
     # Make sure we can still add a strategy, but doesnt change the queue
     strategy = create_strategy(vault)
@@ -287,7 +287,7 @@ def test__add_eleven_strategies__adds_ten_to_queue(
 
     newQueue = vault.getDefaultQueue()
     assert defaultQueue == newQueue
-    assert len(newQueue) == 10
+    assert len(newQueue) == MAX_QUEUE
 
     for _strategy in newQueue:
         assert _strategy != strategy.address
@@ -351,21 +351,21 @@ def test__revoke_strategy__mulitple_strategies__removes_strategy_from_queue(
     assert vault.getDefaultQueue() == [strategy_two.address]
 
 
-def test__reomve_eleventh_strategy__doesnt_change_queue(
+def test__remove_strategy_over_max_queue__doesnt_change_queue(
     create_vault, asset, gov, create_strategy
 ):
     vault = create_vault(asset)
 
     assert vault.getDefaultQueue() == []
 
-    for i in range(10):
+    for i in range(MAX_QUEUE):
         strategy = create_strategy(vault)
         vault.addStrategy(strategy.address, sender=gov)
 
         assert len(vault.getDefaultQueue()) == i + 1
 
     defaultQueue = vault.getDefaultQueue()
-    assert len(defaultQueue) == 10
+    assert len(defaultQueue) == MAX_QUEUE
 
     # Make sure we can still add a strategy, but doesnt change the queue
     strategy = create_strategy(vault)
@@ -379,7 +379,46 @@ def test__reomve_eleventh_strategy__doesnt_change_queue(
 
     newQueue = vault.getDefaultQueue()
     assert defaultQueue == newQueue
-    assert len(newQueue) == 10
+    assert len(newQueue) == MAX_QUEUE
+
+
+def test__revoke_strategy__middle_of_queue__keeps_order(
+    create_vault, asset, gov, create_strategy
+):
+    vault = create_vault(asset)
+
+    strategies = [create_strategy(vault) for i in range(3)]
+    for strategy in strategies:
+        vault.addStrategy(strategy.address, sender=gov)
+
+    vault.revokeStrategy(strategies[1].address, sender=gov)
+
+    assert vault.getDefaultQueue() == [strategies[0].address, strategies[2].address]
+
+    # Re-adding appends it to the end of the queue.
+    vault.addStrategy(strategies[1].address, sender=gov)
+
+    assert vault.getDefaultQueue() == [
+        strategies[0].address,
+        strategies[2].address,
+        strategies[1].address,
+    ]
+
+
+def test__default_queue__index_getter(create_vault, asset, gov, create_strategy):
+    vault = create_vault(asset)
+
+    with ape.reverts():
+        vault.defaultQueue(0)
+
+    strategies = [create_strategy(vault) for i in range(3)]
+    for strategy in strategies:
+        vault.addStrategy(strategy.address, sender=gov)
+
+    assert [vault.defaultQueue(i) for i in range(3)] == [s.address for s in strategies]
+
+    with ape.reverts():
+        vault.defaultQueue(3)
 
 
 def test__set_default_queue(create_vault, asset, gov, create_strategy):
@@ -407,6 +446,31 @@ def test__set_default_queue(create_vault, asset, gov, create_strategy):
     for i in range(len(newQueue)):
         assert Web3.to_checksum_address(event_queue[i]) == newQueue[i]
 
+    assert vault.getDefaultQueue() == newQueue
+
+
+def test__set_default_queue__replaces_longer_queue(
+    create_vault, asset, gov, create_strategy
+):
+    vault = create_vault(asset)
+
+    strategies = [create_strategy(vault) for i in range(3)]
+    for strategy in strategies:
+        vault.addStrategy(strategy.address, sender=gov)
+
+    vault.setDefaultQueue([strategies[2].address], sender=gov)
+
+    assert vault.getDefaultQueue() == [strategies[2].address]
+
+    # Strategies dropped from the queue can be added back.
+    vault.setDefaultQueue([strategies[0].address, strategies[2].address], sender=gov)
+
+    assert vault.getDefaultQueue() == [strategies[0].address, strategies[2].address]
+
+    vault.setDefaultQueue([], sender=gov)
+
+    assert vault.getDefaultQueue() == []
+
 
 def test__set_default_queue__inactive_strategy__reverts(
     create_vault, asset, gov, create_strategy
@@ -441,8 +505,22 @@ def test__set_default_queue__queue_to_long__reverts(
 
     assert vault.getDefaultQueue() == [strategy_one.address]
 
-    # Create a mock queue longer than 10.
-    newQueue = [strategy_one.address for i in range(11)]
+    # Create a mock queue longer than the max.
+    newQueue = [strategy_one.address for i in range(MAX_QUEUE + 1)]
 
     with ape.reverts():
         vault.setDefaultQueue(newQueue, sender=gov)
+
+
+def test__set_default_queue__duplicate_strategy__reverts(
+    create_vault, asset, gov, create_strategy
+):
+    vault = create_vault(asset)
+
+    strategy_one = create_strategy(vault)
+    vault.addStrategy(strategy_one.address, sender=gov)
+
+    newQueue = [strategy_one.address, strategy_one.address]
+
+    with ape.reverts("duplicate strategy"):
+        vault.setDefaultQueue(newQueue, sender=gov)
@@ -642,6 +642,115 @@ def test_process_report__with_loss_and_refunds__not_enough_allowance(
     assert vault.totalIdle() == actual_refund
 
 
+def test_process_reports__with_inactive_strategy__reverts(
+    gov, vault, strategy, create_strategy
+):
+    inactive_strategy = create_strategy(vault)
+
+    with ape.reverts("inactive strategy"):
+        vault.processReports([strategy.address, inactive_strategy.address], sender=gov)
+
+
+def test_process_reports__no_role__reverts(gov, bunny, vault, strategy):
+    with ape.reverts("not allowed"):
+        vault.processReports([strategy.address], sender=bunny)
+
+
+def test_process_reports__with_gain_and_loss__nets_reports(
+    chain,
+    gov,
+    asset,
+    vault,
+    create_strategy,
+    lossy_strategy,
+    add_strategy_to_vault,
+    add_debt_to_strategy,
+    airdrop_asset,
+):
+    vault_balance = asset.balanceOf(vault)
+    newDebt = vault_balance // 2
+    gain = newDebt // 2
+    loss = newDebt // 4
+    strategy = create_strategy(vault)
+    add_strategy_to_vault(gov, strategy, vault)
+
+    add_debt_to_strategy(gov, strategy, vault, newDebt)
+    add_debt_to_strategy(gov, lossy_strategy, vault, newDebt)
+    airdrop_asset(gov, asset, strategy, gain)
+    strategy.report(sender=gov)
+    lossy_strategy.setLoss(gov.address, loss, sender=gov)
+
+    initial_total_assets = vault.totalAssets()
+    initial_total_supply = vault.totalSupply()
+
+    snapshot = chain.pending_timestamp
+    tx = vault.processReports([strategy.address, lossy_strategy.address], sender=gov)
+    event = list(tx.decode_logs(vault.StrategyReported))
+
+    # One event per strategy, in the order they were reported.
+    assert len(event) == 2
+    assert event[0].strategy == strategy.address
+    assert event[0].gain == gain
+    assert event[0].loss == 0
+    assert event[0].currentDebt == newDebt + gain
+    assert event[1].strategy == lossy_strategy.address
+    assert event[1].gain == 0
+    assert event[1].loss == loss
+    assert event[1].currentDebt == newDebt - loss
+
+    assert tx.return_value == (gain, loss)
+    assert vault.strategies(strategy.address).currentDebt == newDebt + gain
+    assert vault.strategies(lossy_strategy.address).currentDebt == newDebt - loss
+    assert vault.totalDebt() == 2 * newDebt + gain - loss
+    for s in [strategy, lossy_strategy]:
+        assert vault.strategies(s.address).lastReport == pytest.approx(snapshot, abs=1)
+
+    # Only the net gain is locked, the loss is covered by it.
+    assert vault.totalAssets() == initial_total_assets + gain - loss
+    assert vault.totalSupply() == initial_total_supply + vault.balanceOf(vault)
+
+
+def test_process_reports__with_fees__matches_single_reports(
+    gov,
+    asset,
+    vault,
+    create_strategy,
+    add_strategy_to_vault,
+    add_debt_to_strategy,
+    airdrop_asset,
+    deploy_accountant,
+    set_fees_for_strategy,
+):
+    vault_balance = asset.balanceOf(vault)
+    newDebt = vault_balance // 2
+    gain = newDebt // 2
+    performanceFee = 1_000
+    accountant = deploy_accountant(vault)
+    strategies = [create_strategy(vault), create_strategy(vault)]
+
+    for strategy in strategies:
+        add_strategy_to_vault(gov, strategy, vault)
+        add_debt_to_strategy(gov, strategy, vault, newDebt)
+        set_fees_for_strategy(gov, strategy, accountant, 0, performanceFee)
+        airdrop_asset(gov, asset, strategy, gain)
+        strategy.report(sender=gov)
+
+    tx = vault.processReports([s.address for s in strategies], sender=gov)
+    event = list(tx.decode_logs(vault.StrategyReported))
+
+    expected_fees = gain * performanceFee // MAX_BPS_ACCOUNTANT
+    assert len(event) == 2
+    for log in event:
+        assert log.gain == gain
+        assert log.totalFees == pytest.approx(expected_fees, rel=1e-4)
+
+    # The accountant is paid for both strategies in one issuance.
+    assert (
+        pytest.approx(vault.convertToAssets(vault.balanceOf(accountant)), rel=1e-5)
+        == 2 * expected_fees
+    )
+
+
 def test_set_accountant__with_accountant(gov, vault, deploy_accountant):
     accountant = deploy_accountant(vault)
     tx = vault.setAccountant(accountant.address, sender=gov)
@@ -651,3 +760,60 @@ def test_set_accountant__with_accountant(gov, vault, deploy_accountant):
     assert event[0].accountant == accountant.address
 
     assert vault.accountant() == accountant.address
+
+
+def test_set_accountant__with_v2_accountant(gov, vault, deploy_flexible_accountant):
+    accountant = deploy_flexible_accountant(vault)
+
+    assert vault.accountant() == accountant.address
+    assert vault.accountantV2() == True
+
+
+def test_set_accountant__with_v1_accountant(
+    gov, bunny, vault, deploy_faulty_accountant
+):
+    accountant = deploy_faulty_accountant(vault)
+
+    assert vault.accountant() == accountant.address
+    assert vault.accountantV2() == False
+
+    # Addresses without code are never v2.
+    vault.setAccountant(bunny.address, sender=gov)
+    assert vault.accountant() == bunny.address
+    assert vault.accountantV2() == False
+
+
+@pytest.mark.parametrize("v2", [True, False])
+def test_process_report__with_management_fees__v1_and_v2_accountants(
+    chain,
+    gov,
+    asset,
+    vault,
+    strategy,
+    deploy_flexible_accountant,
+    deploy_faulty_accountant,
+    set_fees_for_strategy,
+    add_debt_to_strategy,
+    v2,
+):
+    vault_balance = asset.balanceOf(vault)
+    newDebt = vault_balance
+    managementFee = 100
+
+    # Both accountants charge the same fees, only v2 is sent the strategy params.
+    if v2:
+        accountant = deploy_flexible_accountant(vault)
+    else:
+        accountant = deploy_faulty_accountant(vault)
+    assert vault.accountantV2() == v2
+
+    add_debt_to_strategy(gov, strategy, vault, newDebt)
+    set_fees_for_strategy(gov, strategy, accountant, managementFee, 0)
+
+    chain.pending_timestamp = vault.strategies(strategy.address).lastReport + YEAR
+    tx = vault.processReport(strategy.address, sender=gov)
+    event = list(tx.decode_logs(vault.StrategyReported))
+
+    expected_fees = newDebt * managementFee // MAX_BPS_ACCOUNTANT
+    assert len(event) == 1
+    assert event[0].totalFees == pytest.approx(expected_fees, rel=1e-3)
@@ -0,0 +1,94 @@
+import pytest
+from ape_ethereum import multicall
+from utils.client import VaultClient
+from utils.constants import DAY
+
+
+@pytest.fixture(scope="module", autouse=True)
+def inject_multicall():
+    # Multicall3 is not deployed on the local network.
+    multicall.Call.inject()
+
+
+def test_info__read_once(gov, fish, fish_amount, asset, initial_set_up, vault_factory):
+    vault, _, _ = initial_set_up(asset, gov, fish_amount, fish)
+    client = VaultClient(vault)
+
+    info = client.info()
+
+    assert client.info() is info
+    assert info.address == vault.address
+    assert info.asset == asset.address
+    assert info.decimals == vault.decimals()
+    assert info.factory == vault_factory.address
+    assert info.api_version == vault.apiVersion()
+    assert info.name == vault.name()
+    assert info.symbol == vault.symbol()
+
+
+def test_status__cached_per_block(
+    chain, gov, fish, fish_amount, asset, initial_set_up, user_deposit
+):
+    vault, strategy, _ = initial_set_up(asset, gov, fish_amount // 2, fish)
+    client = VaultClient(vault)
+
+    status = client.status()
+
+    assert client.status() is status
+    assert status.block == chain.blocks.head.number
+    assert status.total_assets == vault.totalAssets()
+    assert status.total_supply == vault.totalSupply()
+    assert status.total_idle == vault.totalIdle()
+    assert status.total_debt == fish_amount // 2
+    assert status.price_per_share == vault.pricePerShare()
+    assert status.profit_max_unlock_time == vault.profitMaxUnlockTime()
+    assert status.deposit_limit == vault.depositLimit()
+    assert status.is_shutdown is False
+    assert status.default_queue == [strategy.address]
+
+    user_deposit(fish, vault, asset, fish_amount // 2)
+    new_status = client.status()
+
+    assert new_status.block == chain.blocks.head.number
+    assert new_status.total_idle == fish_amount // 2
+    # Older blocks can still be read.
+    assert client.status(status.block).total_idle == status.total_idle
+
+
+def test_strategies__lossy_strategy__reads_position(
+    gov, fish, fish_amount, asset, initial_set_up_lossy
+):
+    vault, strategy, _ = initial_set_up_lossy(asset, gov, fish_amount, fish)
+    loss = fish_amount // 10
+    strategy.setLoss(gov, loss, sender=gov)
+    client = VaultClient(vault)
+
+    (position,) = client.strategies()
+
+    assert client.strategies([strategy]) == [position]
+    assert position.strategy == strategy.address
+    assert position.current_debt == fish_amount
+    assert position.max_debt == vault.strategies(strategy).maxDebt
+    assert position.shares == strategy.balanceOf(vault)
+    assert position.assets == fish_amount - loss
+    assert position.unrealised_loss == loss
+    assert position.max_redeem == strategy.maxRedeem(vault)
+    assert position.max_deposit == strategy.maxDeposit(vault)
+
+
+def test_price_per_share_at__profit_unlocking__matches_vault(
+    chain, gov, fish, fish_amount, asset, initial_set_up
+):
+    vault, strategy, _ = initial_set_up(asset, gov, fish_amount, fish)
+    asset.transfer(strategy, fish_amount // 10, sender=gov)
+    strategy.report(sender=gov)
+    vault.processReport(strategy, sender=gov)
+    client = VaultClient(vault)
+    timestamp = chain.blocks.head.timestamp + DAY
+
+    price_per_share = client.status().price_per_share
+    extrapolated = client.price_per_share_at(timestamp)
+    chain.mine(timestamp=timestamp)
+
+    assert extrapolated > price_per_share
+    assert extrapolated == vault.pricePerShare(block_id=chain.blocks.head.number)
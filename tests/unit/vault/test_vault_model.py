@@ -0,0 +1,140 @@
+import pytest
+from utils.constants import WEEK
+from utils.differential import (
+    ACCOUNTANT,
+    PROTOCOL,
+    WEIGHTS,
+    ChainRunner,
+    DifferentialConfig,
+    Divergence,
+    ModelRunner,
+    random_ops,
+    run_differential,
+)
+from utils.model import Revert
+
+CONFIGS = {
+    "no_fees": DifferentialConfig(),
+    "fees_and_refunds": DifferentialConfig(
+        management_fee=200,
+        performance_fee=1_000,
+        refund_ratio=5_000,
+        protocol_fee=1_000,
+    ),
+    "no_unlocking": DifferentialConfig(
+        performance_fee=2_000, refund_ratio=10_000, profit_max_unlock_time=0
+    ),
+}
+
+
+@pytest.fixture
+def set_up_differential(
+    asset,
+    gov,
+    fish,
+    whale,
+    doggie,
+    bunny,
+    create_vault,
+    create_lossy_strategy,
+    deploy_flexible_accountant,
+    set_factory_fee_config,
+):
+    def set_up_differential(config):
+        return ChainRunner.set_up(
+            config,
+            asset,
+            gov,
+            [fish, whale, doggie],
+            bunny,
+            create_vault,
+            create_lossy_strategy,
+            deploy_flexible_accountant,
+            set_factory_fee_config,
+        )
+
+    return set_up_differential
+
+
+@pytest.mark.parametrize("seed", [1, 2])
+@pytest.mark.parametrize("config", list(CONFIGS.values()), ids=list(CONFIGS))
+def test_differential__random_ops__model_matches_vault(
+    set_up_differential, config, seed
+):
+    vault, model = set_up_differential(config)
+    ops = random_ops(seed, 80, config)
+
+    reverts = run_differential(ops, model, vault)
+
+    assert reverts < len(ops)
+
+
+def test_differential__wrong_model__stops_at_first_divergence(set_up_differential):
+    config = CONFIGS["fees_and_refunds"]
+    vault, model = set_up_differential(config)
+    # The model forgets about the protocol fee.
+    model.model.set_protocol_fee(0, PROTOCOL)
+    ops = [
+        ("deposit", 0, 0, 500_000, 0),
+        ("update_debt", 0, 0, 500_000, 0),
+        ("gain", 0, 0, 500_000, 0),
+        ("process_report", 0, 0, 0, 0),
+        ("deposit", 1, 0, 500_000, 0),
+    ]
+
+    with pytest.raises(Divergence) as error:
+        run_differential(ops, model, vault)
+
+    # The accountant gets the whole fee in the model.
+    assert error.value.index == 3
+    assert error.value.field == f"balanceOf({ACCOUNTANT})"
+    assert error.value.expected > error.value.actual
+
+
+def test_model__random_ops__keeps_accounting_invariants():
+    config = CONFIGS["fees_and_refunds"]
+    runner = ModelRunner.fresh(config)
+    model = runner.model
+    now = model.now
+
+    for op in random_ops(7, 5_000, config, {**WEIGHTS, "shutdown": 0}):
+        call = runner.resolve(op)
+        now += call[1][0] if call[0] == "sleep" else 12
+        runner.execute(call, now)
+
+        assert model.total_supply == sum(model.balances.values())
+        assert model.token.balance_of(model.address) == model.total_idle
+        assert model.total_debt == sum(
+            current_debt for _, _, current_debt in model.strategies.values()
+        )
+        assert model.unlocked_shares(now) <= model.balances.get(model.address, 0)
+
+
+def test_model__reverted_call__leaves_state_untouched():
+    model = ModelRunner.fresh(DifferentialConfig()).model
+    now = model.now + 12
+    model.deposit("user0", 10**18, "user0", now)
+    model.update_debt("strategy0", 10**18, now)
+    model.strategy_models["strategy0"].lose(10**17)
+    before = model._save()
+
+    # Reverts only after the funds were pulled from the strategy.
+    with pytest.raises(Revert, match="too much loss"):
+        model.withdraw("user0", 5 * 10**17, "user0", "user0", now, max_loss=0)
+
+    assert model._save() == before
+
+
+def test_model__profit__unlocks_over_profit_max_unlock_time():
+    model = ModelRunner.fresh(DifferentialConfig()).model
+    now = model.now + 12
+    model.deposit("user0", 10**18, "user0", now)
+    model.update_debt("strategy0", 10**18, now)
+    model.strategy_models["strategy0"].gain(10**17)
+
+    assert model.process_report("strategy0", now) == (10**17, 0)
+
+    assert model.full_profit_unlock_date == now + WEEK
+    assert model.price_per_share(now) == 10**18
+    assert 10**18 < model.price_per_share(now + WEEK // 2) < 11 * 10**17
+    assert model.price_per_share(now + WEEK) == 11 * 10**17
@@ -0,0 +1,234 @@
+"""
+Off-chain debt allocation.
+
+`solve` spreads the vaults deployable assets over its strategies to
+maximise the expected yield, and returns the shortest list of
+`updateDebt` calls that gets there. A move is only worth sending if the
+yield it adds over `horizon` pays for its gas, so the allocation is a
+fixed charge problem: every strategy whose debt changes costs one
+`updateDebt`. It is solved as a small mixed integer program with
+`scipy.optimize.milp`, one binary per strategy.
+
+The solver works on floats in whole asset units. Its result is turned
+back into integer targets that never ask the vault for more than it
+can do: withdrawals are rounded down and deposits are capped at the
+idle they leave above `minimumTotalIdle`.
+
+Limits follow `_updateDebt`:
+
+- debt can not go above `maxDebt`, nor grow by more than `maxDeposit`,
+- debt can only go down by what the strategy lets the vault redeem,
+  and not at all while the strategy has unrealised losses,
+- deposits can not dip into `minimumTotalIdle`.
+
+Decreases come first in the plan so their withdrawals fund the
+increases, see `DebtRebalancer`.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+from scipy.optimize import Bounds, LinearConstraint, milp
+
+from utils.constants import DAY, YEAR
+
+
+@dataclass(frozen=True)
+class StrategyState:
+    strategy: str
+    current_debt: int
+    max_debt: int
+    # What the strategy accepts from the vault.
+    max_deposit: int
+    # What the vault can take out of the strategy.
+    withdrawable: int
+    # Debt decreases revert while this is not 0.
+    unrealised_loss: int
+    # Expected yearly return, 0.05 for 5%.
+    apr: float
+
+    @property
+    def lower(self):
+        if self.unrealised_loss != 0:
+            return self.current_debt
+        return self.current_debt - min(self.withdrawable, self.current_debt)
+
+    @property
+    def upper(self):
+        upper = min(self.max_debt, self.current_debt + self.max_deposit)
+        return max(upper, self.current_debt)
+
+
+@dataclass(frozen=True)
+class AllocationConfig:
+    # Time the new allocation is expected to hold, its extra yield
+    # over this period must pay for the gas.
+    horizon: int = 30 * DAY
+    gas_price: int = 10**9
+    # Gas of one `updateDebt`.
+    gas_per_move: int = 200_000
+    # Wei per whole asset token.
+    asset_price: int = 10**18
+
+
+@dataclass(frozen=True)
+class AllocationPlan:
+    # (strategy, targetDebt) in the order to send them.
+    moves: list
+    # Expected yield over the horizon, in asset.
+    yield_gain: int
+    # Gas cost of the moves, in asset.
+    gas_cost: int
+
+
+def read_state(vault, aprs):
+    """
+    Read the allocation inputs of `vault`.
+
+    `aprs` maps each strategy to allocate over to its expected APR.
+    Returns the strategies, the vaults idle and `minimumTotalIdle`.
+    """
+    from ape import Contract
+
+    strategies = []
+    for strategy, apr in aprs.items():
+        params = vault.strategies(strategy)
+        contract = Contract(str(strategy))
+        shares = contract.balanceOf(vault)
+        strategies.append(
+            StrategyState(
+                strategy=str(strategy),
+                current_debt=params.currentDebt,
+                max_debt=params.maxDebt,
+                max_deposit=contract.maxDeposit(vault),
+                withdrawable=contract.convertToAssets(
+                    min(contract.maxRedeem(vault), shares)
+                ),
+                unrealised_loss=vault.assessShareOfUnrealisedLosses(
+                    strategy, params.currentDebt
+                ),
+                apr=apr,
+            )
+        )
+    return strategies, vault.totalIdle(), vault.minimumTotalIdle()
+
+
+def solve(strategies, total_idle, minimum_total_idle, decimals, config):
+    """
+    Find the target debts and the `updateDebt` calls to reach them.
+    """
+    n = len(strategies)
+    if n == 0:
+        return AllocationPlan(moves=[], yield_gain=0, gas_cost=0)
+
+    unit = 10**decimals
+    current = np.array([s.current_debt for s in strategies], dtype=float) / unit
+    lower = np.array([s.lower for s in strategies], dtype=float) / unit
+    upper = np.array([s.upper for s in strategies], dtype=float) / unit
+    # Yield of one asset unit over the horizon.
+    yields = np.array([s.apr for s in strategies]) * config.horizon / YEAR
+    # Gas of one move, in asset units.
+    move_cost = config.gas_per_move * config.gas_price / config.asset_price
+
+    # Variables: deposits, withdrawals, then one binary per strategy.
+    cost = np.concatenate([-yields, yields, np.full(n, move_cost)])
+    bounds = Bounds(
+        np.zeros(3 * n),
+        np.concatenate([upper - current, current - lower, np.ones(n)]),
+    )
+    integrality = np.concatenate([np.zeros(2 * n), np.ones(n)])
+
+    eye = np.eye(n)
+    # A strategy only moves if its call is paid for.
+    paid = LinearConstraint(np.hstack([eye, eye, -np.diag(upper - lower)]), -np.inf, 0)
+    # Deposits are funded by withdrawals and the idle above the minimum.
+    # Below the minimum the withdrawals have to make up for it, as far
+    # as the strategies allow.
+    available = max(
+        (total_idle - minimum_total_idle) / unit, -float(np.sum(current - lower))
+    )
+    funded = LinearConstraint(
+        np.concatenate([np.ones(n), -np.ones(n), np.zeros(n)])[np.newaxis],
+        -np.inf,
+        available,
+    )
+
+    result = milp(
+        cost,
+        constraints=[paid, funded],
+        integrality=integrality,
+        bounds=bounds,
+    )
+    if not result.success:
+        raise ValueError(result.message)
+
+    moved = np.round(result.x[2 * n :]) == 1
+    delta = result.x[:n] - result.x[n : 2 * n]
+    return _plan(
+        strategies, moved, delta * unit, total_idle, minimum_total_idle, config, unit
+    )
+
+
+def _plan(strategies, moved, delta, total_idle, minimum_total_idle, config, unit):
+    """
+    Turn the solvers float deltas into integer `updateDebt` calls.
+    """
+    decreases = []
+    increases = []
+    for strategy, move, change in zip(strategies, moved, delta):
+        # Rounded towards zero, never more than the strategy allows.
+        change = int(change)
+        if not move or change == 0:
+            continue
+        if change < 0:
+            change = max(change, strategy.lower - strategy.current_debt)
+            decreases.append((strategy, change))
+        else:
+            change = min(change, strategy.upper - strategy.current_debt)
+            increases.append((strategy, change))
+
+    # Biggest withdrawals first, then the best deposits while idle lasts.
+    decreases.sort(key=lambda move: move[1])
+    increases.sort(key=lambda move: -move[0].apr)
+    available = total_idle - minimum_total_idle - sum(change for _, change in decreases)
+
+    moves = []
+    yield_gain = 0
+    for strategy, change in decreases:
+        moves.append((strategy.strategy, strategy.current_debt + change))
+        yield_gain += change * strategy.apr
+    for strategy, change in increases:
+        change = min(change, available)
+        if change <= 0:
+            break
+        available -= change
+        moves.append((strategy.strategy, strategy.current_debt + change))
+        yield_gain += change * strategy.apr
+
+    return AllocationPlan(
+        moves=moves,
+        yield_gain=int(yield_gain * config.horizon / YEAR),
+        gas_cost=len(moves)
+        * config.gas_per_move
+        * config.gas_price
+        * unit
+        // config.asset_price,
+    )
+
+
+def allocate(vault, aprs, config=AllocationConfig()):
+    """
+    Read `vault` and plan the reallocation over the strategies in `aprs`.
+    """
+    strategies, total_idle, minimum_total_idle = read_state(vault, aprs)
+    return solve(strategies, total_idle, minimum_total_idle, vault.decimals(), config)
+
+
+def execute(plan, vault, sender):
+    """
+    Send the plan, one `updateDebt` per move. Returns the receipts.
+    """
+    return [
+        vault.updateDebt(strategy, target_debt, sender=sender)
+        for strategy, target_debt in plan.moves
+    ]
@@ -0,0 +1,301 @@
+"""
+Batched, cached reads of a vault.
+
+`VaultClient` describes a vault and its strategies in as few round
+trips as possible. All the reads of one block go through a single
+Multicall3 call pinned to that block, so the values are consistent with
+each other. What the vault only sets in `initialize`, `asset`,
+`decimals`, `FACTORY`, `apiVersion`, `name` and `symbol`, is read once
+and kept for the life of the client. Everything else is cached for the
+block it was read at.
+
+`VaultStatus.snapshot` hands the state to `utils.pps`, so the price per
+share can be extrapolated to later timestamps without another read.
+Local networks do not have Multicall3, inject it first with
+`ape_ethereum.multicall.Call.inject()`.
+"""
+
+from dataclasses import dataclass
+
+from ape import Contract, chain
+from ape_ethereum import multicall
+
+from utils.pps import VaultSnapshot, price_per_share
+
+
+@dataclass(frozen=True)
+class VaultInfo:
+    """
+    What never changes once the vault is initialized.
+    """
+
+    address: str
+    asset: str
+    decimals: int
+    factory: str
+    api_version: str
+    name: str
+    symbol: str
+
+
+@dataclass(frozen=True)
+class VaultStatus:
+    block: int
+    timestamp: int
+    total_assets: int
+    total_supply: int
+    total_idle: int
+    total_debt: int
+    price_per_share: int
+    unlocked_shares: int
+    # Shares the vault holds itself, locked and unlocked.
+    vault_shares: int
+    full_profit_unlock_date: int
+    profit_unlocking_rate: int
+    last_profit_update: int
+    profit_max_unlock_time: int
+    deposit_limit: int
+    minimum_total_idle: int
+    is_shutdown: bool
+    default_queue: list
+    accountant: str
+    deposit_limit_module: str
+    withdraw_limit_module: str
+    decimals: int
+
+    def snapshot(self):
+        """
+        The state `utils.pps` needs, see `VaultSnapshot.from_vault`.
+        """
+        return VaultSnapshot(
+            total_idle=self.total_idle,
+            total_debt=self.total_debt,
+            total_supply=self.total_supply + self.unlocked_shares,
+            vault_shares=self.vault_shares,
+            full_profit_unlock_date=self.full_profit_unlock_date,
+            profit_unlocking_rate=self.profit_unlocking_rate,
+            last_profit_update=self.last_profit_update,
+            decimals=self.decimals,
+            timestamp=self.timestamp,
+        )
+
+
+@dataclass(frozen=True)
+class StrategyPosition:
+    """
+    The vaults params for `strategy` and its live position in it.
+    """
+
+    strategy: str
+    activation: int
+    last_report: int
+    current_debt: int
+    max_debt: int
+    # Strategy shares held by the vault and what they are worth.
+    shares: int
+    assets: int
+    # What the strategy lets the vault redeem and deposit.
+    max_redeem: int
+    max_deposit: int
+
+    @property
+    def unrealised_loss(self):
+        return max(self.current_debt - self.assets, 0)
+
+
+class VaultClient:
+    """
+    Reads `vault`, caching every block it was asked about last.
+    """
+
+    def __init__(self, vault):
+        self.vault = vault
+        self._info = None
+        # Reads of `_block`, keyed by what was read.
+        self._block = None
+        self._cache = {}
+
+    def _multicall(self):
+        # Multicall3 is deployed at the same address on every chain.
+        return multicall.Call(supported_chains=[chain.chain_id])
+
+    def _cached(self, key, block, read):
+        if block.number != self._block:
+            self._block = block.number
+            self._cache = {}
+        if key not in self._cache:
+            self._cache[key] = read(block)
+        return self._cache[key]
+
+    def _head(self, block_id):
+        return chain.blocks.head if block_id is None else chain.blocks[block_id]
+
+    def info(self):
+        """
+        Read the immutables once.
+        """
+        if self._info is None:
+            vault = self.vault
+            call = self._multicall()
+            for method in [
+                vault.asset,
+                vault.decimals,
+                vault.FACTORY,
+                vault.apiVersion,
+                vault.name,
+                vault.symbol,
+            ]:
+                call.add(method)
+            asset, decimals, factory, api_version, name, symbol = list(call())
+            self._info = VaultInfo(
+                address=vault.address,
+                asset=asset,
+                decimals=decimals,
+                factory=factory,
+                api_version=api_version,
+                name=name,
+                symbol=symbol,
+            )
+        return self._info
+
+    def status(self, block_id=None):
+        """
+        Read the accounting and configuration of the vault at `block_id`,
+        the head by default.
+        """
+        return self._cached("status", self._head(block_id), self._read_status)
+
+    def _read_status(self, block):
+        vault = self.vault
+        call = self._multicall()
+        for method in [
+            vault.totalAssets,
+            vault.totalSupply,
+            vault.totalIdle,
+            vault.totalDebt,
+            vault.pricePerShare,
+            vault.unlockedShares,
+            vault.fullProfitUnlockDate,
+            vault.profitUnlockingRate,
+            vault.lastProfitUpdate,
+            vault.profitMaxUnlockTime,
+            vault.depositLimit,
+            vault.minimumTotalIdle,
+            vault.isShutdown,
+            vault.getDefaultQueue,
+            vault.accountant,
+            vault.depositLimitModule,
+            vault.withdrawLimitModule,
+        ]:
+            call.add(method)
+        call.add(vault.balanceOf, vault)
+        (
+            total_assets,
+            total_supply,
+            total_idle,
+            total_debt,
+            pps,
+            unlocked_shares,
+            full_profit_unlock_date,
+            profit_unlocking_rate,
+            last_profit_update,
+            profit_max_unlock_time,
+            deposit_limit,
+            minimum_total_idle,
+            is_shutdown,
+            default_queue,
+            accountant,
+            deposit_limit_module,
+            withdraw_limit_module,
+            balance,
+        ) = list(call(block_id=block.number))
+
+        return VaultStatus(
+            block=block.number,
+            timestamp=block.timestamp,
+            total_assets=total_assets,
+            total_supply=total_supply,
+            total_idle=total_idle,
+            total_debt=total_debt,
+            price_per_share=pps,
+            unlocked_shares=unlocked_shares,
+            # The getter hides the unlocked shares, see `utils.pps`.
+            vault_shares=balance + unlocked_shares,
+            full_profit_unlock_date=full_profit_unlock_date,
+            profit_unlocking_rate=profit_unlocking_rate,
+            last_profit_update=last_profit_update,
+            profit_max_unlock_time=profit_max_unlock_time,
+            deposit_limit=deposit_limit,
+            minimum_total_idle=minimum_total_idle,
+            is_shutdown=is_shutdown,
+            default_queue=[str(strategy) for strategy in default_queue],
+            accountant=accountant,
+            deposit_limit_module=deposit_limit_module,
+            withdraw_limit_module=withdraw_limit_module,
+            decimals=self.info().decimals,
+        )
+
+    def strategies(self, strategies=None, block_id=None):
+        """
+        Read the position of the vault in `strategies`, the default queue
+        by default.
+        """
+        block = self._head(block_id)
+        if strategies is None:
+            strategies = self.status(block.number).default_queue
+        strategies = tuple(str(strategy) for strategy in strategies)
+        return self._cached(
+            ("strategies", strategies),
+            block,
+            lambda block: self._read_strategies(strategies, block),
+        )
+
+    def _read_strategies(self, strategies, block):
+        if len(strategies) == 0:
+            return []
+        vault = self.vault
+        contracts = [Contract(strategy) for strategy in strategies]
+
+        call = self._multicall()
+        for contract in contracts:
+            call.add(vault.strategies, contract)
+            call.add(contract.balanceOf, vault)
+            call.add(contract.maxRedeem, vault)
+            call.add(contract.maxDeposit, vault)
+        results = list(call(block_id=block.number))
+
+        # The value of the shares needs the shares first.
+        call = self._multicall()
+        for contract, shares in zip(contracts, results[1::4]):
+            call.add(contract.convertToAssets, shares)
+        assets = list(call(block_id=block.number))
+
+        return [
+            StrategyPosition(
+                strategy=strategy,
+                activation=params.activation,
+                last_report=params.lastReport,
+                current_debt=params.currentDebt,
+                max_debt=params.maxDebt,
+                shares=shares,
+                assets=strategy_assets,
+                max_redeem=max_redeem,
+                max_deposit=max_deposit,
+            )
+            for strategy, params, shares, max_redeem, max_deposit, strategy_assets in zip(
+                strategies,
+                results[::4],
+                results[1::4],
+                results[2::4],
+                results[3::4],
+                assets,
+            )
+        ]
+
+    def price_per_share_at(self, timestamps):
+        """
+        Extrapolate the price per share at the head to `timestamps`,
+        without reading the vault again for each of them. Only exact
+        while no transaction touches the vault in between.
+        """
+        return price_per_share(self.status().snapshot(), timestamps)
@@ -7,6 +7,7 @@ MAX_INT = 2**256 - 1
 ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
 MAX_BPS = 1_000_000_000_000
 MAX_BPS_ACCOUNTANT = 10_000
+MAX_QUEUE = 64
 
 
 class ROLES(IntFlag):
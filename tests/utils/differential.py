@@ -0,0 +1,548 @@
+"""
+Differential fuzzing of Vault.vy against `utils.model.VaultModel`.
+
+A random op stream is a list of `(name, user, strategy, fraction, choice)`
+tuples. They only hold indexes and a fraction in `PARTS`, the actual
+amounts are resolved against the model right before each op is executed,
+so the same stream stays meaningful whatever state the vault is in and
+can be replayed against the model alone or against a deployed vault.
+
+`ModelRunner` runs a stream on the model only, which is fast enough to
+fuzz hundreds of thousands of ops. `ChainRunner` executes the resolved
+calls on a deployed vault and `run_differential` replays the stream on
+both, feeding the model the timestamp of each transaction and comparing
+the whole state after every op. It stops at the first op where the two
+disagree, either on the state or on whether the call reverted, and
+raises a `Divergence` describing it.
+"""
+
+import random
+from dataclasses import dataclass
+
+from utils.constants import DAY, MAX_INT, WEEK
+from utils.model import (
+    MAX_BPS,
+    AccountantModel,
+    Revert,
+    StrategyModel,
+    VaultModel,
+)
+
+# Fractions are given in parts per million of the relevant amount.
+PARTS = 1_000_000
+
+# Relative frequency of every op in a random stream.
+WEIGHTS = {
+    "deposit": 10,
+    "mint": 5,
+    "withdraw": 8,
+    "redeem": 8,
+    "transfer": 3,
+    "update_debt": 12,
+    "gain": 6,
+    "loss": 4,
+    "process_report": 8,
+    "buy_debt": 2,
+    "set_minimum_total_idle": 2,
+    "sleep": 6,
+    "shutdown": 0.1,
+}
+
+# `choice` picks one of these for the ops that take a max loss or a delay.
+MAX_LOSSES = (0, 1, 100, MAX_BPS)
+SLEEPS = (12, DAY // 4, DAY, WEEK)
+
+GOV = "gov"
+ACCOUNTANT = "accountant"
+PROTOCOL = "protocol"
+
+
+@dataclass
+class DifferentialConfig:
+    users: int = 3
+    strategies: int = 2
+    user_balance: int = 10**22
+    gov_balance: int = 10**22
+    accountant_balance: int = 10**20
+    management_fee: int = 0
+    performance_fee: int = 0
+    refund_ratio: int = 0
+    protocol_fee: int = 0
+    profit_max_unlock_time: int = WEEK
+    start: int = 1_700_000_000
+
+
+class Divergence(AssertionError):
+    """
+    The model and the vault disagree after op number `index`.
+    """
+
+    def __init__(self, index, op, call, field, expected, actual):
+        super().__init__(
+            f"op {index} {op} resolved to {call}: {field} is {actual}, "
+            f"the model expected {expected}"
+        )
+        self.index = index
+        self.op = op
+        self.call = call
+        self.field = field
+        self.expected = expected
+        self.actual = actual
+
+
+def _fraction(rng):
+    roll = rng.random()
+    if roll < 0.05:
+        return 0
+    if roll < 0.15:
+        return PARTS
+    if roll < 0.2:
+        # More than there is, these should mostly revert.
+        return PARTS + rng.randrange(1, PARTS)
+    return rng.randrange(1, PARTS)
+
+
+def random_ops(seed, count, config, weights=WEIGHTS):
+    """
+    A reproducible stream of `count` random ops, drawn with `weights`.
+    """
+    rng = random.Random(seed)
+    names = rng.choices(list(weights), weights=list(weights.values()), k=count)
+    return [
+        (
+            name,
+            rng.randrange(config.users),
+            rng.randrange(config.strategies),
+            _fraction(rng),
+            rng.randrange(len(MAX_LOSSES)),
+        )
+        for name in names
+    ]
+
+
+def build_model(config, activations=None, balances=None):
+    """
+    A `VaultModel` set up like `ChainRunner.set_up` sets up a vault.
+
+    `activations` are the timestamps the strategies were added at and
+    `balances` the asset balances of the accounts, both default to what
+    a model only run would use.
+    """
+    model = VaultModel(profit_max_unlock_time=config.profit_max_unlock_time)
+    users = [f"user{i}" for i in range(config.users)]
+    strategies = [f"strategy{i}" for i in range(config.strategies)]
+    activations = activations or [config.start] * config.strategies
+
+    if balances is None:
+        balances = {user: config.user_balance for user in users}
+        balances[GOV] = config.gov_balance
+        balances[ACCOUNTANT] = config.accountant_balance
+    for account, balance in balances.items():
+        model.token.mint(account, balance)
+    for account in users + [GOV]:
+        model.token.approve(account, model.address, MAX_INT)
+
+    accountant = AccountantModel(ACCOUNTANT)
+    model.set_accountant(accountant, config.start)
+    model.set_protocol_fee(config.protocol_fee, PROTOCOL)
+
+    for strategy, activation in zip(strategies, activations):
+        model.add_strategy_model(StrategyModel(strategy))
+        model.add_strategy(strategy, activation)
+        model.update_max_debt(strategy, MAX_INT, activation)
+        accountant.set_fees(
+            strategy, config.management_fee, config.performance_fee, config.refund_ratio
+        )
+
+    model.now = max(activations)
+    return model
+
+
+class ModelRunner:
+    """
+    Resolves ops against a `VaultModel` and executes them on it.
+
+    Every op method takes the timestamp it is executed at first, followed
+    by the resolved arguments, and raises `Revert` if the vault would.
+    """
+
+    def __init__(self, model, users, strategies):
+        self.model = model
+        self.users = users
+        self.strategies = strategies
+
+    @classmethod
+    def fresh(cls, config):
+        return cls(
+            build_model(config),
+            [f"user{i}" for i in range(config.users)],
+            [f"strategy{i}" for i in range(config.strategies)],
+        )
+
+    @property
+    def accounts(self):
+        return self.users + [GOV, ACCOUNTANT, PROTOCOL, self.model.address]
+
+    def resolve(self, op):
+        """
+        Turn an op into a `(name, args)` call using the current state.
+        """
+        name, user_index, strategy_index, fraction, choice = op
+        model = self.model
+        user = self.users[user_index]
+        strategy = self.strategies[strategy_index]
+        strategy_model = model.strategy_models[strategy]
+
+        def part(amount):
+            return amount * fraction // PARTS
+
+        if name == "deposit":
+            return name, (user, part(model.token.balance_of(user)))
+        if name == "mint":
+            assets = model.token.balance_of(user)
+            return name, (user, part(model.convert_to_shares(assets, model.now)))
+        if name in ("withdraw", "redeem"):
+            shares = model.balances.get(user, 0)
+            if name == "withdraw":
+                amount = part(model.convert_to_assets(shares, model.now))
+            else:
+                amount = part(shares)
+            # Every other call uses the default queue in reverse.
+            queue = tuple(reversed(model.default_queue)) if choice % 2 else ()
+            return name, (user, amount, MAX_LOSSES[choice], queue)
+        if name == "transfer":
+            receiver = self.users[(user_index + 1) % len(self.users)]
+            return name, (user, receiver, part(model.balances.get(user, 0)))
+        if name == "update_debt":
+            return name, (strategy, part(model.total_assets()))
+        if name == "gain":
+            return name, (strategy, part(strategy_model.total_assets) // 10)
+        if name == "loss":
+            return name, (strategy, part(strategy_model.deployed) // 5)
+        if name == "process_report":
+            return name, (strategy,)
+        if name == "buy_debt":
+            return name, (strategy, part(model._current_debt(strategy)))
+        if name == "set_minimum_total_idle":
+            return name, (part(model.total_assets()) // 2,)
+        if name == "sleep":
+            return name, (SLEEPS[choice],)
+        return name, ()
+
+    def execute(self, call, now):
+        """
+        Execute a resolved call, returns whether it reverted.
+        """
+        name, args = call
+        try:
+            getattr(self, name)(now, *args)
+        except Revert:
+            return True
+        return False
+
+    def run(self, ops, block_time=12):
+        """
+        Run `ops` on the model only, every op in a new block.
+
+        Returns the number of ops that reverted.
+        """
+        now = self.model.now
+        reverts = 0
+        for op in ops:
+            call = self.resolve(op)
+            now += call[1][0] if call[0] == "sleep" else block_time
+            reverts += self.execute(call, now)
+        return reverts
+
+    def state(self, now):
+        """
+        Everything the differential compares, as the vault would return it
+        at `now`.
+        """
+        model = self.model
+        state = {
+            "totalIdle": model.total_idle,
+            "totalDebt": model.total_debt,
+            "totalSupply": model.total_supply_at(now),
+            "unlockedShares": model.unlocked_shares(now),
+            "fullProfitUnlockDate": model.full_profit_unlock_date,
+            "profitUnlockingRate": model.profit_unlocking_rate,
+            "lastProfitUpdate": model.last_profit_update,
+            "minimumTotalIdle": model.minimum_total_idle,
+            "isShutdown": model.shutdown,
+        }
+        for account in self.accounts:
+            state[f"balanceOf({account})"] = model.balance_of(account, now)
+            state[f"asset.balanceOf({account})"] = model.token.balance_of(account)
+        for strategy in self.strategies:
+            strategy_model = model.strategy_models[strategy]
+            state[f"strategies({strategy})"] = model.strategies.get(
+                strategy, (0, 0, 0)
+            ) + (
+                model.max_debt.get(strategy, 0),
+            )
+            state[f"strategyLiquidity({strategy})"] = model.liquidity.get(
+                strategy, (0, 0, 0)
+            )
+            state[f"{strategy}.totalAssets"] = strategy_model.total_assets
+            for account in (model.address, GOV):
+                state[f"{strategy}.balanceOf({account})"] = strategy_model.balance_of(
+                    account
+                )
+        return state
+
+    ## OPS ##
+    def deposit(self, now, user, assets):
+        self.model.deposit(user, assets, user, now)
+
+    def mint(self, now, user, shares):
+        self.model.mint(user, shares, user, now)
+
+    def withdraw(self, now, user, assets, max_loss, queue):
+        self.model.withdraw(user, assets, user, user, now, max_loss, queue)
+
+    def redeem(self, now, user, shares, max_loss, queue):
+        self.model.redeem(user, shares, user, user, now, max_loss, queue)
+
+    def transfer(self, now, user, receiver, shares):
+        self.model.transfer(user, receiver, shares, now)
+
+    def update_debt(self, now, strategy, target_debt):
+        self.model.update_debt(strategy, target_debt, now)
+
+    def gain(self, now, strategy, amount):
+        self.model.strategy_models[strategy].gain(amount)
+
+    def loss(self, now, strategy, amount):
+        # The lost funds are sent to governance.
+        self.model.strategy_models[strategy].lose(amount)
+        self.model.token.mint(GOV, amount)
+
+    def process_report(self, now, strategy):
+        self.model.process_report(strategy, now)
+
+    def buy_debt(self, now, strategy, amount):
+        self.model.buy_debt(GOV, strategy, amount, now)
+
+    def set_minimum_total_idle(self, now, amount):
+        self.model.set_minimum_total_idle(amount, now)
+
+    def shutdown(self, now):
+        self.model.shutdown_vault(now)
+
+    def sleep(self, now, seconds):
+        pass
+
+
+class ChainRunner:
+    """
+    Executes resolved calls on a deployed vault, see `set_up`.
+
+    `accounts` maps the model labels to the accounts and contracts they
+    stand for.
+    """
+
+    def __init__(self, vault, asset, strategies, accounts, gov):
+        self.vault = vault
+        self.asset = asset
+        self.strategies = strategies
+        self.accounts = accounts
+        self.gov = gov
+
+    @classmethod
+    def set_up(
+        cls,
+        config,
+        asset,
+        gov,
+        users,
+        protocol_recipient,
+        create_vault,
+        create_lossy_strategy,
+        deploy_flexible_accountant,
+        set_factory_fee_config,
+    ):
+        """
+        Deploy a vault with lossy strategies, the flexible accountant and
+        the protocol fee from `config`, and the matching `ModelRunner`.
+        """
+        from ape import chain
+
+        set_factory_fee_config(config.protocol_fee, protocol_recipient)
+        vault = create_vault(
+            asset, max_profit_locking_time=config.profit_max_unlock_time
+        )
+        accounts = {f"user{i}": user for i, user in enumerate(users)}
+        accounts.update({GOV: gov, PROTOCOL: protocol_recipient, "vault": vault})
+
+        accountant = deploy_flexible_accountant(vault)
+        accounts[ACCOUNTANT] = accountant
+
+        strategies = {}
+        activations = []
+        for i in range(config.strategies):
+            strategy = create_lossy_strategy(vault)
+            vault.addStrategy(strategy, sender=gov)
+            activations.append(chain.blocks.head.timestamp)
+            vault.updateMaxDebtForStrategy(strategy, MAX_INT, sender=gov)
+            accountant.setManagementFee(strategy, config.management_fee, sender=gov)
+            accountant.setPerformanceFee(strategy, config.performance_fee, sender=gov)
+            accountant.setRefundRatio(strategy, config.refund_ratio, sender=gov)
+            strategies[f"strategy{i}"] = strategy
+
+        for label, balance in [(GOV, config.gov_balance)] + [
+            (f"user{i}", config.user_balance) for i in range(len(users))
+        ]:
+            asset.mint(accounts[label], balance, sender=gov)
+            asset.approve(vault, MAX_INT, sender=accounts[label])
+        asset.mint(accountant, config.accountant_balance, sender=gov)
+
+        balances = {
+            label: asset.balanceOf(account)
+            for label, account in accounts.items()
+            if label != "vault"
+        }
+        model = ModelRunner(
+            build_model(config, activations, balances),
+            list(accounts)[: len(users)],
+            list(strategies),
+        )
+        return cls(vault, asset, strategies, accounts, gov), model
+
+    def execute(self, call):
+        """
+        Execute a resolved call, returns whether it reverted and the
+        timestamp it was executed at.
+        """
+        from ape import chain
+        from ape.exceptions import ContractLogicError
+
+        name, args = call
+        timestamp = chain.pending_timestamp
+        try:
+            getattr(self, name)(*args)
+        except ContractLogicError:
+            return True, timestamp
+        return False, chain.blocks.head.timestamp
+
+    def state(self, labels, strategies):
+        """
+        The same fields as `ModelRunner.state`, read at the head block.
+
+        Returns the timestamp of the block and the state.
+        """
+        from ape import chain
+
+        head = chain.blocks.head
+        block_id = head.number
+        vault = self.vault
+
+        def read(method, *args):
+            return method(*args, block_id=block_id)
+
+        state = {
+            name: read(getattr(vault, name))
+            for name in [
+                "totalIdle",
+                "totalDebt",
+                "totalSupply",
+                "unlockedShares",
+                "fullProfitUnlockDate",
+                "profitUnlockingRate",
+                "lastProfitUpdate",
+                "minimumTotalIdle",
+                "isShutdown",
+            ]
+        }
+        for label in labels:
+            account = self.accounts[label]
+            state[f"balanceOf({label})"] = read(vault.balanceOf, account)
+            state[f"asset.balanceOf({label})"] = read(self.asset.balanceOf, account)
+        for label in strategies:
+            strategy = self.strategies[label]
+            state[f"strategies({label})"] = tuple(read(vault.strategies, strategy))
+            liquidity = read(vault.strategyLiquidity, strategy)
+            state[f"strategyLiquidity({label})"] = (
+                liquidity & (2**128 - 1),
+                (liquidity >> 128) & (2**40 - 1),
+                liquidity >> 168,
+            )
+            state[f"{label}.totalAssets"] = read(strategy.totalAssets)
+            for account in ("vault", GOV):
+                state[f"{label}.balanceOf({account})"] = read(
+                    strategy.balanceOf, self.accounts[account]
+                )
+        return head.timestamp, state
+
+    ## OPS ##
+    def deposit(self, user, assets):
+        user = self.accounts[user]
+        self.vault.deposit(assets, user, sender=user)
+
+    def mint(self, user, shares):
+        user = self.accounts[user]
+        self.vault.mint(shares, user, sender=user)
+
+    def withdraw(self, user, assets, max_loss, queue):
+        user = self.accounts[user]
+        queue = [self.strategies[strategy] for strategy in queue]
+        self.vault.withdraw(assets, user, user, max_loss, queue, sender=user)
+
+    def redeem(self, user, shares, max_loss, queue):
+        user = self.accounts[user]
+        queue = [self.strategies[strategy] for strategy in queue]
+        self.vault.redeem(shares, user, user, max_loss, queue, sender=user)
+
+    def transfer(self, user, receiver, shares):
+        self.vault.transfer(self.accounts[receiver], shares, sender=self.accounts[user])
+
+    def update_debt(self, strategy, target_debt):
+        self.vault.updateDebt(self.strategies[strategy], target_debt, sender=self.gov)
+
+    def gain(self, strategy, amount):
+        strategy = self.strategies[strategy]
+        self.asset.mint(strategy, amount, sender=self.gov)
+        strategy.report(sender=self.gov)
+
+    def loss(self, strategy, amount):
+        self.strategies[strategy].setLoss(self.gov, amount, sender=self.gov)
+
+    def process_report(self, strategy):
+        self.vault.processReport(self.strategies[strategy], sender=self.gov)
+
+    def buy_debt(self, strategy, amount):
+        self.vault.buyDebt(self.strategies[strategy], amount, sender=self.gov)
+
+    def set_minimum_total_idle(self, amount):
+        self.vault.setMinimumTotalIdle(amount, sender=self.gov)
+
+    def shutdown(self):
+        self.vault.shutdownVault(sender=self.gov)
+
+    def sleep(self, seconds):
+        from ape import chain
+
+        chain.pending_timestamp += seconds
+
+
+def run_differential(ops, model, vault):
+    """
+    Replay `ops` on the `ModelRunner` and the `ChainRunner`, raising a
+    `Divergence` at the first op they disagree on.
+
+    Returns the number of ops that reverted.
+    """
+    reverts = 0
+    for index, op in enumerate(ops):
+        call = model.resolve(op)
+        reverted, now = vault.execute(call)
+        expected = model.execute(call, now)
+        if reverted != expected:
+            raise Divergence(index, op, call, "reverted", expected, reverted)
+        reverts += reverted
+
+        timestamp, actual = vault.state(model.accounts, model.strategies)
+        for field, value in model.state(timestamp).items():
+            if actual[field] != value:
+                raise Divergence(index, op, call, field, value, actual[field])
+    return reverts
@@ -0,0 +1,293 @@
+"""
+Gas aware report keeper.
+
+Instead of reporting every strategy on a fixed schedule, `Keeper` reads
+what a report would realise for each strategy of a vault and only
+reports the ones where it pays for the gas:
+
+- the unrealised gain or loss, `convertToAssets(balanceOf(vault))`
+  against `currentDebt`,
+- the fees the accountant would charge, asked to the accountant itself
+  with a call made as the vault,
+- the time since `lastReport`, strategies not reported for
+  `max_report_interval` are reported whatever it costs.
+
+The vault and strategy reads are batched through Multicall3, the
+selected strategies are reported in a single `processReports` call.
+Local networks do not have Multicall3, inject it first with
+`ape_ethereum.multicall.Call.inject()`.
+"""
+
+from dataclasses import dataclass
+
+from ape import Contract, chain
+from ape_ethereum import multicall
+
+from utils.constants import DAY, WEEK
+
+# The two `report` flavours the vault can call, see `IAccountantV2`.
+ACCOUNTANT_ABI = [
+    {
+        "type": "function",
+        "name": "report",
+        "stateMutability": "nonpayable",
+        "inputs": [
+            {"name": "strategy", "type": "address"},
+            {"name": "gain", "type": "uint256"},
+            {"name": "loss", "type": "uint256"},
+        ],
+        "outputs": [
+            {"name": "fees", "type": "uint256"},
+            {"name": "refunds", "type": "uint256"},
+        ],
+    },
+    {
+        "type": "function",
+        "name": "report",
+        "stateMutability": "nonpayable",
+        "inputs": [
+            {"name": "strategy", "type": "address"},
+            {"name": "gain", "type": "uint256"},
+            {"name": "loss", "type": "uint256"},
+            {
+                "name": "params",
+                "type": "tuple",
+                "components": [
+                    {"name": "activation", "type": "uint256"},
+                    {"name": "lastReport", "type": "uint256"},
+                    {"name": "currentDebt", "type": "uint256"},
+                    {"name": "maxDebt", "type": "uint256"},
+                ],
+            },
+            {"name": "totalAssets", "type": "uint256"},
+            {"name": "totalSupply", "type": "uint256"},
+        ],
+        "outputs": [
+            {"name": "fees", "type": "uint256"},
+            {"name": "refunds", "type": "uint256"},
+        ],
+    },
+]
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+
+@dataclass(frozen=True)
+class KeeperConfig:
+    """
+    When a report is worth it.
+
+    A batch is sent when the value it realises, converted to wei with
+    `asset_price`, is at least `profit_factor` times its gas cost.
+    """
+
+    # Wei per whole asset token.
+    asset_price: int = 10**18
+    # Gas price in wei, the network gas price if not set.
+    gas_price: int = None
+    # Gas each strategy adds to a `processReports` batch. Only used to
+    # pick the candidates, the batch itself is estimated.
+    gas_per_strategy: int = 100_000
+    profit_factor: float = 2.0
+    # Report a strategy after this long whatever it costs.
+    max_report_interval: int = WEEK
+    # Never report a strategy again sooner than this.
+    min_report_interval: int = DAY // 4
+
+
+@dataclass(frozen=True)
+class StrategyStatus:
+    """
+    What reporting `strategy` now would realise.
+    """
+
+    strategy: str
+    current_debt: int
+    assets: int
+    last_report: int
+    # Fees and refunds the accountant would charge and pay for it.
+    fees: int
+    refunds: int
+    timestamp: int
+
+    @property
+    def gain(self):
+        return max(self.assets - self.current_debt, 0)
+
+    @property
+    def loss(self):
+        return max(self.current_debt - self.assets, 0)
+
+    @property
+    def staleness(self):
+        return self.timestamp - self.last_report
+
+    @property
+    def value(self):
+        """
+        Assets a report would account for: the gain or loss that is not
+        reflected in the price per share yet, and the fees.
+        """
+        return self.gain + self.loss + self.fees
+
+
+@dataclass(frozen=True)
+class ReportPlan:
+    statuses: list
+    # Strategies to report, in the order of `statuses`.
+    strategies: list
+    # Value of the batch in wei, and its cost.
+    value: int
+    gas: int
+    gas_price: int
+
+    @property
+    def cost(self):
+        return self.gas * self.gas_price
+
+
+class Keeper:
+    """
+    Decides which strategies of `vault` to report and reports them from
+    `sender`, an account with the REPORTING_MANAGER role.
+    """
+
+    def __init__(self, vault, sender, config=KeeperConfig()):
+        self.vault = vault
+        self.sender = sender
+        self.config = config
+
+    def _multicall(self):
+        # Multicall3 is deployed at the same address on every chain.
+        return multicall.Call(supported_chains=[chain.chain_id])
+
+    def statuses(self, strategies=None):
+        """
+        Read the status of `strategies`, all the strategies in the
+        default queue by default.
+        """
+        vault = self.vault
+        if strategies is None:
+            strategies = vault.getDefaultQueue()
+        strategies = [str(strategy) for strategy in strategies]
+        if len(strategies) == 0:
+            return []
+
+        call = self._multicall()
+        call.add(vault.accountant)
+        call.add(vault.accountantV2)
+        call.add(vault.totalAssets)
+        call.add(vault.totalSupply)
+        for strategy in strategies:
+            call.add(vault.strategies, strategy)
+            call.add(Contract(strategy).balanceOf, vault)
+        accountant, accountant_v2, total_assets, total_supply, *results = list(call())
+        params = results[::2]
+
+        call = self._multicall()
+        for strategy, shares in zip(strategies, results[1::2]):
+            call.add(Contract(strategy).convertToAssets, shares)
+        assets = list(call())
+
+        timestamp = chain.blocks.head.timestamp
+        statuses = []
+        for strategy, strategy_params, strategy_assets in zip(
+            strategies, params, assets
+        ):
+            status = StrategyStatus(
+                strategy=strategy,
+                current_debt=strategy_params.currentDebt,
+                assets=strategy_assets,
+                last_report=strategy_params.lastReport,
+                fees=0,
+                refunds=0,
+                timestamp=timestamp,
+            )
+            if accountant != ZERO_ADDRESS:
+                fees, refunds = self._accountant_report(
+                    accountant,
+                    accountant_v2,
+                    status,
+                    strategy_params,
+                    total_assets,
+                    total_supply,
+                )
+                status = StrategyStatus(
+                    **{**vars(status), "fees": fees, "refunds": refunds}
+                )
+            statuses.append(status)
+        return statuses
+
+    def _accountant_report(
+        self, accountant, accountant_v2, status, params, total_assets, total_supply
+    ):
+        # Called as the vault, accountants may only report to it. This can
+        # not be batched, the multicall would be the caller.
+        report = Contract(accountant, abi=ACCOUNTANT_ABI).report
+        args = [status.strategy, status.gain, status.loss]
+        if accountant_v2:
+            params = (
+                params.activation,
+                params.lastReport,
+                params.currentDebt,
+                params.maxDebt,
+            )
+            args += [params, total_assets, total_supply]
+        return report.call(*args, sender=self.vault.address)
+
+    def _to_wei(self, assets):
+        return assets * self.config.asset_price // 10 ** self.vault.decimals()
+
+    def plan(self, strategies=None):
+        """
+        Pick the strategies to report, see `KeeperConfig`.
+        """
+        config = self.config
+        gas_price = config.gas_price
+        if gas_price is None:
+            gas_price = chain.provider.gas_price
+        statuses = self.statuses(strategies)
+
+        candidates = []
+        stale = False
+        for status in statuses:
+            if status.staleness < config.min_report_interval:
+                continue
+            if status.staleness >= config.max_report_interval:
+                stale = True
+            elif (
+                self._to_wei(status.value)
+                < config.gas_per_strategy * gas_price * config.profit_factor
+            ):
+                continue
+            candidates.append(status)
+
+        value = self._to_wei(sum(status.value for status in candidates))
+        gas = 0
+        if len(candidates) > 0:
+            gas = self.vault.processReports.estimate_gas_cost(
+                [status.strategy for status in candidates], sender=self.sender
+            )
+            # The batch as a whole must pay for itself too.
+            if not stale and value < gas * gas_price * config.profit_factor:
+                candidates = []
+
+        return ReportPlan(
+            statuses=statuses,
+            strategies=[status.strategy for status in candidates],
+            value=value,
+            gas=gas,
+            gas_price=gas_price,
+        )
+
+    def run(self, strategies=None):
+        """
+        Report the strategies that are worth it, returns the plan and the
+        receipt, `None` if nothing was reported.
+        """
+        plan = self.plan(strategies)
+        if len(plan.strategies) == 0:
+            return plan, None
+        receipt = self.vault.processReports(
+            plan.strategies, sender=self.sender, gas_limit=plan.gas * 6 // 5
+        )
+        return plan, receipt
@@ -0,0 +1,913 @@
+"""
+Pure Python reference model of Vault.vy.
+
+`VaultModel` mirrors the vault state machine in exact integer math:
+deposits and mints, withdraws and redeems through the default or a
+custom queue, debt updates, reports with accountant fees, refunds and
+protocol fees, debt purchases, shutdown and profit unlocking. Every
+external call takes the block timestamp it is executed at, and a call
+that would revert raises `Revert` and leaves the model untouched.
+
+It is meant to be run against the real contract, see
+`utils.differential`, so it only models what the vault does and the
+behaviour of the test mocks it talks to. Roles are not modelled, every
+call is assumed to come from an account holding the role it needs.
+"""
+
+import functools
+
+from utils.constants import MAX_BPS_ACCOUNTANT, MAX_INT, WEEK, YEAR
+
+MAX_BPS = 10_000
+MAX_BPS_EXTENDED = 1_000_000_000_000
+MAX_QUEUE = 64
+MAX_RATE = 2**144 - 1
+ZERO = None
+
+
+class Revert(Exception):
+    """
+    The call would revert. `reason` is the revert string, `None` for the
+    bare asserts the vault uses.
+    """
+
+    def __init__(self, reason=None):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def _require(condition, reason=None):
+    if not condition:
+        raise Revert(reason)
+
+
+def _atomic(method):
+    """
+    Roll the whole model back if the call reverts, like the EVM does.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        saved = self._save()
+        try:
+            return method(self, *args, **kwargs)
+        except Revert:
+            self._restore(saved)
+            raise
+
+    return wrapper
+
+
+class TokenModel:
+    """
+    Balances and allowances of the vaults asset, for every account that is
+    not a strategy.
+    """
+
+    def __init__(self):
+        self.balances = {}
+        self.allowances = {}
+
+    def balance_of(self, account):
+        return self.balances.get(account, 0)
+
+    def mint(self, account, amount):
+        self.balances[account] = self.balance_of(account) + amount
+
+    def approve(self, owner, spender, amount):
+        self.allowances[(owner, spender)] = amount
+
+    def burn(self, account, amount):
+        _require(
+            self.balance_of(account) >= amount, "ERC20: transfer amount exceeds balance"
+        )
+        self.balances[account] = self.balance_of(account) - amount
+
+    def transfer(self, sender, receiver, amount):
+        _require(
+            self.balance_of(sender) >= amount, "ERC20: transfer amount exceeds balance"
+        )
+        self.balances[sender] = self.balance_of(sender) - amount
+        self.balances[receiver] = self.balance_of(receiver) + amount
+
+    def transfer_from(self, spender, sender, receiver, amount):
+        allowance = self.allowances.get((sender, spender), 0)
+        if allowance != MAX_INT:
+            _require(allowance >= amount, "ERC20: insufficient allowance")
+            self.allowances[(sender, spender)] = allowance - amount
+        self.transfer(sender, receiver, amount)
+
+
+class StrategyModel:
+    """
+    An ERC4626 strategy behaving like the mock tokenized strategies: no
+    fees, no profit locking and funds deployed to a yield source as soon
+    as they are deposited. Gains are held idle by the strategy and losses
+    are taken from the yield source, both reported right away.
+    """
+
+    def __init__(self, address):
+        self.address = address
+        self.total_assets = 0
+        self.total_supply = 0
+        self.balances = {}
+        # Asset held by the strategy and by its yield source.
+        self.idle = 0
+        self.deployed = 0
+        # Funds that can not be withdrawn, `None` means no limit at all.
+        self.locked_funds = None
+
+    def balance_of(self, owner):
+        return self.balances.get(owner, 0)
+
+    def convert_to_assets(self, shares):
+        if self.total_supply == 0:
+            return shares
+        return shares * self.total_assets // self.total_supply
+
+    def convert_to_shares(self, assets, round_up=False):
+        if self.total_supply == 0:
+            return assets
+        if self.total_assets == 0:
+            return 0
+        return _mul_div(assets, self.total_supply, self.total_assets, round_up)
+
+    def preview_withdraw(self, assets):
+        return self.convert_to_shares(assets, round_up=True)
+
+    def max_deposit(self, receiver):
+        return MAX_INT - self.total_assets
+
+    def max_redeem(self, owner):
+        if self.locked_funds is None:
+            return self.balance_of(owner)
+        limit = max(self.idle + self.deployed - self.locked_funds, 0)
+        return min(self.convert_to_shares(limit), self.balance_of(owner))
+
+    def deposit(self, assets, receiver):
+        _require(assets <= self.max_deposit(receiver), "ERC4626: deposit more than max")
+        shares = self.convert_to_shares(assets)
+        _require(shares != 0, "ZERO_SHARES")
+        self.total_assets += assets
+        self.total_supply += shares
+        self.balances[receiver] = self.balance_of(receiver) + shares
+        self.deployed += assets
+        return shares
+
+    def redeem(self, shares, owner):
+        _require(shares <= self.max_redeem(owner), "ERC4626: redeem more than max")
+        assets = self.convert_to_assets(shares)
+        _require(assets != 0, "ZERO_ASSETS")
+        # Idle funds are used first, the rest is freed from the yield source.
+        from_idle = min(assets, self.idle)
+        self.idle -= from_idle
+        self.deployed -= assets - from_idle
+        self.total_assets -= assets
+        self.total_supply -= shares
+        self.balances[owner] -= shares
+        return assets
+
+    def transfer(self, sender, receiver, shares):
+        _require(self.balance_of(sender) >= shares)
+        self.balances[sender] = self.balance_of(sender) - shares
+        self.balances[receiver] = self.balance_of(receiver) + shares
+
+    def gain(self, amount):
+        self.idle += amount
+        self.total_assets += amount
+
+    def lose(self, amount):
+        _require(amount <= self.deployed)
+        self.deployed -= amount
+        self.total_assets -= amount
+
+
+class AccountantModel:
+    """
+    The `FlexibleAccountant` test mock.
+    """
+
+    def __init__(self, address):
+        self.address = address
+        # Strategy => (management fee, performance fee, refund ratio).
+        self.fees = {}
+
+    def set_fees(self, strategy, management_fee=0, performance_fee=0, refund_ratio=0):
+        self.fees[strategy] = (management_fee, performance_fee, refund_ratio)
+
+    def report(
+        self, token, vault, strategy, gain, loss, current_debt, last_report, now
+    ):
+        management_fee, performance_fee, refund_ratio = self.fees.get(
+            strategy, (0, 0, 0)
+        )
+        fees = (
+            current_debt
+            * (now - last_report)
+            * management_fee
+            // MAX_BPS_ACCOUNTANT
+            // YEAR
+        )
+        balance = token.balance_of(self.address)
+        if gain > 0:
+            fees += gain * performance_fee // MAX_BPS_ACCOUNTANT
+            refunds = min(balance, gain * refund_ratio // MAX_BPS_ACCOUNTANT)
+        else:
+            refunds = min(balance, loss * refund_ratio // MAX_BPS_ACCOUNTANT)
+
+        if refunds > 0:
+            token.approve(self.address, vault, refunds)
+
+        return fees, refunds
+
+
+def _mul_div(x, y, denominator, round_up):
+    numerator = x * y
+    result = numerator // denominator
+    if round_up and numerator % denominator != 0:
+        result += 1
+    return result
+
+
+class VaultModel:
+    """
+    The state of one vault, its strategies and the accounts it deals with.
+    """
+
+    def __init__(
+        self,
+        address="vault",
+        profit_max_unlock_time=WEEK,
+        deposit_limit=MAX_INT,
+        decimals=18,
+    ):
+        self.address = address
+        self.decimals = decimals
+        self.token = TokenModel()
+        self.accountant = None
+        self.protocol_fee_bps = 0
+        self.protocol_fee_recipient = ZERO
+
+        self.total_idle = 0
+        self.total_debt = 0
+        self.total_supply = 0
+        self.balances = {}
+        self.allowances = {}
+
+        # Strategy => (activation, last report, current debt).
+        self.strategies = {}
+        self.max_debt = {}
+        # Strategy => (withdrawable, loss ratio, last snapshot).
+        self.liquidity = {}
+        self.strategy_models = {}
+        self.default_queue = []
+        self.use_default_queue = False
+
+        self.minimum_total_idle = 0
+        self.deposit_limit = deposit_limit
+        self.shutdown = False
+
+        self.full_profit_unlock_date = 0
+        self.last_profit_update = 0
+        self.profit_max_unlock_time = profit_max_unlock_time
+        self.profit_unlocking_rate = 0
+        # Timestamp of the call being executed.
+        self.now = 0
+
+    ## STATE ##
+    def _save(self):
+        saved = {
+            name: value.copy() if isinstance(value, (dict, list)) else value
+            for name, value in vars(self).items()
+        }
+        saved["_token"] = (dict(self.token.balances), dict(self.token.allowances))
+        saved["_strategies"] = {
+            address: (
+                {
+                    name: value.copy() if isinstance(value, dict) else value
+                    for name, value in vars(model).items()
+                }
+            )
+            for address, model in self.strategy_models.items()
+        }
+        return saved
+
+    def _restore(self, saved):
+        self.token.balances, self.token.allowances = saved.pop("_token")
+        for address, state in saved.pop("_strategies").items():
+            vars(self.strategy_models[address]).update(state)
+        vars(self).update(saved)
+
+    ## SHARES ##
+    def balance_of(self, account, now):
+        self.now = now
+        if account == self.address:
+            return self.balances.get(account, 0) - self._unlocked_shares()
+        return self.balances.get(account, 0)
+
+    def _issue_shares(self, shares, recipient):
+        self.balances[recipient] = self.balances.get(recipient, 0) + shares
+        self.total_supply += shares
+
+    def _burn_shares(self, shares, owner):
+        _require(self.balances.get(owner, 0) >= shares)
+        self.balances[owner] = self.balances.get(owner, 0) - shares
+        self.total_supply -= shares
+
+    def _unlocked_shares(self):
+        if self.full_profit_unlock_date > self.now:
+            return (
+                self.profit_unlocking_rate
+                * (self.now - self.last_profit_update)
+                // MAX_BPS_EXTENDED
+            )
+        if self.full_profit_unlock_date != 0:
+            return self.balances.get(self.address, 0)
+        return 0
+
+    def _load_accounting(self):
+        return (
+            self.total_idle,
+            self.total_debt,
+            self.total_supply - self._unlocked_shares(),
+        )
+
+    def unlocked_shares(self, now):
+        self.now = now
+        return self._unlocked_shares()
+
+    def total_supply_at(self, now):
+        self.now = now
+        return self.total_supply - self._unlocked_shares()
+
+    def total_assets(self):
+        return self.total_idle + self.total_debt
+
+    @staticmethod
+    def _shares_to_assets(shares, total_assets, total_supply, round_up):
+        if shares == MAX_INT or shares == 0 or total_supply == 0:
+            return shares
+        return _mul_div(shares, total_assets, total_supply, round_up)
+
+    @staticmethod
+    def _assets_to_shares(assets, total_assets, total_supply, round_up):
+        if assets == MAX_INT or assets == 0:
+            return assets
+        if total_assets == 0:
+            return assets if total_supply == 0 else 0
+        return _mul_div(assets, total_supply, total_assets, round_up)
+
+    def convert_to_assets(self, shares, now, round_up=False):
+        self.now = now
+        idle, debt, supply = self._load_accounting()
+        return self._shares_to_assets(shares, idle + debt, supply, round_up)
+
+    def convert_to_shares(self, assets, now, round_up=False):
+        self.now = now
+        idle, debt, supply = self._load_accounting()
+        return self._assets_to_shares(assets, idle + debt, supply, round_up)
+
+    def price_per_share(self, now):
+        return self.convert_to_assets(10**self.decimals, now)
+
+    @_atomic
+    def transfer(self, sender, receiver, amount, now):
+        self.now = now
+        _require(receiver not in [self.address, ZERO])
+        _require(self.balances.get(sender, 0) >= amount, "insufficient funds")
+        self.balances[sender] = self.balances.get(sender, 0) - amount
+        self.balances[receiver] = self.balances.get(receiver, 0) + amount
+        return True
+
+    @_atomic
+    def approve(self, owner, spender, amount, now):
+        self.now = now
+        self.allowances[(owner, spender)] = amount
+        return True
+
+    ## STRATEGIES ##
+    def add_strategy_model(self, strategy):
+        self.strategy_models[strategy.address] = strategy
+
+    def _assert_active(self, strategy):
+        _require(strategy in self.strategies, "inactive strategy")
+
+    def _current_debt(self, strategy):
+        return self.strategies[strategy][2] if strategy in self.strategies else 0
+
+    def _set_current_debt(self, strategy, current_debt):
+        activation, last_report, _ = self.strategies[strategy]
+        self.strategies[strategy] = (activation, last_report, current_debt)
+
+    def _quote(self, strategy):
+        model = self.strategy_models[strategy]
+        shares = model.balance_of(self.address)
+        assets = model.convert_to_assets(shares)
+        redeemable = min(model.max_redeem(self.address), shares)
+        withdrawable = assets
+        if redeemable < shares:
+            withdrawable = model.convert_to_assets(redeemable)
+        return shares, assets, withdrawable
+
+    def _record_liquidity(self, strategy, current_debt, assets, withdrawable):
+        loss_ratio = 0
+        if assets < current_debt:
+            loss_ratio = (current_debt - assets) * MAX_BPS_EXTENDED // current_debt
+        self.liquidity[strategy] = (min(withdrawable, 2**128 - 1), loss_ratio, self.now)
+
+    @_atomic
+    def add_strategy(self, strategy, now, add_to_queue=True):
+        self.now = now
+        _require(
+            strategy not in [self.address, ZERO], "strategy cannot be zero address"
+        )
+        _require(strategy not in self.strategies, "strategy already active")
+        self.strategies[strategy] = (now, now, 0)
+        if add_to_queue and len(self.default_queue) < MAX_QUEUE:
+            self.default_queue.append(strategy)
+
+    @_atomic
+    def revoke_strategy(self, strategy, now, force=False):
+        self.now = now
+        _require(strategy in self.strategies, "strategy not active")
+        loss = self._current_debt(strategy)
+        if loss != 0:
+            _require(force, "strategy has debt")
+            self.total_debt -= loss
+
+        del self.strategies[strategy]
+        self.max_debt.pop(strategy, None)
+        if strategy in self.default_queue:
+            self.default_queue.remove(strategy)
+
+    @_atomic
+    def update_max_debt(self, strategy, max_debt, now):
+        self.now = now
+        self._assert_active(strategy)
+        self.max_debt[strategy] = max_debt
+
+    @_atomic
+    def set_minimum_total_idle(self, minimum_total_idle, now):
+        self.now = now
+        self.minimum_total_idle = minimum_total_idle
+
+    @_atomic
+    def set_profit_max_unlock_time(self, profit_max_unlock_time, now):
+        self.now = now
+        _require(profit_max_unlock_time <= YEAR, "profit unlock time too long")
+        if profit_max_unlock_time == 0:
+            shares = self.balances.get(self.address, 0)
+            if shares > 0:
+                self._burn_shares(shares, self.address)
+            self.full_profit_unlock_date = 0
+            self.profit_unlocking_rate = 0
+        self.profit_max_unlock_time = profit_max_unlock_time
+
+    @_atomic
+    def set_accountant(self, accountant, now):
+        self.now = now
+        self.accountant = accountant
+
+    def set_protocol_fee(self, fee_bps, recipient):
+        self.protocol_fee_bps = fee_bps
+        self.protocol_fee_recipient = recipient
+
+    ## DEBT ##
+    def _withdraw_from_strategy(self, strategy, assets, shares_held):
+        model = self.strategy_models[strategy]
+        shares = min(model.preview_withdraw(assets), shares_held)
+        withdrawn = model.redeem(shares, self.address)
+        # The asset leaves the strategy for the vault.
+        self.token.mint(self.address, withdrawn)
+        return withdrawn
+
+    @_atomic
+    def update_debt(self, strategy, target_debt, now, max_loss=MAX_BPS):
+        self.now = now
+        new_debt = target_debt
+        current_debt = self._current_debt(strategy)
+        model = self.strategy_models.get(strategy)
+
+        if self.shutdown:
+            new_debt = 0
+
+        _require(new_debt != current_debt, "new debt equals current debt")
+
+        if current_debt > new_debt:
+            to_withdraw = current_debt - new_debt
+            # One quote, adjusted below by what is moved.
+            quote = self._quote(strategy)
+            _, assets, withdrawable = quote
+
+            if self.total_idle + to_withdraw < self.minimum_total_idle:
+                to_withdraw = min(
+                    self.minimum_total_idle - self.total_idle, current_debt
+                )
+
+            _require(withdrawable != 0, "nothing to withdraw")
+            to_withdraw = min(to_withdraw, withdrawable)
+
+            unrealised = self._share_of_unrealised_losses(
+                current_debt, quote[1], to_withdraw
+            )
+            _require(unrealised == 0, "strategy has unrealised losses")
+
+            withdrawn = min(
+                self._withdraw_from_strategy(strategy, to_withdraw, quote[0]),
+                current_debt,
+            )
+            self._assert_loss_within(to_withdraw, withdrawn, max_loss)
+            to_withdraw = max(to_withdraw, withdrawn)
+
+            self.total_idle += withdrawn
+            self.total_debt -= to_withdraw
+            new_debt = current_debt - to_withdraw
+
+            self._record_liquidity(
+                strategy,
+                new_debt,
+                assets - min(to_withdraw, assets),
+                withdrawable - min(to_withdraw, withdrawable),
+            )
+        else:
+            _require(
+                new_debt <= self.max_debt.get(strategy, 0),
+                "target debt higher than max debt",
+            )
+            max_deposit = model.max_deposit(self.address)
+            _require(max_deposit != 0, "nothing to deposit")
+            to_deposit = min(new_debt - current_debt, max_deposit)
+
+            _require(self.total_idle > self.minimum_total_idle, "no funds to deposit")
+            to_deposit = min(to_deposit, self.total_idle - self.minimum_total_idle)
+
+            if to_deposit > 0:
+                # The asset leaves the vault for the strategy.
+                self.token.burn(self.address, to_deposit)
+                model.deposit(to_deposit, self.address)
+                self.total_idle -= to_deposit
+                self.total_debt += to_deposit
+
+            new_debt = current_debt + to_deposit
+
+        self._set_current_debt(strategy, new_debt)
+        return new_debt
+
+    @_atomic
+    def buy_debt(self, buyer, strategy, amount, now):
+        self.now = now
+        _require(strategy in self.strategies, "not active")
+        current_debt = self._current_debt(strategy)
+        _require(current_debt > 0, "nothing to buy")
+        _require(amount > 0, "nothing to buy with")
+        amount = min(amount, current_debt)
+
+        model = self.strategy_models[strategy]
+        shares = model.balance_of(self.address) * amount // current_debt
+        _require(shares > 0, "cannot buy zero")
+
+        self.token.transfer_from(self.address, buyer, self.address, amount)
+        self._set_current_debt(strategy, current_debt - amount)
+        self.total_idle += amount
+        self.total_debt -= amount
+        model.transfer(self.address, buyer, shares)
+
+    @_atomic
+    def shutdown_vault(self, now):
+        self.now = now
+        _require(not self.shutdown)
+        self.shutdown = True
+        self.deposit_limit = 0
+
+    ## REPORTING ##
+    def process_report(self, strategy, now):
+        return self.process_reports([strategy], now)
+
+    @_atomic
+    def process_reports(self, strategies, now):
+        self.now = now
+        accountant = self.accountant
+        total_idle, total_debt, vault_supply = self._load_accounting()
+        vault_assets = total_idle + total_debt
+
+        gain = loss = total_fees = total_refunds = 0
+        reports = []
+        for strategy in strategies:
+            self._assert_active(strategy)
+            quote = self._quote(strategy)
+            activation, last_report, current_debt = self.strategies[strategy]
+            assets = quote[1]
+            strategy_gain = max(assets - current_debt, 0)
+            strategy_loss = max(current_debt - assets, 0)
+
+            strategy_fees = strategy_refunds = 0
+            if accountant is not None:
+                strategy_fees, strategy_refunds = accountant.report(
+                    self.token,
+                    self.address,
+                    strategy,
+                    strategy_gain,
+                    strategy_loss,
+                    current_debt,
+                    last_report,
+                    now,
+                )
+
+            if strategy_refunds > 0:
+                available = min(
+                    self.token.balance_of(accountant.address),
+                    self.token.allowances.get((accountant.address, self.address), 0),
+                )
+                strategy_refunds = min(
+                    strategy_refunds, available - min(available, total_refunds)
+                )
+
+            self.strategies[strategy] = (activation, now, assets)
+            self._record_liquidity(strategy, assets, assets, quote[2])
+
+            gain += strategy_gain
+            loss += strategy_loss
+            total_fees += strategy_fees
+            total_refunds += strategy_refunds
+            reports.append((strategy, strategy_gain, strategy_loss, strategy_fees))
+
+        total_fees_shares = protocol_fees_shares = shares_to_burn = 0
+        if loss + total_fees > 0:
+            shares_to_burn = self._assets_to_shares(
+                loss + total_fees, vault_assets, vault_supply, True
+            )
+            if total_fees > 0:
+                total_fees_shares = shares_to_burn * total_fees // (loss + total_fees)
+                if self.protocol_fee_bps > 0:
+                    protocol_fees_shares = (
+                        total_fees_shares * self.protocol_fee_bps // MAX_BPS
+                    )
+
+        shares_to_lock = 0
+        if gain + total_refunds > 0 and self.profit_max_unlock_time != 0:
+            shares_to_lock = self._assets_to_shares(
+                gain + total_refunds, vault_assets, vault_supply, False
+            )
+
+        total_supply = self.total_supply
+        ending_supply = vault_supply + shares_to_lock - shares_to_burn
+        _require(ending_supply >= 0)
+        if ending_supply > total_supply:
+            self._issue_shares(ending_supply - total_supply, self.address)
+        elif total_supply > ending_supply:
+            self._burn_shares(
+                min(total_supply - ending_supply, self.balances.get(self.address, 0)),
+                self.address,
+            )
+
+        shares_to_lock = max(shares_to_lock - shares_to_burn, 0)
+
+        if total_refunds > 0:
+            self.token.transfer_from(
+                self.address, accountant.address, self.address, total_refunds
+            )
+
+        self.total_idle = total_idle + total_refunds
+        self.total_debt = total_debt + gain - loss
+        _require(self.total_debt >= 0)
+
+        if total_fees_shares > 0:
+            self._issue_shares(
+                total_fees_shares - protocol_fees_shares, accountant.address
+            )
+            if protocol_fees_shares > 0:
+                self._issue_shares(protocol_fees_shares, self.protocol_fee_recipient)
+
+        total_locked_shares = self.balances.get(self.address, 0)
+        if total_locked_shares > 0:
+            previously_locked_time = 0
+            if self.full_profit_unlock_date > now:
+                previously_locked_time = (total_locked_shares - shares_to_lock) * (
+                    self.full_profit_unlock_date - now
+                )
+            new_period = (
+                previously_locked_time + shares_to_lock * self.profit_max_unlock_time
+            ) // total_locked_shares
+            _require(new_period != 0)
+            rate = total_locked_shares * MAX_BPS_EXTENDED // new_period
+            _require(rate <= MAX_RATE)
+            self.full_profit_unlock_date = now + new_period
+            self.last_profit_update = now
+            self.profit_unlocking_rate = rate
+        else:
+            self.full_profit_unlock_date = 0
+
+        return gain, loss
+
+    ## DEPOSITS ##
+    def _max_deposit(self, receiver, total_assets):
+        if receiver in [ZERO, self.address]:
+            return 0
+        if self.deposit_limit == MAX_INT:
+            return MAX_INT
+        if total_assets >= self.deposit_limit:
+            return 0
+        return self.deposit_limit - total_assets
+
+    def max_deposit(self, receiver, now):
+        self.now = now
+        return self._max_deposit(receiver, self.total_assets())
+
+    def _receive_deposit(self, sender, recipient, assets, total_idle, total_debt):
+        _require(
+            assets <= self._max_deposit(recipient, total_idle + total_debt),
+            "exceed deposit limit",
+        )
+        self.token.transfer_from(self.address, sender, self.address, assets)
+        self.total_idle = total_idle + assets
+
+    @_atomic
+    def deposit(self, sender, assets, receiver, now):
+        self.now = now
+        _require(not self.shutdown)
+        total_idle, total_debt, total_supply = self._load_accounting()
+        self._receive_deposit(sender, receiver, assets, total_idle, total_debt)
+
+        total_assets = total_idle + total_debt
+        shares = 0
+        if total_supply == 0:
+            shares = assets
+        elif total_assets > 0:
+            shares = assets * total_supply // total_assets
+        _require(shares > 0, "cannot mint zero")
+        self._issue_shares(shares, receiver)
+        return shares
+
+    @_atomic
+    def mint(self, sender, shares, receiver, now):
+        self.now = now
+        _require(not self.shutdown)
+        total_idle, total_debt, total_supply = self._load_accounting()
+        assets = self._shares_to_assets(
+            shares, total_idle + total_debt, total_supply, True
+        )
+        _require(assets > 0, "cannot deposit zero")
+        self._receive_deposit(sender, receiver, assets, total_idle, total_debt)
+        self._issue_shares(shares, receiver)
+        return assets
+
+    ## WITHDRAWALS ##
+    @staticmethod
+    def _share_of_unrealised_losses(current_debt, assets, assets_needed):
+        if assets >= current_debt or current_debt == 0:
+            return 0
+        numerator = assets_needed * assets
+        share = assets_needed - numerator // current_debt
+        if numerator % current_debt != 0:
+            share += 1
+        return share
+
+    @staticmethod
+    def _assert_loss_within(expected, received, max_loss):
+        if received < expected and max_loss < MAX_BPS:
+            _require(
+                expected - received <= expected * max_loss // MAX_BPS, "too much loss"
+            )
+
+    def _queue(self, strategies):
+        if len(strategies) != 0 and not self.use_default_queue:
+            return list(strategies)
+        return list(self.default_queue)
+
+    def _redeem(
+        self,
+        sender,
+        receiver,
+        owner,
+        assets,
+        shares,
+        max_loss,
+        strategies,
+        total_idle,
+        total_debt,
+    ):
+        _require(receiver is not ZERO, "ZERO ADDRESS")
+        _require(shares > 0, "no shares to redeem")
+        _require(assets > 0, "no assets to withdraw")
+        _require(max_loss <= MAX_BPS, "max loss")
+        _require(self.balances.get(owner, 0) >= shares, "insufficient shares to redeem")
+
+        if sender != owner:
+            allowance = self.allowances.get((owner, sender), 0)
+            if allowance < MAX_INT:
+                _require(allowance >= shares, "insufficient allowance")
+                self.allowances[(owner, sender)] = allowance - shares
+
+        requested = assets
+        current_idle = total_idle
+        current_debt_total = total_debt
+
+        if requested > current_idle:
+            needed = requested - current_idle
+
+            for strategy in self._queue(strategies):
+                self._assert_active(strategy)
+                current_debt = self._current_debt(strategy)
+                to_withdraw = min(needed, current_debt)
+                if to_withdraw == 0:
+                    continue
+
+                quote = self._quote(strategy)
+                max_withdraw = quote[2]
+
+                unrealised = self._share_of_unrealised_losses(
+                    current_debt, quote[1], to_withdraw
+                )
+                if unrealised > 0:
+                    if max_withdraw < to_withdraw - unrealised:
+                        wanted = to_withdraw - unrealised
+                        unrealised = unrealised * max_withdraw // wanted
+                        to_withdraw = max_withdraw + unrealised
+
+                    to_withdraw -= unrealised
+                    requested -= unrealised
+                    needed -= unrealised
+                    current_debt_total -= unrealised
+
+                    if max_withdraw == 0 and unrealised > 0:
+                        self._set_current_debt(strategy, current_debt - unrealised)
+
+                to_withdraw = min(to_withdraw, max_withdraw)
+                if to_withdraw == 0:
+                    continue
+
+                withdrawn = self._withdraw_from_strategy(
+                    strategy, to_withdraw, quote[0]
+                )
+                loss = 0
+                if withdrawn > to_withdraw:
+                    if withdrawn > current_debt:
+                        to_withdraw = current_debt
+                    else:
+                        to_withdraw = withdrawn
+                elif withdrawn < to_withdraw:
+                    loss = to_withdraw - withdrawn
+
+                current_idle += to_withdraw - loss
+                requested -= loss
+                current_debt_total -= to_withdraw
+
+                new_debt = current_debt - (to_withdraw + unrealised)
+                _require(new_debt >= 0)
+                self._set_current_debt(strategy, new_debt)
+
+                if requested <= current_idle:
+                    break
+
+                needed -= to_withdraw
+
+            _require(current_idle >= requested, "insufficient assets in vault")
+
+        self._assert_loss_within(assets, requested, max_loss)
+
+        self._burn_shares(shares, owner)
+        self.total_idle = current_idle - requested
+        self.total_debt = current_debt_total
+        self.token.transfer(self.address, receiver, requested)
+        return requested
+
+    @_atomic
+    def withdraw(self, sender, assets, receiver, owner, now, max_loss=0, strategies=()):
+        self.now = now
+        total_idle, total_debt, total_supply = self._load_accounting()
+        shares = self._assets_to_shares(
+            assets, total_idle + total_debt, total_supply, True
+        )
+        self._redeem(
+            sender,
+            receiver,
+            owner,
+            assets,
+            shares,
+            max_loss,
+            strategies,
+            total_idle,
+            total_debt,
+        )
+        return shares
+
+    @_atomic
+    def redeem(
+        self, sender, shares, receiver, owner, now, max_loss=MAX_BPS, strategies=()
+    ):
+        self.now = now
+        total_idle, total_debt, total_supply = self._load_accounting()
+        assets = self._shares_to_assets(
+            shares, total_idle + total_debt, total_supply, False
+        )
+        return self._redeem(
+            sender,
+            receiver,
+            owner,
+            assets,
+            shares,
+            max_loss,
+            strategies,
+            total_idle,
+            total_debt,
+        )
@@ -0,0 +1,179 @@
+"""
+Offline price per share extrapolation.
+
+While profits unlock, `pricePerShare` moves every second even though no
+transaction touches the vault. Between two transactions it only depends
+on the unlock parameters, the totals and the shares the vault holds
+itself, so one `VaultSnapshot` is enough to reproduce `_unlockedShares`
+and `_convertToAssets` for any later timestamp.
+
+All the math is done on Python integers so results match the contract
+exactly. The vectorised helpers broadcast many snapshots against many
+timestamps using NumPy `object` arrays, since intermediate products
+(rate * elapsed) do not fit in `uint64`. Timestamps may be given as
+`uint64` arrays, they are widened before any arithmetic.
+"""
+
+from dataclasses import dataclass, fields
+
+import numpy as np
+
+# Same scale the vault uses for `profitUnlockingRate`.
+MAX_BPS_EXTENDED = 1_000_000_000_000
+MAX_UINT256 = 2**256 - 1
+
+
+@dataclass(frozen=True)
+class VaultSnapshot:
+    """
+    Raw vault state needed to extrapolate the price per share.
+
+    `total_supply` and `vault_shares` are the storage values, i.e.
+    including the shares that already unlocked but were not burnt yet.
+    """
+
+    total_idle: int
+    total_debt: int
+    total_supply: int
+    vault_shares: int
+    full_profit_unlock_date: int
+    profit_unlocking_rate: int
+    last_profit_update: int
+    decimals: int
+    timestamp: int
+
+    @classmethod
+    def from_vault(cls, vault, block_id=None):
+        """
+        Read a snapshot from a deployed vault.
+
+        The public getters hide the unlocked shares, so they are added back
+        to get the storage values. Every value is read at the same block.
+        """
+        from ape import chain
+
+        block = chain.blocks.head if block_id is None else chain.blocks[block_id]
+
+        def read(method, *args):
+            return method(*args, block_id=block.number)
+
+        unlocked = read(vault.unlockedShares)
+        return cls(
+            total_idle=read(vault.totalIdle),
+            total_debt=read(vault.totalDebt),
+            total_supply=read(vault.totalSupply) + unlocked,
+            vault_shares=read(vault.balanceOf, vault) + unlocked,
+            full_profit_unlock_date=read(vault.fullProfitUnlockDate),
+            profit_unlocking_rate=read(vault.profitUnlockingRate),
+            last_profit_update=read(vault.lastProfitUpdate),
+            decimals=read(vault.decimals),
+            timestamp=block.timestamp,
+        )
+
+
+def _columns(snapshots):
+    """
+    Stack the snapshot fields into (n, 1) object arrays keyed by name.
+    """
+    return {
+        field.name: np.array(
+            [getattr(snapshot, field.name) for snapshot in snapshots], dtype=object
+        ).reshape(-1, 1)
+        for field in fields(VaultSnapshot)
+    }
+
+
+def _broadcast(snapshots, timestamps):
+    """
+    Normalise the inputs to a (n, 1) column dict and a (1, m) timestamp row.
+
+    Returns an `unwrap` callable that turns a (n, m) result back into the
+    shape of the inputs, so scalar in gives scalar out.
+    """
+    single_vault = isinstance(snapshots, VaultSnapshot)
+    single_time = np.ndim(timestamps) == 0
+    if single_vault:
+        snapshots = [snapshots]
+
+    columns = _columns(snapshots)
+    # Widen before doing any arithmetic so uint64 inputs cannot overflow.
+    row = np.array([int(t) for t in np.ravel(timestamps)], dtype=object).reshape(1, -1)
+
+    if np.any(row < columns["timestamp"]):
+        raise ValueError("cannot extrapolate before the snapshot")
+
+    def unwrap(result):
+        if single_vault and single_time:
+            return result[0, 0]
+        if single_vault:
+            return result[0]
+        if single_time:
+            return result[:, 0]
+        return result
+
+    return columns, row, unwrap
+
+
+def _unlocked_shares(columns, row):
+    unlocking = columns["full_profit_unlock_date"] > row
+    # Only used where still unlocking, where it is never negative.
+    elapsed = np.where(unlocking, row - columns["last_profit_update"], 0)
+    partial = columns["profit_unlocking_rate"] * elapsed // MAX_BPS_EXTENDED
+    unlocked = np.where(
+        columns["full_profit_unlock_date"] != 0, columns["vault_shares"], 0
+    )
+    return np.where(unlocking, partial, unlocked)
+
+
+def _convert_to_assets(columns, row, shares, round_up):
+    total_assets = columns["total_idle"] + columns["total_debt"]
+    total_supply = columns["total_supply"] - _unlocked_shares(columns, row)
+
+    # Avoid dividing by zero, those cells are replaced below.
+    divisor = np.where(total_supply == 0, 1, total_supply)
+    numerator = shares * total_assets
+    amount = numerator // divisor
+    if round_up:
+        amount = amount + np.where(numerator % divisor != 0, 1, 0)
+
+    passthrough = (shares == 0) | (shares == MAX_UINT256) | (total_supply == 0)
+    return np.where(passthrough, shares, amount)
+
+
+def unlocked_shares(snapshots, timestamps):
+    """
+    Shares unlocked at `timestamps`, exactly as `unlockedShares()` would
+    return them.
+
+    Accepts one or many snapshots and one or many timestamps. Many of both
+    gives a (vaults, timestamps) object array.
+    """
+    columns, row, unwrap = _broadcast(snapshots, timestamps)
+    return unwrap(_unlocked_shares(columns, row))
+
+
+def total_supply(snapshots, timestamps):
+    """
+    Supply at `timestamps`, excluding unlocked shares, as `totalSupply()`.
+    """
+    columns, row, unwrap = _broadcast(snapshots, timestamps)
+    return unwrap(columns["total_supply"] - _unlocked_shares(columns, row))
+
+
+def convert_to_assets(snapshots, shares, timestamps, round_up=False):
+    """
+    Value of `shares` at `timestamps`, as `convertToAssets()`.
+
+    Set `round_up` to match `previewMint`.
+    """
+    columns, row, unwrap = _broadcast(snapshots, timestamps)
+    return unwrap(_convert_to_assets(columns, row, int(shares), round_up))
+
+
+def price_per_share(snapshots, timestamps):
+    """
+    Price per share at `timestamps`, as `pricePerShare()`.
+    """
+    columns, row, unwrap = _broadcast(snapshots, timestamps)
+    one_share = np.array([10**d for d in columns["decimals"][:, 0]], dtype=object)
+    return unwrap(_convert_to_assets(columns, row, one_share.reshape(-1, 1), False))
@@ -0,0 +1,368 @@
+"""
+Monte Carlo simulator for profit unlocking and fees.
+
+`UnlockSimulator` is a vectorised port of the share locking and fee
+share math in `_processReports`, for a vault with a single strategy and
+a `FlexibleAccountant` style accountant. Every array holds one entry per
+simulated path, so a whole batch of randomised gain, loss and refund
+sequences advances with each call to `report`.
+
+As in `utils.pps`, the state is kept in NumPy `object` arrays of Python
+integers so the results match the contract bit for bit. That is slower
+than native dtypes, `simulate` works through the paths in batches to
+keep memory bounded.
+
+`replay_on_chain` runs one path against a deployed vault and checks the
+port against the contract after every report.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from utils.constants import DAY, MAX_BPS_ACCOUNTANT, WEEK, YEAR
+from utils.pps import (
+    MAX_BPS_EXTENDED,
+    VaultSnapshot,
+    _convert_to_assets,
+    _unlocked_shares,
+)
+
+# Returns are drawn as integers scaled by this, so gains and losses are
+# exact functions of the seed.
+RETURN_SCALE = 10**9
+# Same value the vault uses for the protocol fee.
+MAX_BPS = 10_000
+
+
+@dataclass(frozen=True)
+class SimulationConfig:
+    """
+    Parameters of a simulation. Fees use the accountants basis points.
+    """
+
+    profit_max_unlock_time: int = WEEK
+    # Mean time between reports, intervals are exponentially distributed.
+    report_interval: int = DAY
+    reports: int = 52
+    # Mean and standard deviation of the strategy return per report.
+    mean_return: float = 0.001
+    return_volatility: float = 0.002
+    management_fee: int = 0
+    performance_fee: int = 0
+    refund_ratio: int = 0
+    protocol_fee: int = 0
+    # Asset the accountant holds to pay refunds with.
+    accountant_balance: int = 0
+    initial_deposit: int = 10**22
+    decimals: int = 18
+    start: int = 1_700_000_000
+
+
+@dataclass
+class SimulationResult:
+    """
+    Per path metrics, one float per simulated path.
+    """
+
+    # Largest price per share change at a report, relative.
+    max_pps_jump: np.ndarray
+    # Mean absolute price per share change at a report, relative.
+    mean_pps_jump: np.ndarray
+    # Sum of the price increases at reports. What depositing right before
+    # and withdrawing right after every report would have earned.
+    sandwich_capture: np.ndarray
+    # Share of the supply owned by the fee recipients at the end.
+    fee_dilution: np.ndarray
+    # Price per share at the end, in asset units.
+    final_pps: np.ndarray
+
+    def summary(self, percentiles=(5, 50, 95)):
+        """
+        Percentiles of every metric, keyed by metric name.
+        """
+        return {
+            name: dict(zip(percentiles, np.percentile(values, percentiles)))
+            for name, values in vars(self).items()
+        }
+
+
+def _array(values, paths):
+    return np.array(np.broadcast_to(np.asarray(values, dtype=object), paths))
+
+
+def _assets_to_shares(assets, total_assets, total_supply, round_up):
+    """
+    Vectorised `_assetsToShares`. Never called with `max_value(uint256)`.
+    """
+    divisor = np.where(total_assets == 0, 1, total_assets)
+    numerator = assets * total_supply
+    shares = numerator // divisor
+    if round_up:
+        shares = shares + np.where(numerator % divisor != 0, 1, 0)
+
+    # With no assets the price is 1 if there is no supply either, else 0.
+    empty = np.where(total_supply == 0, assets, 0)
+    return np.where(assets == 0, 0, np.where(total_assets == 0, empty, shares))
+
+
+class UnlockSimulator:
+    """
+    The vault state touched by reports, one entry per path.
+
+    Field names match `VaultSnapshot` so the `utils.pps` helpers can be
+    used on the state directly.
+    """
+
+    def __init__(self, config, snapshot, last_report, paths=1):
+        self.config = config
+        self.paths = paths
+        for name, value in vars(snapshot).items():
+            setattr(self, name, _array(value, paths))
+        self.profit_max_unlock_time = config.profit_max_unlock_time
+        self.one_share = 10**snapshot.decimals
+        self.last_report = _array(last_report, paths)
+        self.accountant_balance = _array(config.accountant_balance, paths)
+        self.accountant_shares = _array(0, paths)
+        self.protocol_shares = _array(0, paths)
+
+    @classmethod
+    def fresh(cls, config, paths):
+        """
+        A vault with `initial_deposit` fully deployed to its strategy.
+        """
+        snapshot = VaultSnapshot(
+            total_idle=0,
+            total_debt=config.initial_deposit,
+            total_supply=config.initial_deposit,
+            vault_shares=0,
+            full_profit_unlock_date=0,
+            profit_unlocking_rate=0,
+            last_profit_update=0,
+            decimals=config.decimals,
+            timestamp=config.start,
+        )
+        return cls(config, snapshot, config.start, paths)
+
+    def unlocked_shares(self, now):
+        return _unlocked_shares(vars(self), now)
+
+    def price_per_share(self, now):
+        return _convert_to_assets(vars(self), now, self.one_share, round_up=False)
+
+    def _accountant_report(self, now, gain, loss):
+        """
+        Fees and refunds as the `FlexibleAccountant` charges them.
+        """
+        config = self.config
+        fees = (
+            self.total_debt
+            * (now - self.last_report)
+            * config.management_fee
+            // MAX_BPS_ACCOUNTANT
+            // YEAR
+        )
+        fees = fees + gain * config.performance_fee // MAX_BPS_ACCOUNTANT
+        owed = (
+            np.where(gain > 0, gain, loss) * config.refund_ratio // MAX_BPS_ACCOUNTANT
+        )
+        # The vault can only pull what the accountant holds.
+        refunds = np.minimum(owed, self.accountant_balance)
+        return fees, refunds
+
+    def report(self, now, gain, loss):
+        """
+        Port of `_processReports` for the single strategy.
+
+        Returns the fees and refunds charged.
+        """
+        gain = _array(gain, self.paths)
+        loss = _array(loss, self.paths)
+        fees, refunds = self._accountant_report(now, gain, loss)
+
+        total_assets = self.total_idle + self.total_debt
+        supply = self.total_supply - self.unlocked_shares(now)
+
+        shares_to_burn = _assets_to_shares(loss + fees, total_assets, supply, True)
+        fee_shares = np.where(
+            fees > 0,
+            shares_to_burn * fees // np.where(loss + fees == 0, 1, loss + fees),
+            0,
+        )
+        protocol_shares = fee_shares * self.config.protocol_fee // MAX_BPS
+
+        shares_to_lock = _array(0, self.paths)
+        if self.profit_max_unlock_time != 0:
+            shares_to_lock = _assets_to_shares(
+                gain + refunds, total_assets, supply, False
+            )
+
+        ending_supply = supply + shares_to_lock - shares_to_burn
+        if np.any(ending_supply < 0):
+            raise ValueError("report would revert, fees and losses exceed the vault")
+
+        # Issue or burn the difference, never burning more than the vault owns.
+        issued = np.where(
+            ending_supply > self.total_supply, ending_supply - self.total_supply, 0
+        )
+        burnt = np.where(
+            self.total_supply > ending_supply,
+            np.minimum(self.total_supply - ending_supply, self.vault_shares),
+            0,
+        )
+        self.vault_shares = self.vault_shares + issued - burnt
+        self.total_supply = self.total_supply + issued - burnt
+
+        # Don't lock fees or losses.
+        shares_to_lock = np.where(
+            shares_to_lock > shares_to_burn, shares_to_lock - shares_to_burn, 0
+        )
+
+        self.accountant_balance = self.accountant_balance - refunds
+        self.total_idle = self.total_idle + refunds
+        self.total_debt = self.total_debt + gain - loss
+
+        self.accountant_shares = self.accountant_shares + fee_shares - protocol_shares
+        self.protocol_shares = self.protocol_shares + protocol_shares
+        self.total_supply = self.total_supply + fee_shares
+
+        # Weighted average of the remaining and the new unlocking period.
+        locked = self.vault_shares
+        has_locked = locked > 0
+        previously_locked_time = np.where(
+            self.full_profit_unlock_date > now,
+            (locked - shares_to_lock) * (self.full_profit_unlock_date - now),
+            0,
+        )
+        period = (
+            previously_locked_time + shares_to_lock * self.profit_max_unlock_time
+        ) // np.where(has_locked, locked, 1)
+        rate = locked * MAX_BPS_EXTENDED // np.where(period == 0, 1, period)
+
+        self.full_profit_unlock_date = np.where(has_locked, now + period, 0)
+        self.last_profit_update = np.where(has_locked, now, self.last_profit_update)
+        self.profit_unlocking_rate = np.where(
+            has_locked, rate, self.profit_unlocking_rate
+        )
+        self.last_report = _array(now, self.paths)
+        self.timestamp = _array(now, self.paths)
+
+        return fees, refunds
+
+    def step(self, now, returns):
+        """
+        Turn scaled `returns` into a gain or loss on the current debt and
+        report it.
+        """
+        change = self.total_debt * np.abs(returns) // RETURN_SCALE
+        gain = np.where(returns > 0, change, 0)
+        loss = np.where(returns < 0, change, 0)
+        self.report(now, gain, loss)
+        return gain, loss
+
+
+def generate(config, paths, rng):
+    """
+    Random report intervals and scaled returns, (paths, reports) each.
+    """
+    shape = (paths, config.reports)
+    intervals = np.maximum(
+        rng.exponential(config.report_interval, shape).astype(np.int64), 1
+    )
+    returns = rng.normal(config.mean_return, config.return_volatility, shape)
+    # A strategy can at most lose everything.
+    returns = np.maximum(returns, -1.0)
+    return intervals, np.rint(returns * RETURN_SCALE).astype(np.int64)
+
+
+def _simulate_batch(config, intervals, returns):
+    paths = intervals.shape[0]
+    simulator = UnlockSimulator.fresh(config, paths)
+    now = _array(config.start, paths)
+    jumps = np.zeros(intervals.shape)
+
+    for i in range(config.reports):
+        now = now + intervals[:, i].astype(object)
+        before = simulator.price_per_share(now)
+        simulator.step(now, returns[:, i].astype(object))
+        after = simulator.price_per_share(now)
+        jumps[:, i] = (after - before).astype(float) / before.astype(float)
+
+    supply = simulator.total_supply - simulator.unlocked_shares(now)
+    fee_shares = simulator.accountant_shares + simulator.protocol_shares
+    return SimulationResult(
+        max_pps_jump=np.abs(jumps).max(axis=1),
+        mean_pps_jump=np.abs(jumps).mean(axis=1),
+        sandwich_capture=np.clip(jumps, 0, None).sum(axis=1),
+        fee_dilution=fee_shares.astype(float) / supply.astype(float),
+        final_pps=simulator.price_per_share(now).astype(float) / simulator.one_share,
+    )
+
+
+def simulate(config, paths, seed=None, batch_size=100_000):
+    """
+    Run `paths` random report sequences and return their metrics.
+    """
+    rng = np.random.default_rng(seed)
+    results = []
+    for start in range(0, paths, batch_size):
+        intervals, returns = generate(config, min(batch_size, paths - start), rng)
+        results.append(_simulate_batch(config, intervals, returns))
+
+    return SimulationResult(
+        *(
+            np.concatenate([getattr(result, name) for result in results])
+            for name in vars(results[0])
+        )
+    )
+
+
+def replay_on_chain(
+    config, intervals, returns, vault, strategy, accountant, asset, gov
+):
+    """
+    Replay one path against a deployed vault, checking the port after
+    every report.
+
+    The vault must have `strategy` as its only strategy, a lossy strategy
+    so losses can be created, and `accountant` set up with the fees of
+    `config`. Report times are taken from the chain, the intervals only
+    set when each report is mined. Raises `AssertionError` on the first
+    report where the port and the contract disagree.
+    """
+    from ape import chain
+
+    assert vault.profitMaxUnlockTime() == config.profit_max_unlock_time
+    simulator = UnlockSimulator(
+        config,
+        VaultSnapshot.from_vault(vault),
+        vault.strategies(strategy).lastReport,
+    )
+    simulator.accountant_balance = _array(asset.balanceOf(accountant), 1)
+    simulator.accountant_shares = _array(vault.balanceOf(accountant), 1)
+
+    for i, (interval, scaled_return) in enumerate(zip(intervals, returns)):
+        change = simulator.total_debt[0] * abs(int(scaled_return)) // RETURN_SCALE
+        chain.pending_timestamp += int(interval)
+        if scaled_return > 0 and change > 0:
+            asset.mint(strategy, change, sender=gov)
+            strategy.report(sender=gov)
+        elif scaled_return < 0 and change > 0:
+            strategy.setLoss(gov, change, sender=gov)
+
+        tx = vault.processReport(strategy, sender=gov)
+        event = list(tx.decode_logs(vault.StrategyReported))[0]
+        now = chain.blocks[tx.block_number].timestamp
+
+        fees, refunds = simulator.report(now, event.gain, event.loss)
+
+        expected = VaultSnapshot.from_vault(vault, tx.block_number)
+        for name, value in vars(expected).items():
+            assert getattr(simulator, name)[0] == value, (i, name)
+        assert simulator.accountant_shares[0] == vault.balanceOf(accountant), (
+            i,
+            "accountant_shares",
+        )
+        assert refunds[0] == event.totalRefunds, (i, "refunds")
+
+    return simulator
@@ -1,22 +1,29 @@
 from ape import chain
 
+from utils.client import VaultClient
+
 
 def vault_status(vault):
-    print(f"--- Vault {vault.name()} ---")
-    print(f"API: {vault.apiVersion()}")
-    print(f"TotalAssets: {to_units(vault, vault.totalAssets())}")
-    print(f"PricePerShare: {to_units(vault, vault.pricePerShare())}")
-    print(f"TotalSupply: {to_units(vault, vault.totalSupply())}")
+    client = VaultClient(vault)
+    info = client.info()
+    status = client.status()
+    print(f"--- Vault {info.name} ---")
+    print(f"API: {info.api_version}")
+    print(f"TotalAssets: {status.total_assets / 10 ** info.decimals}")
+    print(f"PricePerShare: {status.price_per_share / 10 ** info.decimals}")
+    print(f"TotalSupply: {status.total_supply / 10 ** info.decimals}")
 
 
 def strategy_status(vault, strategy):
-    status = vault.strategies(strategy).dict()
+    client = VaultClient(vault)
+    decimals = client.info().decimals
+    (position,) = client.strategies([strategy])
     print(f"--- Strategy {strategy.name()} ---")
-    print(f"Performance fee {status['performanceFee']}")
-    print(f"Debt Ratio {status['debtRatio']}")
-    print(f"Total Debt {to_units(vault, status['totalDebt'])}")
-    print(f"Total Gain {to_units(vault, status['totalGain'])}")
-    print(f"Total Loss {to_units(vault, status['totalLoss'])}")
+    print(f"Last Report {position.last_report}")
+    print(f"Current Debt {position.current_debt / 10 ** decimals}")
+    print(f"Max Debt {position.max_debt / 10 ** decimals}")
+    print(f"Assets {position.assets / 10 ** decimals}")
+    print(f"Unrealised Loss {position.unrealised_loss / 10 ** decimals}")
 
 
 def to_units(token, amount):